@@ -3,16 +3,42 @@ Menke Vacca Wedding Website
 A Flask web application for wedding RSVP and registry management
 """
 
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
-from flask_mail import Mail, Message
+from flask import Flask, Response, g, has_request_context, render_template, request, jsonify, flash
+from flask_mail import Mail
 import os
 from datetime import datetime, timezone
 import requests
 from bs4 import BeautifulSoup
 import json
 import logging
+import re
+import tempfile
+import time
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from email.message import EmailMessage
+from email_outbox import DigestPolicy, EmailOutbox, OutboxSender
+from email_templates import render_digest_email, render_purchase_email
+from email_transport import AcsEmailTransport, PooledSmtpTransport
+from cosmos_metrics import BACKGROUND_ROUTE, CosmosMetrics, CosmosUsage, InstrumentedContainer
+from cosmos_layout import LEGACY_PARTITION_KEY, DEFAULT_REGISTRY_ID, RegistryLayout
+from cosmos_indexing import REGISTRY_DEFAULT_TTL, REGISTRY_INDEXING_POLICY, ensure_indexing_policy
+from registry_store import (TOMBSTONE_TTL_SECONDS, CosmosRegistryStore, ItemNotFound,
+                            PreconditionFailed, SqliteRegistryStore)
+from registry_events import (EVENT_ADDED, EVENT_BOUGHT, EVENT_REMOVED, EVENT_UPDATED,
+                             RegistryEventBroker, parse_last_event_id)
+from registry_query import DEFAULT_SORT, RegistryFilters, RegistryQuery
+from registry_feed import FeedLease, RegistryChangeFeed, default_consumer_name
+from json_provider import FastJSONProvider, SerializedCache, negotiated_response
+from page_cache import PageCache
+from response_compression import ResponseCompressor
+from registry_images import CONTENT_HASH_BLOB_PATTERN, delete_unused_image, store_image
+from registry_item import CACHED_IMAGE_PATH, RegistryItem, as_registry_item
+from registry_search import RegistrySearchIndex, parse_query
+from registry_snapshot import RegistrySnapshot
+from registry_sync import RegistryReadModel
 
 # Try to import Azure Communication Services (optional)
 try:
@@ -32,7 +58,7 @@ except ImportError:
 
 # Try to import Azure Blob Storage
 try:
-    from azure.storage.blob import BlobServiceClient, ContentSettings
+    from azure.storage.blob import BlobServiceClient
     BLOB_AVAILABLE = True
 except ImportError:
     BLOB_AVAILABLE = False
@@ -58,6 +84,8 @@ load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+# jsonify() encodes with orjson when it is installed
+app.json = FastJSONProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
 # Determine if we should use local SMTP server
@@ -110,19 +138,180 @@ else:
 # Initialize Flask-Mail
 mail = Mail(app)
 
+# Notification transports: one long-lived ACS client and a keep-alive SMTP pool
+acs_transport = AcsEmailTransport(
+    EmailClient.from_connection_string if AZURE_EMAIL_AVAILABLE else None
+)
+smtp_transport = PooledSmtpTransport(
+    app.config['MAIL_SERVER'],
+    app.config['MAIL_PORT'],
+    use_tls=app.config.get('MAIL_USE_TLS', False),
+    use_ssl=app.config.get('MAIL_USE_SSL', False),
+    username=app.config.get('MAIL_USERNAME'),
+    password=app.config.get('MAIL_PASSWORD'),
+    max_idle=int(os.environ.get('SMTP_POOL_SIZE', 2)),
+    idle_timeout=int(os.environ.get('SMTP_IDLE_TIMEOUT_SECONDS', 240)),
+)
+
+# Durable email outbox: purchases record a notification and return immediately,
+# a background sender delivers it with retries and dead-lettering. The file uses
+# SQLite WAL, which needs local disk: on App Service the working directory is the
+# /home network share, so the default lives in the instance's local temp directory.
+EMAIL_OUTBOX_PATH = os.environ.get('EMAIL_OUTBOX_PATH',
+                                   os.path.join(tempfile.gettempdir(), 'email_outbox.db'))
+EMAIL_OUTBOX_RETENTION_DAYS = float(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', 7))
+email_outbox = EmailOutbox(
+    EMAIL_OUTBOX_PATH,
+    max_attempts=int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)),
+    base_backoff=int(os.environ.get('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)),
+)
+
 # Cosmos DB configuration
 COSMOS_ENDPOINT = os.environ.get('COSMOS_ENDPOINT', '')
 COSMOS_KEY = os.environ.get('COSMOS_KEY', '')
 COSMOS_DATABASE = os.environ.get('COSMOS_DATABASE', 'wedding')
 COSMOS_CONTAINER = os.environ.get('COSMOS_CONTAINER', 'registry')
+# Keep the container's indexing policy in line with cosmos_indexing.py
+COSMOS_MANAGE_INDEXING = os.environ.get('COSMOS_MANAGE_INDEXING', 'true').lower() == 'true'
+# Partition key of the registry container: the legacy per-item `/id`, or
+# `/registry_id` after running migrate_registry_partitions.py
+registry_layout = RegistryLayout(os.environ.get('COSMOS_PARTITION_KEY', LEGACY_PARTITION_KEY),
+                                 os.environ.get('REGISTRY_ID', DEFAULT_REGISTRY_ID))
+_cosmos_container = None
+_cosmos_container_lock = threading.Lock()
+
+# Registry storage engine: 'cosmos' in production, or 'sqlite' to run the site,
+# load tests and benchmarks locally without Cosmos credentials
+REGISTRY_BACKEND = os.environ.get('REGISTRY_BACKEND', 'cosmos').lower()
+REGISTRY_SQLITE_PATH = os.environ.get('REGISTRY_SQLITE_PATH', 'registry.db')
+_sqlite_registry_store = None
 
 # Blob Storage configuration
 BLOB_CONNECTION_STRING = os.environ.get('BLOB_CONNECTION_STRING', '')
 BLOB_CONTAINER_NAME = os.environ.get('BLOB_CONTAINER_NAME', 'registry-images')
 
+# Read-through image caching: an uncached item is scheduled for a background
+# fetch into Blob Storage when it enters the read model, so pages use our cache
+REGISTRY_READ_THROUGH_CACHE = os.environ.get('REGISTRY_READ_THROUGH_CACHE', 'true').lower() == 'true'
+IMAGE_CACHE_RETRY_SECONDS = int(os.environ.get('IMAGE_CACHE_RETRY_SECONDS', 3600))
+# Attempts to record cached_image when the item keeps changing underneath
+IMAGE_CACHE_WRITE_ATTEMPTS = 3
+image_cache_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-cache')
+_image_cache_lock = threading.Lock()
+_image_cache_inflight = set()
+_image_cache_failures = {}
+
+# Live registry updates: write paths publish item changes, and open registry
+# pages receive them over Server-Sent Events. Each stream holds a worker
+# thread, so streams are capped and recycled; EventSource reconnects and
+# replays what it missed from the broker's recent history.
+REGISTRY_EVENTS_MAX_CLIENTS = int(os.environ.get('REGISTRY_EVENTS_MAX_CLIENTS', 64))
+REGISTRY_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('REGISTRY_EVENTS_HEARTBEAT_SECONDS', 15))
+REGISTRY_EVENTS_STREAM_SECONDS = float(os.environ.get('REGISTRY_EVENTS_STREAM_SECONDS', 300))
+registry_events = RegistryEventBroker(max_subscribers=REGISTRY_EVENTS_MAX_CLIENTS)
+
+# Versioned in-memory copy of the registry behind /api/registry delta sync.
+# Local writes update it immediately; it is re-read from Cosmos when older
+# than REGISTRY_SYNC_REFRESH_SECONDS to pick up changes made elsewhere.
+REGISTRY_SYNC_REFRESH_SECONDS = int(os.environ.get('REGISTRY_SYNC_REFRESH_SECONDS', 60))
+registry_model = RegistryReadModel(history=int(os.environ.get('REGISTRY_SYNC_HISTORY', 1000)))
+_registry_refresh_lock = threading.Lock()
+
+# Stale-while-revalidate: a model up to REGISTRY_STALE_WHILE_REVALIDATE_SECONDS
+# past its refresh age is served at once while a background thread re-reads
+# storage. If a re-read fails (Cosmos down or throttled), the last good copy
+# is still served for up to REGISTRY_STALE_IF_ERROR_SECONDS. That copy is
+# also saved to REGISTRY_SNAPSHOT_PATH so a cold-started worker can serve it
+# before storage answers; an empty path disables the snapshot.
+REGISTRY_STALE_WHILE_REVALIDATE_SECONDS = int(os.environ.get('REGISTRY_STALE_WHILE_REVALIDATE_SECONDS', 300))
+REGISTRY_STALE_IF_ERROR_SECONDS = int(os.environ.get('REGISTRY_STALE_IF_ERROR_SECONDS', 86400))
+REGISTRY_SNAPSHOT_PATH = os.environ.get('REGISTRY_SNAPSHOT_PATH', 'registry_snapshot.bin')
+registry_snapshot = RegistrySnapshot(REGISTRY_SNAPSHOT_PATH) if REGISTRY_SNAPSHOT_PATH else None
+
+# Encoded full-registry /api/registry bodies, keyed by model version, so an
+# unchanged registry is serialized once per format
+registry_json_cache = SerializedCache()
+registry_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='registry-refresh')
+_registry_background_lock = threading.Lock()
+_registry_background_jobs = set()
+_registry_snapshot_version = 0
+# Change feed cursor taken before the read saved as that snapshot version
+_registry_snapshot_cursor = None
+
+# Change feed: a background poller applies writes made by other workers and
+# instances to this worker's read model. While it is healthy the model is
+# trusted for REGISTRY_FEED_REFRESH_SECONDS instead of being re-read per page view
+REGISTRY_FEED_ENABLED = os.environ.get('REGISTRY_FEED_ENABLED', 'true').lower() == 'true'
+REGISTRY_FEED_POLL_SECONDS = float(os.environ.get('REGISTRY_FEED_POLL_SECONDS', 2))
+REGISTRY_FEED_REFRESH_SECONDS = int(os.environ.get('REGISTRY_FEED_REFRESH_SECONDS', 3600))
+REGISTRY_FEED_STATE_DIR = os.environ.get('REGISTRY_FEED_STATE_DIR', 'registry_feed')
+
+# Server-side sort/filter/pagination over the read model; the page renders the
+# first REGISTRY_PAGE_SIZE cards and loads the rest as the guest scrolls
+REGISTRY_PAGE_SIZE = int(os.environ.get('REGISTRY_PAGE_SIZE', 24))
+registry_query = RegistryQuery(registry_model)
+
+# Inverted index over titles, price buckets and availability for registry
+# search; it replays the read model's change log to stay current
+registry_search = RegistrySearchIndex()
+
+# Request-unit and latency accounting for every Cosmos call, per route; each
+# response reports its own cost in a Server-Timing header, and requests that
+# cost at least COSMOS_LOG_REQUEST_CHARGE RUs are logged
+cosmos_metrics = CosmosMetrics()
+COSMOS_LOG_REQUEST_CHARGE = float(os.environ.get('COSMOS_LOG_REQUEST_CHARGE', 20))
+
+
+def cosmos_scope():
+    """Route label and CosmosUsage for the Cosmos call being made"""
+    if not has_request_context():
+        return BACKGROUND_ROUTE, None
+    return request.endpoint or request.path, g.get('cosmos_usage')
+
+
+@app.before_request
+def start_cosmos_usage():
+    g.cosmos_usage = CosmosUsage()
+
+
+# HTML and JSON responses of at least RESPONSE_COMPRESSION_MIN_BYTES are
+# compressed (brotli or gzip, by Accept-Encoding) unless the route already
+# compressed them (the page cache does); images and the live-update stream
+# are left alone
+response_compressor = ResponseCompressor(
+    min_bytes=int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024)),
+    level=int(os.environ.get('RESPONSE_COMPRESSION_LEVEL', 6)),
+    brotli_quality=int(os.environ.get('RESPONSE_COMPRESSION_BROTLI_QUALITY', 4)),
+)
+
+
+@app.after_request
+def compress_response(response):
+    return response_compressor.compress(request, response)
+
+
+@app.after_request
+def report_cosmos_usage(response):
+    usage = g.get('cosmos_usage')
+    if usage is None or not usage.operations:
+        return response
+    timing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = (f"{timing}, " if timing else '') + usage.server_timing()
+    if usage.request_charge >= COSMOS_LOG_REQUEST_CHARGE:
+        app.logger.info(f"💸 {request.method} {request.path} used {usage.request_charge:.1f} RU "
+                        f"in {usage.operations} Cosmos calls ({usage.seconds * 1000:.0f} ms)")
+    return response
+
 
 def get_cosmos_container():
-    """Initialize and return the Cosmos DB container client"""
+    """Return the Cosmos DB container client, instrumented to record request
+    charges. The database, container and indexing policy are set up on first
+    use and the client is reused after.
+    """
+    global _cosmos_container
+    if _cosmos_container is not None:
+        return _cosmos_container
+
     if not COSMOS_AVAILABLE:
         app.logger.error("❌ Azure Cosmos DB library not available")
         return None
@@ -131,18 +320,47 @@ def get_cosmos_container():
         app.logger.error("❌ COSMOS_ENDPOINT or COSMOS_KEY not configured")
         return None
 
-    try:
-        client = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
-        database = client.create_database_if_not_exists(id=COSMOS_DATABASE)
-        container = database.create_container_if_not_exists(
-            id=COSMOS_CONTAINER,
-            partition_key=PartitionKey(path="/id"),
-            offer_throughput=400
-        )
-        return container
-    except Exception as e:
-        app.logger.error(f"❌ Error connecting to Cosmos DB: {e}")
+    with _cosmos_container_lock:
+        if _cosmos_container is not None:
+            return _cosmos_container
+        try:
+            client = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
+            database = client.create_database_if_not_exists(id=COSMOS_DATABASE)
+            partition_key = PartitionKey(path=registry_layout.path)
+            container = database.create_container_if_not_exists(
+                id=COSMOS_CONTAINER,
+                partition_key=partition_key,
+                indexing_policy=REGISTRY_INDEXING_POLICY,
+                default_ttl=REGISTRY_DEFAULT_TTL,
+                offer_throughput=400
+            )
+        except Exception as e:
+            app.logger.error(f"❌ Error connecting to Cosmos DB: {e}")
+            return None
+
+        if COSMOS_MANAGE_INDEXING:
+            try:
+                if ensure_indexing_policy(database, container, partition_key):
+                    app.logger.info("🗂️ Updated Cosmos DB indexing policy and TTL; re-indexing online")
+            except Exception as e:
+                app.logger.warning(f"⚠️ Could not check Cosmos DB indexing policy: {e}")
+
+        _cosmos_container = InstrumentedContainer(container, cosmos_metrics, cosmos_scope)
+        return _cosmos_container
+
+
+def get_registry_store():
+    """Return the configured registry store, or None when it is unavailable"""
+    global _sqlite_registry_store
+    if REGISTRY_BACKEND == 'sqlite':
+        if _sqlite_registry_store is None:
+            _sqlite_registry_store = SqliteRegistryStore(REGISTRY_SQLITE_PATH)
+        return _sqlite_registry_store
+
+    container = get_cosmos_container()
+    if not container:
         return None
+    return CosmosRegistryStore(container, registry_layout)
 
 
 def get_blob_container_client():
@@ -170,7 +388,9 @@ def get_blob_container_client():
 
 
 def cache_image_to_blob(image_url, item_id):
-    """Download an image from a URL and upload it to Azure Blob Storage.
+    """Download an image from a URL and store it in Azure Blob Storage.
+    Blobs are named by the SHA-256 of their bytes, so an image that is already
+    stored (added twice, or re-cached by the backfill) is not uploaded again.
     Returns the blob name on success, or None on failure.
     """
     container_client = get_blob_container_client()
@@ -178,35 +398,118 @@ def cache_image_to_blob(image_url, item_id):
         return None
 
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                          '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
-        }
-        resp = requests.get(image_url, headers=headers, timeout=15, stream=True)
-        resp.raise_for_status()
-
-        # Determine content type and extension
-        content_type = resp.headers.get('Content-Type', 'image/jpeg')
-        ext_map = {
-            'image/jpeg': '.jpg', 'image/png': '.png',
-            'image/webp': '.webp', 'image/gif': '.gif',
-        }
-        ext = ext_map.get(content_type.split(';')[0].strip(), '.jpg')
-        blob_name = f"{item_id}{ext}"
-
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.upload_blob(
-            resp.content,
-            overwrite=True,
-            content_settings=ContentSettings(content_type=content_type.split(';')[0].strip()),
-        )
-        app.logger.info(f"✅ Cached image for item {item_id} as {blob_name}")
+        blob_name, uploaded = store_image(container_client, image_url)
+        if uploaded:
+            app.logger.info(f"✅ Cached image for item {item_id} as {blob_name}")
+        else:
+            app.logger.info(f"♻️ Image for item {item_id} already stored as {blob_name}")
         return blob_name
     except Exception as e:
         app.logger.warning(f"⚠️ Could not cache image for item {item_id}: {e}")
         return None
 
 
+def release_cached_image(store, blob_name):
+    """Drop a reference to a cached image and delete the blob once nothing uses
+    it. A blob stored or reused within the GC grace period is kept, since
+    another item may be about to record it; `cache_registry_images.py --gc`
+    collects it later if it stays unused. Returns True if the blob was deleted.
+    """
+    if not blob_name:
+        return False
+
+    try:
+        if store.count_cached_image(blob_name) > 0:
+            return False
+
+        container_client = get_blob_container_client()
+        if not container_client:
+            return False
+        if not delete_unused_image(container_client, blob_name):
+            return False
+        app.logger.info(f"🗑️ Deleted orphaned image blob {blob_name}")
+        return True
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not release image blob {blob_name}: {e}")
+        return False
+
+
+def schedule_image_cache(item):
+    """Queue a background fetch-and-store for an item that has no cached image.
+    Requests for an item already in flight, or that failed recently, are ignored.
+    Returns True if a new job was scheduled.
+    """
+    if not REGISTRY_READ_THROUGH_CACHE or not BLOB_AVAILABLE or not BLOB_CONNECTION_STRING:
+        return False
+
+    item = as_registry_item(item)
+    item_id, image_url = item.id, item.image_url
+    if not image_url or item.cached_image:
+        return False
+
+    with _image_cache_lock:
+        if item_id in _image_cache_inflight:
+            return False
+        failed_at = _image_cache_failures.get(item_id)
+        if failed_at and time.monotonic() - failed_at < IMAGE_CACHE_RETRY_SECONDS:
+            return False
+        _image_cache_inflight.add(item_id)
+
+    try:
+        image_cache_executor.submit(_read_through_cache_image, item_id, image_url)
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not schedule image caching for item {item_id}: {e}")
+        with _image_cache_lock:
+            _image_cache_inflight.discard(item_id)
+        return False
+    return True
+
+
+def _read_through_cache_image(item_id, image_url):
+    """Background job: cache an item's image and record cached_image on the item"""
+    cached = False
+    try:
+        blob_name = cache_image_to_blob(image_url, item_id)
+        if not blob_name:
+            return
+
+        store = get_registry_store()
+        if not store:
+            return
+
+        # Set only cached_image, and only on the version of the item we checked,
+        # so a purchase or edit that lands meanwhile is never overwritten
+        for _ in range(IMAGE_CACHE_WRITE_ATTEMPTS):
+            item = store.get(item_id)
+            # Leave the item alone if an admin changed the image while we were fetching
+            if item.get('cached_image') or item.get('image_url') != image_url:
+                cached = True
+                return
+            try:
+                item = store.patch(item_id, {'cached_image': blob_name}, etag=item.get('_etag'))
+                break
+            except PreconditionFailed:
+                continue
+        else:
+            app.logger.warning(f"⚠️ Item {item_id} kept changing; not recording its cached image")
+            return
+
+        cached = True
+        app.logger.info(f"✅ Read-through cached image for item {item_id}")
+        # Cards are rendered with templates, which need an app context
+        with app.app_context():
+            publish_registry_change(EVENT_UPDATED, item)
+    except Exception as e:
+        app.logger.warning(f"⚠️ Read-through image caching failed for item {item_id}: {e}")
+    finally:
+        with _image_cache_lock:
+            _image_cache_inflight.discard(item_id)
+            if cached:
+                _image_cache_failures.pop(item_id, None)
+            else:
+                _image_cache_failures[item_id] = time.monotonic()
+
+
 def scrape_title_from_url(url):
     """Scrape title from product URL if title is missing"""
     result = scrape_product_metadata(url)
@@ -351,76 +654,464 @@ def ai_extract_product_info(url, html_snippet):
         app.logger.warning(f"AI extraction failed: {e}")
         return {}
 
+# Pages that are the same for every visitor are rendered once (again only
+# when their templates change) and served precompressed with strong ETags
+STATIC_PAGES = ('home.html', 'rsvp.html', 'venue.html', 'timeline.html')
+page_cache = PageCache(app)
+
 @app.route('/')
 def home():
     """Home page with wedding information"""
-    return render_template('home.html')
+    return page_cache.serve('home.html')
 
 @app.route('/rsvp')
 def rsvp():
     """RSVP page - to be configured later"""
-    return render_template('rsvp.html')
+    return page_cache.serve('rsvp.html')
 
 @app.route('/venue')
 def venue():
     """Venue page with location and photo gallery"""
-    return render_template('venue.html')
+    return page_cache.serve('venue.html')
 
 @app.route('/ourstory')
 def timeline():
     """Timeline page with relationship story"""
-    return render_template('timeline.html')
+    return page_cache.serve('timeline.html')
+
+def registry_card_json(item, include_card=False):
+    """Public fields of a RegistryItem for the JSON API; never exposes who bought it"""
+    data = {
+        'id': item.id,
+        'title': item.title,
+        'url': item.url,
+        'price': item.price,
+        'bought': item.bought,
+        'display_image_url': item.display_image_url,
+    }
+    if include_card:
+        data['html'] = render_template('_registry_card.html', item=item)
+    return data
+
+
+def registry_refresh_seconds():
+    """How long the read model is trusted: long while the change feed keeps it current"""
+    if registry_feed.healthy():
+        return REGISTRY_FEED_REFRESH_SECONDS
+    return REGISTRY_SYNC_REFRESH_SECONDS
+
+
+def refresh_registry_model(force=False):
+    """Make sure the read model can be served, re-reading storage as needed.
+
+    A model younger than its refresh age is served as is (`force` treats it
+    as due). One that is due but within REGISTRY_STALE_WHILE_REVALIDATE_SECONDS
+    of it is also served, and a background re-read is scheduled. Anything
+    older is re-read now; if that fails, a model younger than
+    REGISTRY_STALE_IF_ERROR_SECONDS is still served. A worker with nothing
+    loaded first restores the snapshot from disk.
+    Returns False when there is nothing that may be served.
+    """
+    if not registry_model.loaded:
+        restore_registry_snapshot()
+
+    max_age = 0 if force else registry_refresh_seconds()
+    age = registry_model.age()
+    if age is not None and age < max_age:
+        return True
+    if age is not None and age < max_age + REGISTRY_STALE_WHILE_REVALIDATE_SECONDS:
+        schedule_registry_background('refresh', load_registry_model)
+        return True
+
+    requested_at = time.monotonic()
+    try:
+        if load_registry_model(requested_at):
+            return True
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not load registry from storage: {e}")
+    age = registry_model.age()
+    return age is not None and age < REGISTRY_STALE_IF_ERROR_SECONDS
+
+
+def load_registry_model(requested_at=None):
+    """Re-read the whole registry from storage into the read model and save
+    it as the snapshot. Skipped if another thread finished a load after
+    `requested_at`. Returns False when storage is unavailable; raises on
+    storage errors.
+    """
+    with _registry_refresh_lock:
+        if _loaded_since(requested_at):
+            return True
+        store = get_registry_store()
+        if not store:
+            return False
+        # Every change after this cursor is either in the read or replayed by the feed
+        feed_cursor = registry_feed.cursor
+        read_at = time.time()
+        items = [RegistryItem.from_document(document) for document in store.list_items()]
+        registry_model.load(items, read_at=read_at)
+        save_registry_snapshot(items, read_at, feed_cursor)
+    # Read-through image caching for items that don't have a cached copy yet
+    for item in items:
+        schedule_image_cache(item)
+    return True
+
+
+def _loaded_since(requested_at):
+    """True if the read model was loaded after the monotonic time `requested_at`"""
+    age = registry_model.age()
+    return requested_at is not None and age is not None and time.monotonic() - age > requested_at
+
+
+def schedule_registry_background(name, job):
+    """Run a registry job on the background thread unless one of the same
+    name is already queued or running. Returns True if it was scheduled.
+    """
+    with _registry_background_lock:
+        if name in _registry_background_jobs:
+            return False
+        _registry_background_jobs.add(name)
+
+    def run():
+        with _registry_background_lock:
+            _registry_background_jobs.discard(name)
+        try:
+            job()
+        except Exception as e:
+            app.logger.warning(f"⚠️ Background registry {name} failed: {e}")
+
+    try:
+        registry_refresh_executor.submit(run)
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not schedule registry {name}: {e}")
+        with _registry_background_lock:
+            _registry_background_jobs.discard(name)
+        return False
+    return True
+
+
+def save_registry_snapshot(items, read_at, feed_cursor=None):
+    """Save a full storage read as the next snapshot version, and checkpoint
+    the change feed cursor taken before the read with it
+    """
+    global _registry_snapshot_version, _registry_snapshot_cursor
+    if registry_snapshot is None:
+        return
+    try:
+        version = registry_snapshot.save(items, saved_at=read_at)
+    except OSError as e:
+        app.logger.warning(f"⚠️ Could not save registry snapshot: {e}")
+        return
+    _registry_snapshot_version, _registry_snapshot_cursor = version, feed_cursor
+    registry_feed.save_checkpoint()
+
+
+def restore_registry_snapshot():
+    """Load the on-disk snapshot into an empty read model, keeping its age so
+    it is revalidated. Returns True if one was restored.
+    """
+    global _registry_snapshot_version, _registry_snapshot_cursor
+    if registry_snapshot is None:
+        return False
+    snapshot = registry_snapshot.current()
+    if snapshot is None or snapshot.age() > REGISTRY_STALE_IF_ERROR_SECONDS:
+        return False
+    with _registry_refresh_lock:
+        if registry_model.loaded:
+            return False
+        registry_model.load(snapshot.items(), read_at=snapshot.saved_at)
+        _registry_snapshot_version = snapshot.version
+        _registry_snapshot_cursor = None
+    app.logger.info(f"💾 Restored registry snapshot v{snapshot.version} "
+                    f"({len(snapshot)} items, {snapshot.age():.0f}s old)")
+    return True
+
+
+def registry_staleness():
+    """Return (age, stale) for the read model: its age in whole seconds, and
+    whether it is being served past the stale-while-revalidate window
+    because storage could not be re-read
+    """
+    age = registry_model.age()
+    if age is None:
+        return None, False
+    return int(age), age >= registry_refresh_seconds() + REGISTRY_STALE_WHILE_REVALIDATE_SECONDS
+
+
+def mark_registry_staleness(response):
+    """Report the read model's age on a registry response"""
+    age, stale = registry_staleness()
+    if age is not None:
+        response.headers['X-Registry-Age'] = str(age)
+        if stale:
+            response.headers['X-Registry-Stale'] = '1'
+    return response
+
+
+def apply_registry_change(change):
+    """Apply one change-feed entry to this worker's read model and push it to
+    open pages. Writes this worker made are already in the model and are
+    skipped. Returns True if the model changed.
+    """
+    current = registry_model.get(change.item_id)
+    if change.deleted:
+        event_type, item = EVENT_REMOVED, {'id': change.item_id}
+        if current is None:
+            return False
+    else:
+        item = RegistryItem.from_document(change.item)
+        if current == item:
+            return False
+        if current is None:
+            event_type = EVENT_ADDED
+        elif item.bought and not current.bought:
+            event_type = EVENT_BOUGHT
+        else:
+            event_type = EVENT_UPDATED
+    # Cards are rendered with templates, which need an app context
+    with app.app_context():
+        publish_registry_change(event_type, item)
+    return True
+
+
+def registry_feed_checkpoint_state():
+    """The snapshot version the read model last matched and the feed cursor
+    that goes with it, saved in each change feed checkpoint
+    """
+    return {'snapshot_version': _registry_snapshot_version,
+            'snapshot_cursor': _registry_snapshot_cursor}
+
+
+def resume_registry_feed(state):
+    """Continue the change feed without a full read when this worker restored
+    the snapshot the checkpoint was taken with. Returns the cursor saved with
+    that snapshot, which is older than the checkpoint's own cursor: changes
+    applied after the snapshot was saved are not in it and are replayed.
+    Returns None (bootstrap) for any other snapshot, or one old enough that
+    deletes after it may have expired from the change feed.
+    """
+    global _registry_snapshot_cursor
+    if not registry_model.loaded:
+        restore_registry_snapshot()
+    cursor = state.get('snapshot_cursor')
+    age = registry_model.age()
+    if (not cursor or state.get('snapshot_version') != _registry_snapshot_version
+            or age is None or age >= TOMBSTONE_TTL_SECONDS):
+        return None
+    _registry_snapshot_cursor = cursor
+    app.logger.info(f"📡 Resuming registry change feed from snapshot v{_registry_snapshot_version}")
+    return cursor
+
+
+registry_feed = RegistryChangeFeed(
+    get_registry_store,
+    apply_registry_change,
+    bootstrap=load_registry_model,
+    resume=resume_registry_feed,
+    interval=REGISTRY_FEED_POLL_SECONDS,
+    lease=FeedLease(REGISTRY_FEED_STATE_DIR, default_consumer_name()),
+    logger=app.logger,
+    checkpoint_state=registry_feed_checkpoint_state,
+)
+
+
+def publish_registry_change(event_type, item):
+    """Record an item change (a stored document or RegistryItem) in the read
+    model and broadcast it to open registry pages. Never fails the write
+    that triggered it.
+    """
+    try:
+        if event_type == EVENT_REMOVED:
+            registry_model.remove(item['id'])
+            data = {'id': item['id']}
+        else:
+            item = as_registry_item(item)
+            registry_model.upsert(item)
+            schedule_image_cache(item)
+            data = {
+                'id': item.id,
+                'bought': item.bought,
+                'html': render_template('_registry_card.html', item=item),
+            }
+        data['version'] = registry_model.cursor()
+        registry_events.publish(event_type, data)
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not publish registry {event_type} event: {e}")
+
+
+def parse_registry_query(args):
+    """Read sort, filters, cursor and page size from query-string arguments.
+    Raises ValueError for malformed values.
+    """
+    def price(name):
+        value = args.get(name, '').strip().lstrip('$')
+        return float(value) if value else None
+
+    filters = RegistryFilters(
+        available_only=args.get('available') in ('1', 'true', 'on'),
+        min_price=price('min_price'),
+        max_price=price('max_price'),
+        title=args.get('q', '').strip() or None,
+    )
+    sort = args.get('sort') or DEFAULT_SORT
+    limit = int(args.get('limit') or REGISTRY_PAGE_SIZE)
+    return sort, filters, args.get('cursor') or None, limit
+
+
+def apply_registry_search(filters):
+    """Resolve a free-text search in the filters to matching item ids"""
+    if not filters.title:
+        return filters
+    registry_search.sync(registry_model)
+    return filters._replace(ids=registry_search.match_ids(filters.title))
+
 
 @app.route('/registry')
 def registry():
-    """Registry page displaying items from Cosmos DB"""
+    """Registry page showing the first page of items from Cosmos DB"""
+    try:
+        sort, filters, cursor, limit = parse_registry_query(request.args)
+    except ValueError:
+        sort, filters, cursor, limit = DEFAULT_SORT, RegistryFilters(), None, REGISTRY_PAGE_SIZE
+
     try:
-        container = get_cosmos_container()
-        if not container:
+        # The page revalidates the read model unless the change feed is keeping
+        # it current; later pages always use the read model
+        if not refresh_registry_model(force=not registry_feed.healthy()):
             flash('Unable to load registry at this time. Please try again later.', 'error')
-            return render_template('registry.html', items=[])
+            return render_template('registry.html', items=[], sort=sort, filters=filters)
+
+        filters = apply_registry_search(filters)
+        try:
+            page = registry_query.page(sort, filters, cursor, limit)
+        except ValueError:
+            sort = DEFAULT_SORT
+            page = registry_query.page(sort, filters, None, limit)
+        age, stale = registry_staleness()
+        html = render_template('registry.html', items=page.items, sort=sort, filters=filters,
+                               next_cursor=page.next_cursor, registry_version=page.version,
+                               registry_stale=stale, registry_age=age)
+        return mark_registry_staleness(app.make_response(html))
+
+    except Exception as e:
+        app.logger.error(f"Error loading registry: {e}")
+        flash('Unable to load registry at this time. Please try again later.', 'error')
+        return render_template('registry.html', items=[], sort=sort, filters=filters)
 
-        query = "SELECT * FROM c"
-        raw_items = list(container.query_items(query=query, enable_cross_partition_query=True))
 
-        items = []
-        for item in raw_items:
-            # Scrape title if missing
-            if not item.get('title') and item.get('url'):
-                item['title'] = scrape_title_from_url(item['url'])
+@app.route('/registry/items')
+def registry_items():
+    """One page of registry cards as HTML, for sorting, filtering and infinite scroll"""
+    try:
+        sort, filters, cursor, limit = parse_registry_query(request.args)
+        if not refresh_registry_model():
+            return jsonify({'error': 'Unable to load registry'}), 503
+        page = registry_query.page(sort, apply_registry_search(filters), cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error loading registry items: {e}")
+        return jsonify({'error': 'Unable to load registry'}), 500
 
-            # Ensure numeric types
-            try:
-                item['price'] = float(item.get('price', 0)) if item.get('price') else 0
-            except (ValueError, TypeError):
-                item['price'] = 0
+    html = ''.join(render_template('_registry_card.html', item=item) for item in page.items)
+    return mark_registry_staleness(jsonify({'html': html, 'count': len(page.items),
+                                            'next_cursor': page.next_cursor,
+                                            'version': page.version}))
 
-            # Use cached image URL if available
-            if item.get('cached_image'):
-                item['display_image_url'] = url_for('registry_image', blob_name=item['cached_image'])
-            else:
-                item['display_image_url'] = item.get('image_url', '')
 
-            items.append(item)
+@app.route('/api/registry')
+def api_registry():
+    """Registry items as JSON. Pass since=<version> from a previous response to
+    receive only the items changed or removed since then; 304 if nothing changed.
+    """
+    try:
+        if not refresh_registry_model():
+            return jsonify({'error': 'Unable to load registry'}), 503
+    except Exception as e:
+        app.logger.error(f"Error refreshing registry model: {e}")
+        if not registry_model.loaded:
+            return jsonify({'error': 'Unable to load registry'}), 503
+
+    since = request.args.get('since')
+    full, items, removed, version = registry_model.changes_since(since)
+    headers = {'ETag': f'"{version}"', 'Cache-Control': 'no-cache'}
+    if (not full and not items and not removed) or request.if_none_match.contains_weak(version):
+        return mark_registry_staleness(Response(status=304, headers=headers))
+
+    include_cards = request.args.get('cards') == '1'
+    stale = registry_staleness()[1]
+
+    def payload():
+        return {
+            'version': version,
+            'full': full,
+            'items': [registry_card_json(item, include_cards) for item in items],
+            'removed': removed,
+            'stale': stale,
+        }
 
-        # Sort by price
-        items.sort(key=lambda x: x['price'])
+    # Deltas differ per client cursor; full listings are the same for everyone
+    cache_key = ('registry', version, include_cards, stale) if full else None
+    return mark_registry_staleness(negotiated_response(
+        app, request, payload, headers=headers, cache=registry_json_cache, cache_key=cache_key))
 
-        return render_template('registry.html', items=items)
 
+@app.route('/api/registry/search')
+def api_registry_search():
+    """Search registry items by title words (prefix-matched), price phrases such
+    as "under $50", and availability words such as "unbought"
+    """
+    text = request.args.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.args.get('limit') or 20), 100))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+
+    try:
+        if not refresh_registry_model():
+            return jsonify({'error': 'Unable to load registry'}), 503
     except Exception as e:
-        app.logger.error(f"Error loading registry: {e}")
-        flash('Unable to load registry at this time. Please try again later.', 'error')
-        return render_template('registry.html', items=[])
+        app.logger.error(f"Error refreshing registry model: {e}")
+        if not registry_model.loaded:
+            return jsonify({'error': 'Unable to load registry'}), 503
+
+    registry_search.sync(registry_model)
+    query = parse_query(text)
+    ids = registry_search.search(query, limit)
+    include_cards = request.args.get('cards') == '1'
+    items = [registry_card_json(item, include_cards)
+             for item in (registry_model.get(item_id) for item_id in ids) if item is not None]
+    return mark_registry_staleness(negotiated_response(
+        app, request, {'query': query._asdict(), 'count': len(items), 'items': items}))
+
+
+@app.route('/registry/events')
+def registry_events_stream():
+    """Server-Sent Events stream of registry item changes"""
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    subscription, missed = registry_events.subscribe(last_event_id)
+    if subscription is None:
+        return Response('Too many open registry streams\n', status=503, mimetype='text/plain',
+                        headers={'Retry-After': '30'})
+
+    response = Response(
+        registry_events.stream(subscription, missed,
+                               heartbeat=REGISTRY_EVENTS_HEARTBEAT_SECONDS,
+                               max_duration=REGISTRY_EVENTS_STREAM_SECONDS),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # Covers clients that disconnect before the stream generator ever starts
+    response.call_on_close(lambda: registry_events.unsubscribe(subscription))
+    return response
 
 
-@app.route('/registry/image/<blob_name>')
+@app.route(CACHED_IMAGE_PATH + '<blob_name>')
 def registry_image(blob_name):
     """Serve a cached registry image from Azure Blob Storage"""
     from flask import Response
 
     # Sanitize blob_name to prevent path traversal
-    import re
     if not re.match(r'^[a-zA-Z0-9_-]+\.\w{2,4}$', blob_name):
         return '', 404
 
@@ -433,17 +1124,20 @@ def registry_image(blob_name):
         download = blob_client.download_blob()
         content_type = download.properties.content_settings.content_type or 'image/jpeg'
 
-        return Response(
-            download.readall(),
-            content_type=content_type,
-            headers={
-                'Cache-Control': 'public, max-age=604800',  # 7 days
-            },
-        )
+        if CONTENT_HASH_BLOB_PATTERN.match(blob_name):
+            # Content-addressed blobs never change, so browsers can keep them forever
+            headers = {
+                'Cache-Control': 'public, max-age=31536000, immutable',
+                'ETag': f'"{blob_name.split(".")[0]}"',
+            }
+        else:
+            headers = {'Cache-Control': 'public, max-age=604800'}  # 7 days
+
+        return Response(download.readall(), content_type=content_type, headers=headers)
     except Exception:
         return '', 404
 
-def send_email_via_azure(to_email, subject, body, from_email=None):
+def send_email_via_azure(to_email, subject, body, from_email=None, html=None):
     """
     Send email using Azure Communication Services
     """
@@ -460,11 +1154,7 @@ def send_email_via_azure(to_email, subject, body, from_email=None):
             app.logger.warning("❌ Azure Communication Services not configured - no connection string")
             return False
             
-        app.logger.info("🔗 Azure connection string found, initializing client...")
-        
-        # Initialize the EmailClient
-        email_client = EmailClient.from_connection_string(connection_string)
-        app.logger.info("✅ EmailClient initialized successfully")
+        app.logger.info("🔗 Azure connection string found, using shared client...")
         
         # Set default from email - try Azure managed domain first
         if not from_email:
@@ -491,12 +1181,13 @@ def send_email_via_azure(to_email, subject, body, from_email=None):
                 "plainText": body
             }
         }
+        if html:
+            message["content"]["html"] = html
         
         app.logger.info("📧 Sending email via Azure Communication Services...")
         
-        # Send the email
-        poller = email_client.begin_send(message)
-        result = poller.result()
+        # Send the email through the long-lived EmailClient
+        result = acs_transport.send(connection_string, message)
         
         app.logger.info(f"✅ Email sent via Azure Communication Services. Operation ID: {result['id']}")
         return True
@@ -524,50 +1215,36 @@ def send_registry_notification_email(data):
     Send registry purchase notification - tries Azure first, then SMTP fallback
     """
     to_email = os.environ.get('EMAIL_TO_ADDRESS', 'bp32795@gmail.com')
-    subject = f"Registry Item Purchased: {data['item_title']}"
+    rendered = render_purchase_email(data)
     
     app.logger.info(f"📧 Preparing email notification:")
     app.logger.info(f"   To: {to_email}")
-    app.logger.info(f"   Subject: {subject}")
+    app.logger.info(f"   Subject: {rendered.subject}")
     app.logger.info(f"   Item: {data['item_title']}")
     app.logger.info(f"   Buyer: {data['name']}")
     
-    body = f"""
-Someone has purchased an item from your wedding registry!
-
-Details:
-- Item: {data['item_title']}
-- Purchased by: {data['name']}
-- Purchase date: {data['purchase_date']}
-- Item URL: {data['item_url']}"""
-
-    # Add delivery date if provided
-    if data.get('delivery_date'):
-        body += f"\n- Estimated delivery: {data['delivery_date']}"
-    
-    # Add note if provided
-    if data.get('note'):
-        body += f"""
+    return deliver_notification_email(to_email, rendered)
 
-Personal message from {data['name']}:
-"{data['note']}"
-"""
-    
-    body += """
 
-Congratulations!
+def send_registry_digest_email(events):
+    """
+    Send one combined notification covering several registry purchases
+    """
+    to_email = os.environ.get('EMAIL_TO_ADDRESS', 'bp32795@gmail.com')
+    app.logger.info(f"📧 Preparing digest notification for {len(events)} purchases")
+    return deliver_notification_email(to_email, render_digest_email(events))
 
----
-Menke & Vacca Wedding Registry
-https://menkevaccawedding.azurewebsites.net
-"""
-    
+
+def deliver_notification_email(to_email, rendered):
+    """
+    Deliver a rendered notification - tries Azure first, then SMTP fallback
+    """
     # Check Azure Communication Services first
     azure_connection = os.environ.get('AZURE_COMMUNICATION_CONNECTION_STRING')
     app.logger.info(f"🔍 Azure Connection String configured: {azure_connection is not None}")
     if azure_connection:
         app.logger.info("🔄 Trying Azure Communication Services...")
-        if send_email_via_azure(to_email, subject, body):
+        if send_email_via_azure(to_email, rendered.subject, rendered.text, html=rendered.html):
             app.logger.info("✅ Email sent via Azure Communication Services")
             return True
         else:
@@ -575,22 +1252,23 @@ https://menkevaccawedding.azurewebsites.net
     else:
         app.logger.info("ℹ️ Azure Communication Services not configured, trying SMTP")
     
-    # Fall back to SMTP (Gmail/SendGrid)
+    # Fall back to SMTP (Gmail/SendGrid, or the local dev server)
     mail_username = app.config.get('MAIL_USERNAME')
     mail_suppress = app.config.get('MAIL_SUPPRESS_SEND')
     app.logger.info(f"🔍 SMTP configured: {mail_username is not None}")
     app.logger.info(f"🔍 SMTP suppressed: {mail_suppress}")
     
     try:
-        if mail_username and not mail_suppress:
-            app.logger.info("🔄 Sending via SMTP...")
-            msg = Message(
-                subject=subject,
-                recipients=[to_email],
-                sender=app.config['MAIL_DEFAULT_SENDER'],
-                body=body
-            )
-            mail.send(msg)
+        if (mail_username or use_local_smtp) and not mail_suppress:
+            app.logger.info("🔄 Sending via pooled SMTP connection...")
+            msg = EmailMessage()
+            msg['Subject'] = rendered.subject
+            msg['From'] = app.config['MAIL_DEFAULT_SENDER']
+            msg['To'] = to_email
+            msg.set_content(rendered.text)
+            if rendered.html:
+                msg.add_alternative(rendered.html, subtype='html')
+            smtp_transport.send(msg)
             app.logger.info("✅ Email sent via SMTP")
             return True
         else:
@@ -600,6 +1278,98 @@ https://menkevaccawedding.azurewebsites.net
         app.logger.error(f"❌ Error sending email via SMTP: {e}")
         return False
 
+def deliver_outbox_notification(record):
+    """Deliver one outbox record; called from the background sender thread"""
+    with app.app_context():
+        if record['kind'] == 'registry_purchase':
+            return send_registry_notification_email(record['payload'])
+        app.logger.error(f"❌ Unknown notification kind: {record['kind']}")
+        return False
+
+
+def deliver_outbox_digest(records):
+    """Deliver several purchase records as one digest email"""
+    with app.app_context():
+        return send_registry_digest_email([record['payload'] for record in records])
+
+
+# Digest mode collects purchases for a window (or up to N events) per email
+NOTIFICATION_MODE = os.environ.get('NOTIFICATION_MODE', 'immediate').lower()
+NOTIFICATION_DIGEST_WINDOW_MINUTES = float(os.environ.get('NOTIFICATION_DIGEST_WINDOW_MINUTES', 15))
+NOTIFICATION_DIGEST_MAX_EVENTS = int(os.environ.get('NOTIFICATION_DIGEST_MAX_EVENTS', 20))
+
+digest_policy = None
+if NOTIFICATION_MODE == 'digest':
+    digest_policy = DigestPolicy(
+        'registry_purchase',
+        deliver_outbox_digest,
+        window_seconds=NOTIFICATION_DIGEST_WINDOW_MINUTES * 60,
+        max_events=NOTIFICATION_DIGEST_MAX_EVENTS,
+    )
+
+outbox_sender = OutboxSender(email_outbox, deliver_outbox_notification, logger=app.logger,
+                             digest=digest_policy,
+                             retention_seconds=EMAIL_OUTBOX_RETENTION_DAYS * 24 * 3600)
+
+
+def start_background_workers():
+    """Start background threads (email outbox sender, registry change feed)
+    for this worker process and render the cached pages
+    """
+    try:
+        page_cache.warm(STATIC_PAGES)
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not pre-render pages: {e}")
+    outbox_sender.start()
+    if REGISTRY_FEED_ENABLED:
+        registry_feed.start()
+
+
+def queue_purchase_notification(email_data):
+    """Record a purchase notification in the outbox and wake the sender"""
+    notification_id = email_outbox.enqueue('registry_purchase', email_data)
+    outbox_sender.start()
+    outbox_sender.wake()
+    return notification_id
+
+
+PURCHASE_OK = 'purchased'
+PURCHASE_DUPLICATE = 'duplicate'
+PURCHASE_CONFLICT = 'conflict'
+PURCHASE_NOT_FOUND = 'not_found'
+
+def mark_item_purchased(store, item_id, name, idempotency_key=''):
+    """Mark an item bought with a single conditional patch.
+    Returns (outcome, item): PURCHASE_OK for the one request that wins,
+    PURCHASE_DUPLICATE when the item was already bought with the same idempotency
+    key (a client retry), PURCHASE_CONFLICT when someone else bought it, or
+    PURCHASE_NOT_FOUND with item None. Raises on any other storage failure, so the
+    caller never reports a false success.
+    """
+    changes = {
+        'bought': True,
+        'bought_by': name,
+        'purchase_key': idempotency_key,
+        'purchased_at': datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        return PURCHASE_OK, store.patch(item_id, changes, only_if_unbought=True)
+    except ItemNotFound:
+        return PURCHASE_NOT_FOUND, None
+    except PreconditionFailed:
+        pass
+
+    # The predicate failed: the item is already bought. Only now pay for a read,
+    # to tell a retry of our own purchase apart from someone else's.
+    try:
+        item = store.get(item_id)
+    except ItemNotFound:
+        return PURCHASE_NOT_FOUND, None
+    if idempotency_key and item.get('purchase_key') == idempotency_key:
+        return PURCHASE_DUPLICATE, item
+    return PURCHASE_CONFLICT, item
+
+
 @app.route('/purchase_item', methods=['POST'])
 def purchase_item():
     """Handle item purchase form submission"""
@@ -618,22 +1388,35 @@ def purchase_item():
 
         app.logger.info("✅ All required fields present")
 
-        # Update Cosmos DB
-        container = get_cosmos_container()
-        if not container:
-            app.logger.error("❌ Unable to connect to Cosmos DB")
+        # Update the registry
+        store = get_registry_store()
+        if not store:
+            app.logger.error("❌ Unable to connect to registry storage")
             return jsonify({'error': 'Unable to connect to registry system'}), 500
 
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key') or ''
         try:
-            item = container.read_item(item=data['item_id'], partition_key=data['item_id'])
-            item['bought'] = True
-            item['bought_by'] = data['name']
-            container.replace_item(item=item['id'], body=item)
-            app.logger.info("✅ Cosmos DB updated successfully")
+            outcome, item = mark_item_purchased(store, data['item_id'], data['name'],
+                                                idempotency_key)
         except Exception as e:
-            app.logger.warning(f"⚠️ Could not update item {data['item_id']}: {e}")
-
-        # Send email notification
+            app.logger.error(f"❌ Could not update item {data['item_id']}: {e}")
+            return jsonify({'error': 'We could not record your purchase. Please try again.'}), 500
+
+        if outcome == PURCHASE_NOT_FOUND:
+            return jsonify({'error': 'This item is no longer on the registry'}), 404
+        if outcome == PURCHASE_CONFLICT:
+            app.logger.info(f"🚫 Item {data['item_id']} was already purchased")
+            return jsonify({'error': 'Sorry, this item has already been purchased.',
+                            'already_purchased': True}), 409
+        if outcome == PURCHASE_DUPLICATE:
+            # A retry of a purchase that already went through; its email is already queued
+            app.logger.info(f"🔁 Duplicate purchase request for item {data['item_id']}")
+            return jsonify({'success': True, 'message': 'Thank you for your purchase!'})
+
+        app.logger.info("✅ Cosmos DB updated successfully")
+        publish_registry_change(EVENT_BOUGHT, item)
+
+        # Queue email notification; the outbox sender delivers it in the background
         try:
             email_data = {
                 'item_title': data['item_title'],
@@ -643,13 +1426,10 @@ def purchase_item():
                 'delivery_date': data.get('delivery_date', ''),
                 'note': data.get('note', '')
             }
-            email_sent = send_registry_notification_email(email_data)
-            if email_sent:
-                app.logger.info(f"✅ Email notification sent for: {data['item_title']}")
-            else:
-                app.logger.warning(f"⚠️ Email not sent - purchase recorded: {data['item_title']}")
+            notification_id = queue_purchase_notification(email_data)
+            app.logger.info(f"📬 Email notification {notification_id} queued for: {data['item_title']}")
         except Exception as e:
-            app.logger.error(f"❌ Error sending email: {e}")
+            app.logger.error(f"❌ Error queueing email notification: {e}")
 
         return jsonify({'success': True, 'message': 'Thank you for your purchase!'})
 
@@ -664,23 +1444,73 @@ def purchase_item():
 def registry_admin():
     """Admin page for managing registry items"""
     try:
-        container = get_cosmos_container()
-        items = []
-        if container:
-            query = "SELECT * FROM c"
-            items = list(container.query_items(query=query, enable_cross_partition_query=True))
-        return render_template('registry_admin.html', items=items)
+        store = get_registry_store()
+        items = store.list_all() if store else []
+        return render_template('registry_admin.html', items=items,
+                               dead_notifications=dead_notification_count())
     except Exception as e:
         app.logger.error(f"Error loading admin page: {e}")
-        return render_template('registry_admin.html', items=[])
+        return render_template('registry_admin.html', items=[], dead_notifications=0)
+
+
+def dead_notification_count():
+    """Number of dead-lettered notifications, or 0 if the outbox can't be read"""
+    try:
+        return email_outbox.stats()['counts']['dead']
+    except Exception as e:
+        app.logger.warning(f"⚠️ Could not read email outbox: {e}")
+        return 0
+
+
+@app.route('/registry/admin/outbox')
+def registry_admin_outbox():
+    """Email outbox queue depth and delivery latency"""
+    try:
+        stats = email_outbox.stats()
+        stats['sender'] = outbox_sender.metrics()
+        return jsonify(stats)
+    except Exception as e:
+        app.logger.error(f"Error reading email outbox stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/registry/admin/outbox/retry', methods=['POST'])
+def registry_admin_outbox_retry():
+    """Move dead-lettered notifications back into the queue and wake the sender"""
+    try:
+        retried = email_outbox.retry_dead()
+        if retried:
+            outbox_sender.start()
+            outbox_sender.wake()
+        app.logger.info(f"🔁 Requeued {retried} dead-lettered notifications")
+        return jsonify({'success': True, 'retried': retried})
+    except Exception as e:
+        app.logger.error(f"Error retrying dead-lettered notifications: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/registry/admin/cosmos')
+def registry_admin_cosmos():
+    """Cosmos DB request units and latency per route and operation"""
+    return jsonify(cosmos_metrics.snapshot())
+
+
+@app.route('/registry/admin/feed')
+def registry_admin_feed():
+    """Change feed consumer status: polls, applied changes, checkpoint, and
+    the age of the read model it keeps current
+    """
+    age, stale = registry_staleness()
+    return jsonify(dict(registry_feed.metrics(), model_age_seconds=age, model_stale=stale,
+                        snapshot_version=_registry_snapshot_version))
 
 
 @app.route('/registry/admin/add', methods=['POST'])
 def registry_admin_add():
     """Add a new registry item"""
     try:
-        container = get_cosmos_container()
-        if not container:
+        store = get_registry_store()
+        if not store:
             return jsonify({'error': 'Unable to connect to database'}), 500
 
         data = request.get_json()
@@ -705,7 +1535,8 @@ def registry_admin_add():
             if blob_name:
                 item['cached_image'] = blob_name
 
-        container.create_item(body=item)
+        item = store.create(item)
+        publish_registry_change(EVENT_ADDED, item)
         return jsonify({'success': True, 'item': item})
 
     except Exception as e:
@@ -717,8 +1548,8 @@ def registry_admin_add():
 def registry_admin_delete():
     """Delete a registry item"""
     try:
-        container = get_cosmos_container()
-        if not container:
+        store = get_registry_store()
+        if not store:
             return jsonify({'error': 'Unable to connect to database'}), 500
 
         data = request.get_json()
@@ -726,7 +1557,12 @@ def registry_admin_delete():
         if not item_id:
             return jsonify({'error': 'Item ID required'}), 400
 
-        container.delete_item(item=item_id, partition_key=item_id)
+        item = store.get(item_id)
+        store.delete(item_id)
+
+        # Garbage-collect the cached image if no other item shares it
+        release_cached_image(store, item.get('cached_image'))
+        publish_registry_change(EVENT_REMOVED, item)
         return jsonify({'success': True})
 
     except Exception as e:
@@ -738,8 +1574,8 @@ def registry_admin_delete():
 def registry_admin_edit():
     """Edit a registry item"""
     try:
-        container = get_cosmos_container()
-        if not container:
+        store = get_registry_store()
+        if not store:
             return jsonify({'error': 'Unable to connect to database'}), 500
 
         data = request.get_json()
@@ -747,19 +1583,31 @@ def registry_admin_edit():
         if not item_id:
             return jsonify({'error': 'Item ID required'}), 400
 
-        item = container.read_item(item=item_id, partition_key=item_id)
-        # Update only provided fields
-        for field in ['url', 'title', 'image_url']:
-            if field in data:
-                item[field] = data[field]
+        # Patch only the provided fields instead of rewriting the whole document
+        changes = {field: data[field] for field in ('url', 'title', 'bought_by') if field in data}
         if 'price' in data:
-            item['price'] = float(data['price'])
+            changes['price'] = float(data['price'])
         if 'bought' in data:
-            item['bought'] = bool(data['bought'])
-        if 'bought_by' in data:
-            item['bought_by'] = data['bought_by']
-
-        container.replace_item(item=item_id, body=item)
+            changes['bought'] = bool(data['bought'])
+
+        # A new image URL invalidates the cached copy; read-through recaches it.
+        # Only then do we need the current document, to know which blob to release.
+        released_image = ''
+        etag = None
+        if 'image_url' in data:
+            current = store.get(item_id)
+            if data['image_url'] != current.get('image_url'):
+                released_image = current.get('cached_image', '')
+                changes['image_url'] = data['image_url']
+                changes['cached_image'] = ''
+                etag = current.get('_etag')
+
+        if changes:
+            item = store.patch(item_id, changes, etag=etag)
+        else:
+            item = store.get(item_id)
+        release_cached_image(store, released_image)
+        publish_registry_change(EVENT_UPDATED, item)
         return jsonify({'success': True, 'item': item})
 
     except Exception as e:
@@ -845,6 +1693,8 @@ def internal_error(error):
     return render_template('500.html'), 500
 
 if __name__ == '__main__':
+    start_background_workers()
+
     # Start local SMTP server if in development mode
     if use_local_smtp:
         try:
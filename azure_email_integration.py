@@ -4,7 +4,9 @@
 from azure.communication.email import EmailClient
 import os
 
-def send_email_via_azure(to_email, subject, body, from_email=None):
+from email_templates import render_purchase_email
+
+def send_email_via_azure(to_email, subject, body, from_email=None, html=None):
     """
     Send email using Azure Communication Services
     """
@@ -33,6 +35,8 @@ def send_email_via_azure(to_email, subject, body, from_email=None):
                 "plainText": body
             }
         }
+        if html:
+            message["content"]["html"] = html
         
         # Send the email
         poller = email_client.begin_send(message)
@@ -50,25 +54,8 @@ def send_registry_notification_azure(item_data):
     Send registry purchase notification using Azure Communication Services
     """
     to_email = os.environ.get('EMAIL_TO_ADDRESS', 'bp32795@gmail.com')
-    subject = f"Registry Item Purchased: {item_data['item_title']}"
-    
-    body = f"""
-Someone has purchased an item from your wedding registry!
-
-Details:
-- Item: {item_data['item_title']}
-- Purchased by: {item_data['name']}
-- Purchase date: {item_data['purchase_date']}
-- Item URL: {item_data['item_url']}
-
-Congratulations!
-
----
-Menke & Vacca Wedding Registry
-https://menkevaccawedding.azurewebsites.net
-"""
-    
-    return send_email_via_azure(to_email, subject, body)
+    rendered = render_purchase_email(item_data)
+    return send_email_via_azure(to_email, rendered.subject, rendered.text, html=rendered.html)
 
 # Example integration in your purchase_item function:
 def purchase_item_with_azure_email():
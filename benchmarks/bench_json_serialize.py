@@ -0,0 +1,90 @@
+"""
+Micro-benchmark for serializing full /api/registry responses.
+
+Encodes a registry-sized payload of item cards with Flask's default
+provider (stdlib json), FastJSONProvider (orjson when installed), and
+msgpack when installed. It then times gzip on top (the app's response
+compression hook, at its default level), and a SerializedCache hit, which is
+what encoding costs every request after the first while the registry
+version is unchanged.
+
+Usage:
+    python benchmarks/bench_json_serialize.py [--items 5000] [--rounds 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_provider import (MSGPACK_AVAILABLE, ORJSON_AVAILABLE, FastJSONProvider, SerializedCache,
+                           dump_msgpack)
+from response_compression import ResponseCompressor
+
+
+def make_payload(count, seed=7):
+    rng = random.Random(seed)
+    items = [{
+        'id': f'item-{n:06d}',
+        'title': f'Registry Gift {n}',
+        'url': f'https://shop.example.com/products/{n}',
+        'price': round(rng.uniform(5, 500), 2),
+        'bought': rng.random() < 0.3,
+        'image_url': f'/registry/image/{n:064x}.jpg',
+    } for n in range(count)]
+    return {'version': 'a1b2c3d4:1', 'full': True, 'items': items, 'removed': [], 'stale': False}
+
+
+def timed(encode, rounds):
+    """Return (encoded bytes, milliseconds per call)"""
+    body = encode()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode()
+    return body, (time.perf_counter() - start) * 1000 / rounds
+
+
+def main(count, rounds):
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    payload = make_payload(count)
+    print(f"📦 {count:,} registry items (orjson {'on' if ORJSON_AVAILABLE else 'not installed'}, "
+          f"msgpack {'on' if MSGPACK_AVAILABLE else 'not installed'})")
+
+    encoders = [
+        ('stdlib json', lambda: default.dumps(payload, separators=(',', ':')).encode('utf-8')),
+        ('FastJSONProvider', lambda: fast.dump_bytes(payload)),
+    ]
+    if MSGPACK_AVAILABLE:
+        encoders.append(('msgpack', lambda: dump_msgpack(payload)))
+
+    baseline = None
+    for name, encode in encoders:
+        body, ms = timed(encode, rounds)
+        baseline = baseline or ms
+        print(f"  {name:<24} {ms:8.2f} ms  {len(body) / 1024:8.1f} KiB  ({baseline / ms:.1f}x)")
+
+    body = fast.dump_bytes(payload)
+    compressor = ResponseCompressor()
+    compressed, ms = timed(lambda: compressor.compress_bytes(body, 'gzip'), rounds)
+    print(f"  {'+ gzip':<24} {ms:8.2f} ms  {len(compressed) / 1024:8.1f} KiB")
+
+    cache = SerializedCache()
+    cache.get_or_build('full', lambda: fast.dump_bytes(payload))
+    _, ms = timed(lambda: cache.get_or_build('full', None), rounds * 100)
+    print(f"  {'cached body':<24} {ms * 1000:8.2f} µs")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    main(args.items, args.rounds)
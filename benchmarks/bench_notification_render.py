@@ -0,0 +1,58 @@
+"""
+Micro-benchmark for notification email rendering.
+
+Measures the per-message cost of rendering the plain-text and HTML parts
+from the pre-compiled templates, one message at a time, and of a digest
+covering many purchases.
+
+Usage:
+    python benchmarks/bench_notification_render.py [--messages 10000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_templates import render_digest_email, render_purchase_email
+
+
+def make_events(count):
+    return [{
+        'item_title': f'Registry Item {n}',
+        'name': f'Guest {n}',
+        'purchase_date': '2025-08-30',
+        'item_url': f'https://example.com/item{n}',
+        'delivery_date': '2025-09-05' if n % 2 else '',
+        'note': f'Congratulations from guest {n}!' if n % 3 else '',
+    } for n in range(count)]
+
+
+def report(label, elapsed, messages):
+    print(f"  {label:<28} {elapsed * 1e6 / messages:8.1f} µs/message "
+          f"({messages / elapsed:,.0f} messages/s)")
+
+
+def main(messages):
+    events = make_events(messages)
+    print(f"📧 Rendering {messages} notifications (text + HTML parts)")
+
+    started = time.perf_counter()
+    for event in events:
+        render_purchase_email(event)
+    report("render_purchase_email", time.perf_counter() - started, messages)
+
+    digest_size = 50
+    digests = [events[i:i + digest_size] for i in range(0, messages, digest_size)]
+    started = time.perf_counter()
+    for chunk in digests:
+        render_digest_email(chunk)
+    report(f"render_digest_email (x{digest_size})", time.perf_counter() - started, messages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    main(parser.parse_args().messages)
@@ -0,0 +1,129 @@
+"""
+Request-unit benchmark for the registry indexing policy.
+
+Loads the same synthetic registry into two scratch containers, one with the
+default index-everything policy and one with the managed policy from
+cosmos_indexing.py, then compares the RU charge of inserts, purchases and
+the registry listing queries (SELECT * versus the projected ORDER BY query).
+Runs against a real Cosmos DB account or the emulator; the scratch
+containers are deleted afterwards.
+
+Usage:
+    COSMOS_ENDPOINT=... COSMOS_KEY=... python benchmarks/bench_registry_indexing.py [--items 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.cosmos import CosmosClient, PartitionKey
+
+from cosmos_indexing import REGISTRY_ADMIN_QUERY, REGISTRY_INDEXING_POLICY, REGISTRY_LIST_QUERY
+
+
+class ChargeRecorder:
+    """response_hook that adds up the RU charge of every request it sees"""
+
+    def __init__(self):
+        self.total = 0.0
+
+    def __call__(self, headers, _body):
+        self.total += float(headers.get('x-ms-request-charge', 0))
+
+
+def make_item(n):
+    return {
+        'id': f'bench-{uuid.uuid4().hex}',
+        'url': f'https://example.com/item{n}',
+        'image_url': f'https://example.com/item{n}.jpg',
+        'cached_image': f'{uuid.uuid4().hex}.jpg',
+        'price': round(5 + (n * 37) % 500, 2),
+        'bought': n % 4 == 0,
+        'bought_by': 'Benchmark Guest' if n % 4 == 0 else '',
+        'title': f'Registry Item {n} ' + 'with a reasonably descriptive product title ' * 3,
+    }
+
+
+def timed(action):
+    record = ChargeRecorder()
+    start = time.perf_counter()
+    action(record)
+    return record.total, time.perf_counter() - start
+
+
+def run_query(container, query):
+    def action(record):
+        list(container.query_items(query=query, enable_cross_partition_query=True,
+                                   response_hook=record))
+    return action
+
+
+def measure(container, items):
+    """Return {label: (RU, seconds)} per operation for one container"""
+    results = {}
+
+    def insert(record):
+        for item in items:
+            container.create_item(item, response_hook=record)
+    charge, elapsed = timed(insert)
+    results['insert'] = (charge / len(items), elapsed / len(items))
+
+    def purchase(record):
+        for item in items[1::4]:
+            container.patch_item(item=item['id'], partition_key=item['id'],
+                                 patch_operations=[{'op': 'set', 'path': '/bought', 'value': True}],
+                                 response_hook=record)
+    count = len(items[1::4])
+    charge, elapsed = timed(purchase)
+    results['purchase patch'] = (charge / count, elapsed / count)
+
+    results['list: SELECT *'] = timed(run_query(container, "SELECT * FROM c"))
+    results['list: projected + ORDER BY'] = timed(run_query(container, REGISTRY_LIST_QUERY))
+    results['admin: ORDER BY bought, price'] = timed(run_query(container, REGISTRY_ADMIN_QUERY))
+    return results
+
+
+def main(item_count):
+    endpoint = os.environ.get('COSMOS_ENDPOINT')
+    key = os.environ.get('COSMOS_KEY')
+    if not endpoint or not key:
+        print("❌ Set COSMOS_ENDPOINT and COSMOS_KEY to run this benchmark")
+        return 1
+
+    client = CosmosClient(endpoint, key)
+    database = client.create_database_if_not_exists(id=os.environ.get('COSMOS_DATABASE', 'wedding'))
+    items = [make_item(n) for n in range(item_count)]
+    suffix = uuid.uuid4().hex[:8]
+    policies = [('default policy', None), ('managed policy', REGISTRY_INDEXING_POLICY)]
+    results = {}
+
+    print(f"📊 Loading {item_count} items into one scratch container per indexing policy")
+    for label, policy in policies:
+        container_id = f'registry-index-{suffix}-{len(results)}'
+        options = {'indexing_policy': policy} if policy else {}
+        container = database.create_container(id=container_id,
+                                              partition_key=PartitionKey(path="/id"), **options)
+        try:
+            # Fresh copies: create_item adds system properties to the dicts
+            results[label] = measure(container, [dict(item) for item in items])
+        finally:
+            database.delete_container(container_id)
+
+    before, after = (results[label] for label, _policy in policies)
+    print(f"  {'operation':<32} {'before RU':>10} {'after RU':>10} {'before ms':>10} {'after ms':>10}")
+    for operation, (charge, elapsed) in before.items():
+        new_charge, new_elapsed = after[operation]
+        print(f"  {operation:<32} {charge:10.2f} {new_charge:10.2f} "
+              f"{elapsed * 1000:10.1f} {new_elapsed * 1000:10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(main(args.items))
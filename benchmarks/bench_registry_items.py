@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for typed registry items and the columnar query views.
+
+Compares the memory a cached registry costs as raw Cosmos documents (with
+system properties) and as RegistryItems. It then times ingest (document to
+RegistryItem), building the sorted column views, and filtered page queries
+against the per-item filter path.
+
+Usage:
+    python benchmarks/bench_registry_items.py [--items 5000] [--pages 500]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_item import RegistryItem
+from registry_query import RegistryFilters, RegistryQuery
+from registry_sync import RegistryReadModel
+
+
+def make_documents(count, seed=7):
+    rng = random.Random(seed)
+    return [{
+        'id': f'item-{n:06d}',
+        'title': f'Registry Gift {n}',
+        'url': f'https://shop.example.com/products/{n}',
+        'price': str(round(rng.uniform(5, 500), 2)) if n % 5 == 0 else round(rng.uniform(5, 500), 2),
+        'bought': rng.random() < 0.3,
+        'image_url': f'https://cdn.example.com/images/{n}.jpg',
+        'cached_image': f'{n:064x}.jpg' if n % 2 else '',
+        'bought_by': '',
+        '_rid': 'AbCdEf==', '_self': f'dbs/x/colls/y/docs/{n}/', '_etag': f'"{n:08x}"',
+        '_attachments': 'attachments/', '_ts': 1700000000 + n,
+    } for n in range(count)]
+
+
+def measure(build):
+    """Return (result, bytes allocated by build())"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main(count, pages):
+    documents = make_documents(count)
+    print(f"📦 {count:,} registry items")
+
+    _, dict_bytes = measure(lambda: [dict(document) for document in documents])
+    items, item_bytes = measure(lambda: [RegistryItem.from_document(d) for d in documents])
+    print(f"  {'raw documents':<24} {dict_bytes / count:8.0f} B/item")
+    print(f"  {'RegistryItem':<24} {item_bytes / count:8.0f} B/item "
+          f"({dict_bytes / max(item_bytes, 1):.1f}x smaller)")
+
+    start = time.perf_counter()
+    for document in documents:
+        RegistryItem.from_document(document)
+    print(f"  {'ingest':<24} {(time.perf_counter() - start) * 1e6 / count:8.2f} µs/item")
+
+    model = RegistryReadModel()
+    model.load(items)
+    query = RegistryQuery(model)
+    start = time.perf_counter()
+    for sort in ('price-low', 'price-high', 'name'):
+        query.sorted_view(sort)
+    print(f"  {'sorted column views':<24} {(time.perf_counter() - start) * 1000:8.1f} ms (3 sorts)")
+
+    filters = RegistryFilters(available_only=True, min_price=100, max_price=250)
+    _, columns, _ = query.sorted_view('price-low')
+    start = time.perf_counter()
+    for _ in range(pages):
+        query.page('price-low', filters, limit=24)
+    print(f"  {'filtered page':<24} {(time.perf_counter() - start) * 1e6 / pages:8.1f} µs/page")
+
+    start = time.perf_counter()
+    matched = sum(filters.matches_at(columns, index) for index in range(len(columns)))
+    columnar = time.perf_counter() - start
+    start = time.perf_counter()
+    sum(filters.matches(item) for item in columns.items)
+    per_item = time.perf_counter() - start
+    print(f"  {'full scan, columns':<24} {columnar * 1000:8.2f} ms ({matched:,} matches)")
+    print(f"  {'full scan, per item':<24} {per_item * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--pages', type=int, default=500)
+    args = parser.parse_args()
+    main(args.items, args.pages)
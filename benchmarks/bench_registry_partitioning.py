@@ -0,0 +1,136 @@
+"""
+Request-unit and latency benchmark for the registry partition layout.
+
+Loads the same synthetic registry into two scratch containers, one
+partitioned on /id (every item its own partition) and one on /registry_id
+(one partition per registry). It then compares the listing query, the admin
+query, the cached-image reference count and point reads. Runs against a real
+Cosmos DB account or the emulator; the scratch containers are deleted
+afterwards.
+
+Note: in a small container every logical partition shares one physical
+partition, so fan-out overhead grows as the account splits physical
+partitions. Use --throughput above 10000 RU/s to create several physical
+partitions and see the cross-partition cost at scale.
+
+Usage:
+    COSMOS_ENDPOINT=... COSMOS_KEY=... python benchmarks/bench_registry_partitioning.py \
+        [--items 500] [--repeat 20] [--throughput 400]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.cosmos import CosmosClient, PartitionKey
+
+from cosmos_indexing import REGISTRY_ADMIN_QUERY, REGISTRY_INDEXING_POLICY, REGISTRY_LIST_QUERY
+from cosmos_layout import LEGACY_PARTITION_KEY, REGISTRY_PARTITION_KEY, RegistryLayout
+from migrate_registry_partitions import copy_items
+
+
+class ChargeRecorder:
+    """response_hook that adds up the RU charge of every request it sees"""
+
+    def __init__(self):
+        self.total = 0.0
+
+    def __call__(self, headers, _body):
+        self.total += float(headers.get('x-ms-request-charge', 0))
+
+
+def make_item(n):
+    return {
+        'id': f'bench-{uuid.uuid4().hex}',
+        'url': f'https://example.com/item{n}',
+        'image_url': f'https://example.com/item{n}.jpg',
+        'cached_image': f'{n % 50:064x}.jpg',
+        'price': round(5 + (n * 37) % 500, 2),
+        'bought': n % 4 == 0,
+        'bought_by': '',
+        'title': f'Registry Item {n} with a reasonably descriptive product title',
+    }
+
+
+def measure(label, action, repeat):
+    charges = []
+    latencies = []
+    for _ in range(repeat):
+        record = ChargeRecorder()
+        start = time.perf_counter()
+        action(record)
+        latencies.append(time.perf_counter() - start)
+        charges.append(record.total)
+    return label, statistics.mean(charges), statistics.median(latencies)
+
+
+def run(container, layout, items, repeat):
+    options = layout.query_options()
+    sample = items[len(items) // 2]['id']
+
+    def query(text, parameters=None):
+        def action(record):
+            list(container.query_items(query=text, parameters=parameters, response_hook=record,
+                                       **options))
+        return action
+
+    def point_read(record):
+        container.read_item(item=sample, partition_key=layout.partition_key(sample),
+                            response_hook=record)
+
+    return [
+        measure('list (projected, ORDER BY)', query(REGISTRY_LIST_QUERY), repeat),
+        measure('admin (SELECT *, ORDER BY)', query(REGISTRY_ADMIN_QUERY), repeat),
+        measure('cached-image ref count', query(
+            "SELECT VALUE COUNT(1) FROM c WHERE c.cached_image = @blob_name",
+            [{'name': '@blob_name', 'value': items[0]['cached_image']}]), repeat),
+        measure('point read', point_read, repeat),
+    ]
+
+
+def main(item_count, repeat, throughput):
+    endpoint = os.environ.get('COSMOS_ENDPOINT')
+    key = os.environ.get('COSMOS_KEY')
+    if not endpoint or not key:
+        print("❌ Set COSMOS_ENDPOINT and COSMOS_KEY to run this benchmark")
+        return 1
+
+    client = CosmosClient(endpoint, key)
+    database = client.create_database_if_not_exists(id=os.environ.get('COSMOS_DATABASE', 'wedding'))
+    items = [make_item(n) for n in range(item_count)]
+    suffix = uuid.uuid4().hex[:8]
+    layouts = [RegistryLayout(LEGACY_PARTITION_KEY), RegistryLayout(REGISTRY_PARTITION_KEY)]
+    results = []
+
+    print(f"📊 {item_count} items, {repeat} runs per query, {throughput} RU/s per container")
+    for layout in layouts:
+        container_id = f'registry-pk-{suffix}-{layout.field}'
+        container = database.create_container(id=container_id,
+                                              partition_key=PartitionKey(path=layout.path),
+                                              indexing_policy=REGISTRY_INDEXING_POLICY,
+                                              offer_throughput=throughput)
+        try:
+            copy_items(container, items, layout, workers=8)
+            results.append(run(container, layout, items, repeat))
+        finally:
+            database.delete_container(container_id)
+
+    print(f"  {'query':<30} {'/id RU':>9} {'/registry_id RU':>16} {'/id ms':>8} {'/registry_id ms':>16}")
+    for (label, before_ru, before_s), (_label, after_ru, after_s) in zip(*results):
+        print(f"  {label:<30} {before_ru:9.2f} {after_ru:16.2f} "
+              f"{before_s * 1000:8.1f} {after_s * 1000:16.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--throughput', type=int, default=400)
+    args = parser.parse_args()
+    sys.exit(main(args.items, args.repeat, args.throughput))
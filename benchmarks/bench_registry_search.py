@@ -0,0 +1,87 @@
+"""
+Micro-benchmark for the registry search index.
+
+Builds an index over a synthetic registry (10k items by default) and
+measures query latency for single words, prefixes, multi-word queries and
+price/availability phrases, plus the cost of a full build and of the
+incremental re-index that follows a purchase.
+
+Usage:
+    python benchmarks/bench_registry_search.py [--items 10000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_search import RegistrySearchIndex, parse_query
+from registry_sync import RegistryReadModel
+
+WORDS = """
+    knife sharpener block chef bath towel towels set kettle electric walnut cutting board
+    cast iron skillet dutch oven stand mixer blender espresso machine grinder pour over
+    wine glasses decanter champagne flutes dinner plates bowls mugs linen napkins table
+    runner duvet cover sheets pillow throw blanket candle vase picture frame luggage
+    carry on weekender bag hammock grill tongs cooler picnic basket cookbook pasta maker
+""".split()
+
+QUERIES = [
+    ('single word', 'knife'),
+    ('prefix', 'sharp'),
+    ('multi-word', 'cast iron skillet'),
+    ('words + filters', 'wine glasses under $50 unbought'),
+    ('filters only', "anything under $50 that's unbought"),
+    ('price range', '$100-$150'),
+]
+
+
+def make_items(count, seed=7):
+    rng = random.Random(seed)
+    return [{
+        'id': f'item-{n:06d}',
+        'title': ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 5))),
+        'price': round(rng.uniform(5, 500), 2),
+        'bought': rng.random() < 0.3,
+    } for n in range(count)]
+
+
+def main(items, queries):
+    model = RegistryReadModel()
+    model.load(make_items(items))
+    index = RegistrySearchIndex()
+
+    start = time.perf_counter()
+    index.sync(model)
+    build = time.perf_counter() - start
+    print(f"🔎 Search index over {items:,} items ({len(index._vocabulary)} distinct words)")
+    print(f"  {'full build':<20} {build * 1000:8.1f} ms")
+
+    for label, text in QUERIES:
+        parsed = parse_query(text)
+        matches = len(index.match_ids(parsed))
+        start = time.perf_counter()
+        for _ in range(queries):
+            index.search(parsed, limit=20)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<20} {elapsed * 1e6 / queries:8.1f} µs/query  ({matches:,} matches)  {text!r}")
+
+    start = time.perf_counter()
+    for n in range(queries):
+        item = model.get(f'item-{n % items:06d}')
+        model.upsert(replace(item, bought=not item.bought))
+        index.sync(model)
+    elapsed = time.perf_counter() - start
+    print(f"  {'purchase re-index':<20} {elapsed * 1e6 / queries:8.1f} µs/change")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+    main(args.items, args.queries)
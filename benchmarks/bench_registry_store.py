@@ -0,0 +1,111 @@
+"""
+Baseline benchmark for the registry storage engines.
+
+Loads a synthetic registry into the local SQLite engine and times each store
+operation the site uses: listing, the admin list, point reads, purchase
+patches, cached-image counts and the change stream. With COSMOS_ENDPOINT
+and COSMOS_KEY set, --cosmos runs the same workload against a scratch
+Cosmos DB container (deleted afterwards) for comparison.
+
+Usage:
+    python benchmarks/bench_registry_store.py [--items 1000] [--ops 200] [--cosmos]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cosmos_layout import REGISTRY_PARTITION_KEY, RegistryLayout
+from registry_store import CosmosRegistryStore, PreconditionFailed, SqliteRegistryStore
+
+
+def make_items(count, seed=7):
+    rng = random.Random(seed)
+    return [{
+        'id': f'item-{n:06d}',
+        'title': f'Registry Item {n} with a reasonably descriptive product title',
+        'url': f'https://example.com/item{n}',
+        'image_url': f'https://example.com/item{n}.jpg',
+        'cached_image': f'{n % 50:064x}.jpg',
+        'price': round(rng.uniform(5, 500), 2),
+        'bought': False,
+        'bought_by': '',
+    } for n in range(count)]
+
+
+def timed(label, action, repeat):
+    start = time.perf_counter()
+    for n in range(repeat):
+        action(n)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {elapsed * 1000 / repeat:9.3f} ms/op")
+
+
+def run(name, store, items, ops):
+    print(f"🗄️  {name}: {len(items):,} items")
+    timed('create', lambda n: store.create(dict(items[n])), len(items))
+    timed('list_items', lambda n: store.list_items(), max(1, ops // 20))
+    timed('list_all (admin)', lambda n: store.list_all(), max(1, ops // 20))
+    timed('get', lambda n: store.get(items[n % len(items)]['id']), ops)
+
+    def purchase(n):
+        try:
+            store.patch(items[n % len(items)]['id'], {'bought': True, 'bought_by': 'Bench'},
+                        only_if_unbought=True)
+        except PreconditionFailed:
+            pass
+    timed('purchase patch', purchase, ops)
+    timed('count_cached_image', lambda n: store.count_cached_image(items[n % 50]['cached_image']), ops)
+
+    _changes, cursor = store.changes()
+    timed('changes (1 edit)', lambda n: (store.patch(items[n % len(items)]['id'], {'title': f'Edit {n}'}),
+                                          store.changes(cursor)), max(1, ops // 10))
+
+
+def main(item_count, ops, cosmos):
+    items = make_items(item_count)
+
+    directory = tempfile.mkdtemp()
+    try:
+        run('SQLite', SqliteRegistryStore(os.path.join(directory, 'registry.db')), items, ops)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if not cosmos:
+        return 0
+    endpoint = os.environ.get('COSMOS_ENDPOINT')
+    key = os.environ.get('COSMOS_KEY')
+    if not endpoint or not key:
+        print("❌ Set COSMOS_ENDPOINT and COSMOS_KEY to run the Cosmos comparison")
+        return 1
+
+    from azure.cosmos import CosmosClient, PartitionKey
+    from cosmos_indexing import REGISTRY_INDEXING_POLICY
+
+    client = CosmosClient(endpoint, key)
+    database = client.create_database_if_not_exists(id=os.environ.get('COSMOS_DATABASE', 'wedding'))
+    container_id = f'registry-store-bench-{uuid.uuid4().hex[:8]}'
+    layout = RegistryLayout(REGISTRY_PARTITION_KEY)
+    container = database.create_container(id=container_id, partition_key=PartitionKey(path=layout.path),
+                                          indexing_policy=REGISTRY_INDEXING_POLICY)
+    try:
+        run('Cosmos DB', CosmosRegistryStore(container, layout), items, ops)
+    finally:
+        database.delete_container(container_id)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--ops', type=int, default=200)
+    parser.add_argument('--cosmos', action='store_true')
+    args = parser.parse_args()
+    sys.exit(main(args.items, args.ops, args.cosmos))
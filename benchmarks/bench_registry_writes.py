@@ -0,0 +1,129 @@
+"""
+Request-unit benchmark for registry writes.
+
+Compares the RU charge and latency of a purchase and an admin price edit done
+the old way (read the whole document, replace the whole document) against the
+partial-document patch the app now uses. Runs against a real Cosmos DB account
+or the emulator, in a scratch container that is deleted afterwards.
+
+Usage:
+    COSMOS_ENDPOINT=... COSMOS_KEY=... python benchmarks/bench_registry_writes.py [--items 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.cosmos import CosmosClient, PartitionKey
+
+from registry_store import UNBOUGHT_PREDICATE
+
+
+class ChargeRecorder:
+    """response_hook that remembers the RU charge of the last request"""
+
+    def __init__(self):
+        self.charge = 0.0
+
+    def __call__(self, headers, _body):
+        self.charge = float(headers.get('x-ms-request-charge', 0))
+
+
+def make_item(n):
+    return {
+        'id': f'bench-{uuid.uuid4().hex}',
+        'url': f'https://example.com/item{n}',
+        'image_url': f'https://example.com/item{n}.jpg',
+        'cached_image': f'{uuid.uuid4().hex}.jpg',
+        'price': 45.99 + n,
+        'bought': False,
+        'bought_by': '',
+        'title': f'Registry Item {n} ' + 'with a reasonably descriptive product title ' * 3,
+    }
+
+
+def old_purchase(container, item_id, record):
+    """Read-then-replace, as purchase_item used to do. Returns (RU, seconds)."""
+    start = time.perf_counter()
+    item = container.read_item(item=item_id, partition_key=item_id, response_hook=record)
+    charge = record.charge
+    item['bought'] = True
+    item['bought_by'] = 'Benchmark Guest'
+    container.replace_item(item=item_id, body=item, response_hook=record)
+    return charge + record.charge, time.perf_counter() - start
+
+
+def new_purchase(container, item_id, record):
+    """Single conditional patch. Returns (RU, seconds)."""
+    start = time.perf_counter()
+    container.patch_item(
+        item=item_id, partition_key=item_id,
+        patch_operations=[{'op': 'set', 'path': '/bought', 'value': True},
+                          {'op': 'set', 'path': '/bought_by', 'value': 'Benchmark Guest'}],
+        filter_predicate=UNBOUGHT_PREDICATE, response_hook=record,
+    )
+    return record.charge, time.perf_counter() - start
+
+
+def old_edit(container, item_id, record):
+    start = time.perf_counter()
+    item = container.read_item(item=item_id, partition_key=item_id, response_hook=record)
+    charge = record.charge
+    item['price'] = 99.0
+    container.replace_item(item=item_id, body=item, response_hook=record)
+    return charge + record.charge, time.perf_counter() - start
+
+
+def new_edit(container, item_id, record):
+    start = time.perf_counter()
+    container.patch_item(item=item_id, partition_key=item_id,
+                         patch_operations=[{'op': 'set', 'path': '/price', 'value': 99.0}],
+                         response_hook=record)
+    return record.charge, time.perf_counter() - start
+
+
+def measure(container, label, write, count):
+    record = ChargeRecorder()
+    charges = []
+    latencies = []
+    for n in range(count):
+        item = make_item(n)
+        container.create_item(item)
+        charge, elapsed = write(container, item['id'], record)
+        charges.append(charge)
+        latencies.append(elapsed)
+    print(f"  {label:<32} {sum(charges) / count:6.2f} RU/write  "
+          f"{sum(latencies) * 1000 / count:7.1f} ms/write")
+
+
+def main(items):
+    endpoint = os.environ.get('COSMOS_ENDPOINT')
+    key = os.environ.get('COSMOS_KEY')
+    if not endpoint or not key:
+        print("❌ Set COSMOS_ENDPOINT and COSMOS_KEY to run this benchmark")
+        return 1
+
+    client = CosmosClient(endpoint, key)
+    database = client.create_database_if_not_exists(id=os.environ.get('COSMOS_DATABASE', 'wedding'))
+    container_id = f'registry-bench-{uuid.uuid4().hex[:8]}'
+    container = database.create_container(id=container_id, partition_key=PartitionKey(path="/id"))
+    print(f"📊 Measuring {items} writes of each kind in scratch container {container_id}")
+    try:
+        measure(container, "purchase: read + replace", old_purchase, items)
+        measure(container, "purchase: conditional patch", new_purchase, items)
+        measure(container, "admin edit: read + replace", old_edit, items)
+        measure(container, "admin edit: patch", new_edit, items)
+    finally:
+        database.delete_container(container_id)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(main(args.items))
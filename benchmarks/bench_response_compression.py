@@ -0,0 +1,89 @@
+"""
+Bandwidth and CPU cost of compressing registry responses.
+
+Renders real registry responses through the app from an in-memory registry:
+- the /registry page,
+- an infinite-scroll batch of /registry/items,
+- a full /api/registry listing with card HTML,
+- the timeline page.
+Each body is then compressed at several gzip levels and, when brotli is
+installed, brotli qualities. The report gives the bytes sent and the
+milliseconds of CPU per response, so the RESPONSE_COMPRESSION_LEVEL
+trade-off can be read off directly.
+
+Usage:
+    python benchmarks/bench_response_compression.py [--items 500] [--rounds 20]
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from registry_item import RegistryItem
+from response_compression import BROTLI_AVAILABLE
+
+if BROTLI_AVAILABLE:
+    import brotli
+
+
+def make_items(count, seed=7):
+    rng = random.Random(seed)
+    return [RegistryItem(
+        f'item-{n:06d}', f'Registry Gift {n} {rng.choice(["Vase", "Skillet", "Towels", "Lamp"])}',
+        f'https://shop.example.com/products/{n}', round(rng.uniform(5, 500), 2),
+        rng.random() < 0.3, f'https://cdn.example.com/images/{n}.jpg',
+        f'{n:064x}.jpg' if n % 2 else '') for n in range(count)]
+
+
+def render_bodies(count):
+    """Uncompressed bodies of the registry responses, rendered by the app"""
+    app_module.app.logger.setLevel(logging.CRITICAL)
+    app_module.registry_snapshot = None
+    app_module.registry_model.load(make_items(count))
+    client = app_module.app.test_client()
+    paths = {
+        '/registry': '/registry',
+        '/registry/items': '/registry/items?cursor=' + client.get('/registry/items').json['next_cursor'],
+        '/api/registry (cards)': '/api/registry?cards=1',
+        '/ourstory': '/ourstory',
+    }
+    return {name: client.get(path).data for name, path in paths.items()}
+
+
+def encoders():
+    yield 'gzip -1', lambda body: gzip.compress(body, 1, mtime=0)
+    yield 'gzip -6', lambda body: gzip.compress(body, 6, mtime=0)
+    yield 'gzip -9', lambda body: gzip.compress(body, 9, mtime=0)
+    if BROTLI_AVAILABLE:
+        yield 'br q4', lambda body: brotli.compress(body, mode=brotli.MODE_TEXT, quality=4)
+        yield 'br q11', lambda body: brotli.compress(body, mode=brotli.MODE_TEXT, quality=11)
+
+
+def main(count, rounds):
+    bodies = render_bodies(count)
+    print(f"📦 {count:,} registry items (brotli {'on' if BROTLI_AVAILABLE else 'not installed'})")
+    for name, body in bodies.items():
+        print(f"  {name:<24} {len(body) / 1024:8.1f} KiB uncompressed")
+        for encoder_name, encode in encoders():
+            compressed = encode(body)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                encode(body)
+            ms = (time.perf_counter() - start) * 1000 / rounds
+            print(f"    {encoder_name:<10} {len(compressed) / 1024:8.1f} KiB "
+                  f"({len(body) / len(compressed):5.1f}x smaller)  {ms:7.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    main(args.items, args.rounds)
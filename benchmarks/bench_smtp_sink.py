@@ -0,0 +1,73 @@
+"""
+Load test for the development SMTP sink.
+
+Opens several client connections that each pipeline many messages
+(MAIL/RCPT/DATA sent together, as PIPELINING allows) and reports the
+sustained message rate.
+
+Usage:
+    python benchmarks/bench_smtp_sink.py [--connections 20] [--messages 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dev_smtp_server import DevSMTPServer
+
+MESSAGE = (
+    b"Subject: Registry Item Purchased: Load Test\r\n"
+    b"From: dev@menkevaccawedding.com\r\n"
+    b"To: couple@example.com\r\n"
+    b"\r\n"
+    b"Someone has purchased an item from your wedding registry!\r\n"
+    b"..dot-stuffed line\r\n"
+)
+
+
+async def client(port, messages):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    await reader.readline()
+    writer.write(b"EHLO bench\r\n")
+    while not (await reader.readline()).startswith(b"250 "):
+        pass
+
+    envelope = b"MAIL FROM:<dev@menkevaccawedding.com>\r\nRCPT TO:<couple@example.com>\r\nDATA\r\n"
+    for _ in range(messages):
+        writer.write(envelope)
+        for _ in range(3):  # 250, 250, 354
+            await reader.readline()
+        writer.write(MESSAGE + b".\r\n")
+        await reader.readline()
+
+    writer.write(b"QUIT\r\n")
+    await reader.readline()
+    writer.close()
+
+
+async def main(connections, messages):
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = DevSMTPServer('127.0.0.1', 0, data_dir=data_dir, verbose=False)
+        await server.start()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(server.port, messages) for _ in range(connections)))
+        elapsed = time.perf_counter() - started
+
+        server.store.close()
+        total = connections * messages
+        print(f"📨 {total} messages over {connections} connections in {elapsed:.2f}s")
+        print(f"🚀 {total / elapsed:,.0f} messages/second")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--connections', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.connections, args.messages))
@@ -1,18 +1,23 @@
 """
 Retroactively cache all registry item images to Azure Blob Storage.
 
+Images are stored content-addressed as <sha256><ext>, so an image shared by
+several items (or re-cached by a later run) is only uploaded once.
+
 Usage:
-    python cache_registry_images.py
+    python cache_registry_images.py         # cache images for uncached items
+    python cache_registry_images.py --gc    # delete blobs no item references
 
 Requires environment variables:
     COSMOS_ENDPOINT, COSMOS_KEY  (or COSMOS_DATABASE / COSMOS_CONTAINER overrides)
+    COSMOS_PARTITION_KEY         (/id or /registry_id, as for the app; plus REGISTRY_ID)
     BLOB_CONNECTION_STRING       (Azure Storage connection string)
     BLOB_CONTAINER_NAME          (default: registry-images)
 """
 
 import os
 import sys
-import requests
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,8 +29,14 @@ except ImportError:
     print("ERROR: azure-cosmos is required.  pip install azure-cosmos")
     sys.exit(1)
 
+from cosmos_indexing import LIVE_ITEM_CONDITION
+from cosmos_layout import DEFAULT_REGISTRY_ID, LEGACY_PARTITION_KEY, RegistryLayout
+from registry_images import (CONTENT_HASH_BLOB_PATTERN, GC_GRACE_PERIOD, delete_unused_image,
+                             store_image)
+from registry_store import CosmosRegistryStore, PreconditionFailed
+
 try:
-    from azure.storage.blob import BlobServiceClient, ContentSettings
+    from azure.storage.blob import BlobServiceClient
 except ImportError:
     print("ERROR: azure-storage-blob is required.  pip install azure-storage-blob")
     sys.exit(1)
@@ -34,6 +45,8 @@ COSMOS_ENDPOINT = os.environ.get('COSMOS_ENDPOINT', '')
 COSMOS_KEY = os.environ.get('COSMOS_KEY', '')
 COSMOS_DATABASE = os.environ.get('COSMOS_DATABASE', 'wedding')
 COSMOS_CONTAINER = os.environ.get('COSMOS_CONTAINER', 'registry')
+REGISTRY_LAYOUT = RegistryLayout(os.environ.get('COSMOS_PARTITION_KEY', LEGACY_PARTITION_KEY),
+                                 os.environ.get('REGISTRY_ID', DEFAULT_REGISTRY_ID))
 BLOB_CONNECTION_STRING = os.environ.get('BLOB_CONNECTION_STRING', '')
 BLOB_CONTAINER_NAME = os.environ.get('BLOB_CONTAINER_NAME', 'registry-images')
 
@@ -45,13 +58,12 @@ if not BLOB_CONNECTION_STRING:
     sys.exit(1)
 
 
-def main():
-    # Connect Cosmos DB
+def connect():
+    """Return the Cosmos DB container and Blob Storage container clients"""
     cosmos_client = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
     database = cosmos_client.get_database_client(COSMOS_DATABASE)
     container = database.get_container_client(COSMOS_CONTAINER)
 
-    # Connect Blob Storage
     blob_service = BlobServiceClient.from_connection_string(BLOB_CONNECTION_STRING)
     blob_container = blob_service.get_container_client(BLOB_CONTAINER_NAME)
     try:
@@ -59,14 +71,49 @@ def main():
     except Exception:
         blob_container.create_container()
         print(f"Created blob container: {BLOB_CONTAINER_NAME}")
+    return container, blob_container
+
+
+def collect_garbage(container, blob_container):
+    """Delete content-addressed blobs that no registry item references"""
+    referenced = set(container.query_items(
+        query="SELECT VALUE c.cached_image FROM c WHERE IS_DEFINED(c.cached_image) AND c.cached_image != '' "
+              f"AND {LIVE_ITEM_CONDITION}",
+        **REGISTRY_LAYOUT.query_options(),
+    ))
+    now = datetime.now(timezone.utc)
+    cutoff = now - GC_GRACE_PERIOD
+
+    deleted = 0
+    kept = 0
+    for blob in blob_container.list_blobs():
+        if not CONTENT_HASH_BLOB_PATTERN.match(blob.name) or blob.name in referenced:
+            kept += 1
+            continue
+        # Skip recent blobs without a request; the delete re-checks atomically
+        if (blob.last_modified and blob.last_modified > cutoff) or \
+                not delete_unused_image(blob_container, blob.name, now):
+            kept += 1
+            continue
+        print(f"  GC    {blob.name}")
+        deleted += 1
+
+    print(f"\nDone: {deleted} orphaned blobs deleted, {kept} kept.")
+
+
+def main():
+    container, blob_container = connect()
+    store = CosmosRegistryStore(container, REGISTRY_LAYOUT)
 
     # Fetch all registry items
-    items = list(container.query_items(query="SELECT * FROM c", enable_cross_partition_query=True))
+    items = store.list_all()
     print(f"Found {len(items)} registry items.")
 
     cached = 0
     skipped = 0
+    changed = 0
     failed = 0
+    deduplicated = 0
 
     for item in items:
         item_id = item['id']
@@ -84,33 +131,19 @@ def main():
             skipped += 1
             continue
 
-        # Download image
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                              '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
-            }
-            resp = requests.get(image_url, headers=headers, timeout=15)
-            resp.raise_for_status()
-
-            content_type = resp.headers.get('Content-Type', 'image/jpeg')
-            ext_map = {
-                'image/jpeg': '.jpg', 'image/png': '.png',
-                'image/webp': '.webp', 'image/gif': '.gif',
-            }
-            ext = ext_map.get(content_type.split(';')[0].strip(), '.jpg')
-            blob_name = f"{item_id}{ext}"
-
-            blob_client = blob_container.get_blob_client(blob_name)
-            blob_client.upload_blob(
-                resp.content,
-                overwrite=True,
-                content_settings=ContentSettings(content_type=content_type.split(';')[0].strip()),
-            )
-
-            # Update Cosmos DB item with cached_image field
-            item['cached_image'] = blob_name
-            container.replace_item(item=item_id, body=item)
+            blob_name, uploaded = store_image(blob_container, image_url)
+            if not uploaded:
+                deduplicated += 1
+
+            # Set only cached_image, and only if the item is unchanged since we
+            # read it, so a purchase made while the backfill runs is kept
+            try:
+                store.patch(item_id, {'cached_image': blob_name}, etag=item.get('_etag'))
+            except PreconditionFailed:
+                print(f"  SKIP  {item.get('title', item_id)[:50]} — changed while caching; rerun")
+                changed += 1
+                continue
 
             print(f"  OK    {item.get('title', item_id)[:50]} → {blob_name}")
             cached += 1
@@ -119,8 +152,12 @@ def main():
             print(f"  FAIL  {item.get('title', item_id)[:50]} — {e}")
             failed += 1
 
-    print(f"\nDone: {cached} cached, {skipped} skipped, {failed} failed.")
+    print(f"\nDone: {cached} cached ({deduplicated} already stored), "
+          f"{skipped} skipped, {changed} changed meanwhile, {failed} failed.")
 
 
 if __name__ == '__main__':
-    main()
+    if '--gc' in sys.argv[1:]:
+        collect_garbage(*connect())
+    else:
+        main()
@@ -0,0 +1,95 @@
+"""
+Cosmos DB Indexing Policy
+The registry container's indexing policy, kept in code. Only the paths the
+app filters or sorts on are indexed, so writes stop paying RUs to index
+fields like image_url and url, and composite indexes serve the ORDER BY
+clauses the registry queries use.
+
+`ensure_indexing_policy()` compares the live policy with this one and
+replaces it when they differ; Cosmos then re-indexes online. It also turns
+on the container's TTL, which the registry's delete tombstones rely on.
+"""
+
+# Fields the registry page, read model and JSON API need; listing queries
+# project only these instead of SELECT *
+REGISTRY_LIST_FIELDS = ('id', 'title', 'url', 'price', 'bought', 'image_url', 'cached_image')
+
+# Deleted items stay behind as tombstones until their ttl expires (see
+# CosmosRegistryStore); every registry query leaves them out
+LIVE_ITEM_CONDITION = "NOT IS_DEFINED(c.deleted)"
+
+REGISTRY_LIST_QUERY = (
+    "SELECT " + ", ".join(f"c.{field}" for field in REGISTRY_LIST_FIELDS)
+    + f" FROM c WHERE {LIVE_ITEM_CONDITION} ORDER BY c.price ASC"
+)
+
+# Admin view: everything (it shows bought_by), still-needed items first
+REGISTRY_ADMIN_QUERY = f"SELECT * FROM c WHERE {LIVE_ITEM_CONDITION} ORDER BY c.bought ASC, c.price ASC"
+
+# Container TTL: -1 enables per-item `ttl` without expiring anything else
+REGISTRY_DEFAULT_TTL = -1
+
+REGISTRY_INDEXING_POLICY = {
+    'indexingMode': 'consistent',
+    'automatic': True,
+    'includedPaths': [
+        {'path': '/price/?'},
+        {'path': '/bought/?'},
+        {'path': '/cached_image/?'},
+        {'path': '/deleted/?'},
+    ],
+    'excludedPaths': [
+        {'path': '/*'},
+        {'path': '/"_etag"/?'},
+    ],
+    'compositeIndexes': [
+        [{'path': '/bought', 'order': 'ascending'}, {'path': '/price', 'order': 'ascending'}],
+        [{'path': '/bought', 'order': 'ascending'}, {'path': '/price', 'order': 'descending'}],
+        [{'path': '/price', 'order': 'ascending'}, {'path': '/id', 'order': 'ascending'}],
+        [{'path': '/price', 'order': 'descending'}, {'path': '/id', 'order': 'ascending'}],
+    ],
+}
+
+
+def project_registry_item(item):
+    """The listing fields of a full registry document, as the list query returns them"""
+    return {field: item[field] for field in REGISTRY_LIST_FIELDS if field in item}
+
+
+def _normalize(policy):
+    """Comparable form of a policy; Cosmos echoes policies back with extra
+    defaults and in its own order, so compare only what we manage.
+    """
+    def paths(key):
+        return sorted(entry['path'] for entry in policy.get(key, []))
+
+    composites = sorted(
+        tuple((entry['path'], entry.get('order', 'ascending')) for entry in composite)
+        for composite in policy.get('compositeIndexes', [])
+    )
+    return (
+        policy.get('indexingMode', 'consistent').lower(),
+        paths('includedPaths'),
+        paths('excludedPaths'),
+        composites,
+    )
+
+
+def policy_matches(current, desired=REGISTRY_INDEXING_POLICY):
+    return _normalize(current or {}) == _normalize(desired)
+
+
+def ensure_indexing_policy(database, container, partition_key, policy=REGISTRY_INDEXING_POLICY,
+                           default_ttl=REGISTRY_DEFAULT_TTL):
+    """Replace the container's indexing policy if it differs from `policy`, or
+    its default TTL if it differs from `default_ttl`. Returns True when the
+    container was changed.
+    """
+    properties = container.read()
+    if policy_matches(properties.get('indexingPolicy'), policy) and \
+            properties.get('defaultTtl') == default_ttl:
+        return False
+    # replace_container drops settings it isn't given, so always pass both
+    database.replace_container(container, partition_key=partition_key, indexing_policy=policy,
+                               default_ttl=default_ttl)
+    return True
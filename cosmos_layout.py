@@ -0,0 +1,54 @@
+"""
+Cosmos DB Partition Layout
+Where registry items live in the container's partitions.
+
+The original container is partitioned on `/id`, so each item is its own
+logical partition and listing the registry is a cross-partition fan-out.
+Partitioning on `/registry_id` instead puts a whole registry in a single
+logical partition, so listing, admin and cached-image queries are
+single-partition and point reads and writes stay as cheap as before. A
+wedding registry is far below the 20 GB logical-partition limit.
+
+A partition key cannot be changed in place. migrate_registry_partitions.py
+copies the items into a new container, and then COSMOS_CONTAINER and
+COSMOS_PARTITION_KEY are pointed at it.
+"""
+
+LEGACY_PARTITION_KEY = '/id'
+REGISTRY_PARTITION_KEY = '/registry_id'
+DEFAULT_REGISTRY_ID = 'main'
+
+
+class RegistryLayout:
+    """Partition key path plus the registry id items are stored under"""
+
+    def __init__(self, partition_key_path=LEGACY_PARTITION_KEY, registry_id=DEFAULT_REGISTRY_ID):
+        if not partition_key_path.startswith('/') or partition_key_path.count('/') != 1:
+            raise ValueError(f"Unsupported partition key path: {partition_key_path!r}")
+        self.path = partition_key_path
+        self.field = partition_key_path[1:]
+        self.registry_id = registry_id
+
+    @property
+    def per_item(self):
+        """True for the legacy layout where every item is its own partition"""
+        return self.path == LEGACY_PARTITION_KEY
+
+    def partition_key(self, item_id):
+        """Partition key value for point reads and writes of one item"""
+        return item_id if self.per_item else self.registry_id
+
+    def query_options(self):
+        """Keyword arguments that scope a registry query to its partition"""
+        if self.per_item:
+            return {'enable_cross_partition_query': True}
+        return {'partition_key': self.registry_id}
+
+    def stamp(self, item):
+        """Set the partition key field on a new item; returns the item"""
+        if not self.per_item:
+            item[self.field] = self.registry_id
+        return item
+
+    def __repr__(self):
+        return f"RegistryLayout({self.path!r}, {self.registry_id!r})"
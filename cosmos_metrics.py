@@ -0,0 +1,192 @@
+"""
+Cosmos DB Request Metrics
+A thin wrapper around a Cosmos container client that records what each
+call costs: request units (from the x-ms-request-charge header), latency,
+items returned and query pages fetched.
+
+Totals are kept per (route, operation) in CosmosMetrics, for the admin
+metrics endpoint. A CosmosUsage collects the calls made while serving one
+request, so the response can report its own cost in a Server-Timing header.
+"""
+
+import threading
+import time
+
+CHARGE_HEADER = 'x-ms-request-charge'
+BACKGROUND_ROUTE = 'background'
+
+# Container methods that make exactly one request
+POINT_OPERATIONS = ('read_item', 'create_item', 'upsert_item', 'replace_item',
+                    'patch_item', 'delete_item')
+
+
+def _charge(headers):
+    try:
+        return float((headers or {}).get(CHARGE_HEADER, 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CosmosUsage:
+    """Cosmos calls made while serving one request"""
+
+    def __init__(self):
+        self.operations = 0
+        self.request_charge = 0.0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, charge, seconds):
+        with self._lock:
+            self.operations += 1
+            self.request_charge += charge
+            self.seconds += seconds
+
+    def server_timing(self):
+        """Server-Timing header value, e.g. cosmos;dur=12.3;desc="4.20 RU, 3 ops" """
+        return (f'cosmos;dur={self.seconds * 1000:.1f};'
+                f'desc="{self.request_charge:.2f} RU, {self.operations} ops"')
+
+
+class CosmosMetrics:
+    """Running totals of Cosmos calls per route and operation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+        self.started = time.time()
+
+    def record(self, route, operation, charge, seconds, items=0, pages=0, error=False):
+        with self._lock:
+            entry = self._totals.get((route, operation))
+            if entry is None:
+                entry = self._totals[(route, operation)] = {
+                    'calls': 0, 'errors': 0, 'request_charge': 0.0, 'seconds': 0.0,
+                    'max_seconds': 0.0, 'items': 0, 'pages': 0,
+                }
+            entry['calls'] += 1
+            entry['errors'] += bool(error)
+            entry['request_charge'] += charge
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['items'] += items
+            entry['pages'] += pages
+
+    def snapshot(self):
+        """Per-route totals, most expensive routes first, plus RU/s since start"""
+        with self._lock:
+            totals = {key: dict(entry) for key, entry in self._totals.items()}
+        elapsed = max(time.time() - self.started, 1e-9)
+
+        routes = {}
+        for (route, operation), entry in totals.items():
+            route_entry = routes.setdefault(route, {'request_charge': 0.0, 'calls': 0,
+                                                    'operations': {}})
+            route_entry['request_charge'] += entry['request_charge']
+            route_entry['calls'] += entry['calls']
+            entry['avg_request_charge'] = entry['request_charge'] / entry['calls']
+            entry['avg_ms'] = entry['seconds'] * 1000 / entry['calls']
+            entry['max_ms'] = entry.pop('max_seconds') * 1000
+            del entry['seconds']
+            route_entry['operations'][operation] = entry
+
+        total_charge = sum(route['request_charge'] for route in routes.values())
+        return {
+            'uptime_seconds': round(elapsed),
+            'request_charge': total_charge,
+            'ru_per_second': total_charge / elapsed,
+            'routes': dict(sorted(routes.items(), key=lambda pair: -pair[1]['request_charge'])),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self.started = time.time()
+
+
+class InstrumentedContainer:
+    """Wraps a Cosmos ContainerProxy and records every call in `metrics`.
+
+    `scope` is called at the start of each operation and returns
+    (route, usage): the route label to record under and the current
+    request's CosmosUsage, or None outside a request. Anything not wrapped
+    passes straight through to the container.
+    """
+
+    def __init__(self, container, metrics, scope=None):
+        self._container = container
+        self._metrics = metrics
+        self._scope = scope or (lambda: (BACKGROUND_ROUTE, None))
+
+    def __getattr__(self, name):
+        attribute = getattr(self._container, name)
+        if name in POINT_OPERATIONS:
+            return self._point_operation(name, attribute)
+        return attribute
+
+    def _record(self, route, usage, operation, charge, seconds, items=0, pages=0, error=False):
+        self._metrics.record(route, operation, charge, seconds, items=items, pages=pages, error=error)
+        if usage is not None:
+            usage.add(charge, seconds)
+
+    @staticmethod
+    def _chain_hook(kwargs, hook):
+        """Install `hook` as response_hook, still calling any hook the caller passed"""
+        caller_hook = kwargs.pop('response_hook', None)
+        if caller_hook is None:
+            return hook
+
+        def both(headers, body):
+            hook(headers, body)
+            caller_hook(headers, body)
+        return both
+
+    def _point_operation(self, operation, method):
+        def call(*args, **kwargs):
+            route, usage = self._scope()
+            charges = []
+            kwargs['response_hook'] = self._chain_hook(
+                kwargs, lambda headers, _body: charges.append(_charge(headers)))
+            start = time.perf_counter()
+            error = False
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                items = 0 if error or operation == 'delete_item' else 1
+                self._record(route, usage, operation, sum(charges),
+                             time.perf_counter() - start, items=items, pages=0, error=error)
+        return call
+
+    def query_items(self, *args, **kwargs):
+        """Query, recording RUs per page fetched; the totals are recorded once
+        the results have been consumed (or abandoned)
+        """
+        route, usage = self._scope()
+        charges = []
+        kwargs['response_hook'] = self._chain_hook(
+            kwargs, lambda headers, _body: charges.append(_charge(headers)))
+        start = time.perf_counter()
+        try:
+            results = self._container.query_items(*args, **kwargs)
+        except Exception:
+            self._record(route, usage, 'query_items', sum(charges),
+                         time.perf_counter() - start, error=True)
+            raise
+        return self._consume(results, route, usage, charges, start)
+
+    def _consume(self, results, route, usage, charges, start):
+        items = 0
+        error = False
+        try:
+            for item in results:
+                items += 1
+                yield item
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._record(route, usage, 'query_items', sum(charges), time.perf_counter() - start,
+                         items=items, pages=len(charges), error=error)
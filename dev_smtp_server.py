@@ -1,172 +1,326 @@
 """
 Local SMTP Server for Development
-A simple SMTP server that runs alongside the Flask app for testing email functionality
+An asyncio SMTP sink that runs alongside the Flask app for testing email
+functionality and backing load tests of the notification path.
+
+- Line-buffered protocol handling, so pipelined commands and large DATA
+  bodies are parsed correctly regardless of TCP segment boundaries
+- Advertises PIPELINING, 8BITMIME and SIZE; performs dot-unstuffing
+- Stores each message with a unique id in the indexed SQLite log at
+  email_logs/emails.db (see email_log_store.py and view_emails.py)
 """
 
-import socketserver
-import threading
+import asyncio
 import email
-from datetime import datetime
-import json
+import email.policy
+import itertools
 import os
 import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from email_log_store import EmailLogStore
+
+DEFAULT_DATA_DIR = "email_logs"
+STORE_FILENAME = "emails.db"
+MAX_MESSAGE_SIZE = 50 * 1024 * 1024
+MAX_LINE_LENGTH = 64 * 1024
+
+_id_counter = itertools.count()
+
+
+def new_message_id():
+    """Unique, time-sortable id for a stored message"""
+    return f"{time.time_ns():020d}-{os.getpid():05d}-{next(_id_counter):06d}-{uuid.uuid4().hex[:8]}"
+
+
+class MailStore:
+    """Buffers received messages and writes them to the indexed log store in
+    batches, so the sink can absorb bursts of thousands of messages per second.
+    """
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, flush_interval=0.05, verbose=True):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, STORE_FILENAME)
+        self.flush_interval = flush_interval
+        self.verbose = verbose
+        self.count = 0
+        self.log_store = EmailLogStore(self.path)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def append(self, mail_from, mail_to, raw_message):
+        """Parse and queue one message for storage; returns the record"""
+        record = build_record(mail_from, mail_to, raw_message)
+        with self._lock:
+            self._pending.append(record)
+            self.count += 1
+
+        if self.verbose:
+            print(f"\n📨 Email Received ({datetime.now().strftime('%H:%M:%S')})")
+            print(f"   From: {mail_from}")
+            print(f"   To: {', '.join(mail_to)}")
+            print(f"   Subject: {record['subject']}")
+            print(f"   Id: {record['id']}")
+            print(f"   Body Preview: {record['body'][:100]}...")
+        return record
+
+    def flush(self):
+        """Write queued messages in a single transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        self.log_store.add_many(pending)
+
+    def close(self):
+        self.flush()
+        self.log_store.close()
+
+
+def build_record(mail_from, mail_to, raw_message):
+    """Turn raw message bytes into the stored JSON record"""
+    msg = email.message_from_bytes(raw_message, policy=email.policy.compat32)
+    return {
+        'id': new_message_id(),
+        'timestamp': datetime.now().isoformat(),
+        'from': mail_from,
+        'to': list(mail_to),
+        'subject': str(msg.get('Subject', 'No Subject')),
+        'headers': {key: str(value) for key, value in msg.items()},
+        'body': get_body(msg),
+        'size': len(raw_message),
+    }
+
+
+def get_body(msg):
+    """Extract email body text, preferring the text/plain part"""
+    try:
+        if msg.is_multipart():
+            for part in msg.walk():
+                if part.get_content_type() == "text/plain":
+                    payload = part.get_payload(decode=True)
+                    if payload:
+                        return payload.decode(part.get_content_charset() or 'utf-8', 'replace')
+        else:
+            payload = msg.get_payload(decode=True)
+            if payload:
+                return payload.decode(msg.get_content_charset() or 'utf-8', 'replace')
+    except Exception as e:
+        print(f"Warning: Could not decode email body: {e}")
+    return "Could not decode email body"
+
+
+def extract_address(argument):
+    """Extract the address from a MAIL FROM / RCPT TO argument"""
+    match = re.search(r'<([^>]*)>', argument)
+    if match:
+        return match.group(1)
+    return argument.split(':', 1)[-1].strip().split(' ')[0]
+
+
+class SMTPSession:
+    """One client connection: reads CRLF-terminated lines and answers in order"""
 
-class SimpleSMTPHandler(socketserver.BaseRequestHandler):
-    """Simple SMTP handler for development"""
-    
-    def handle(self):
-        """Handle SMTP connection"""
+    def __init__(self, reader, writer, store, hostname='localhost', verbose=False):
+        self.reader = reader
+        self.writer = writer
+        self.store = store
+        self.hostname = hostname
+        self.verbose = verbose
+        self.reset()
+
+    def reset(self):
+        self.mail_from = None
+        self.rcpt_to = []
+
+    def reply(self, line):
+        self.writer.write(line.encode('utf-8') + b"\r\n")
+
+    async def readline(self):
+        return await self.reader.readuntil(b"\n")
+
+    async def run(self):
+        self.reply(f"220 {self.hostname} Dev SMTP sink ready")
         try:
-            self.data_dir = "email_logs"
-            if not os.path.exists(self.data_dir):
-                os.makedirs(self.data_dir)
-            
-            # Send initial greeting
-            self.request.send(b"220 localhost Simple Mail Server\r\n")
-            
-            mail_from = ""
-            mail_to = []
-            mail_data = ""
-            in_data_mode = False
-            
             while True:
-                data = self.request.recv(1024).decode('utf-8').strip()
-                if not data:
+                try:
+                    line = await self.readline()
+                except (asyncio.IncompleteReadError, ConnectionError):
                     break
-                
-                print(f"📨 SMTP Command: {data}")
-                
-                if data.upper().startswith('HELO') or data.upper().startswith('EHLO'):
-                    self.request.send(b"250 Hello\r\n")
-                
-                elif data.upper().startswith('MAIL FROM:'):
-                    mail_from = self._extract_email(data)
-                    self.request.send(b"250 OK\r\n")
-                
-                elif data.upper().startswith('RCPT TO:'):
-                    mail_to.append(self._extract_email(data))
-                    self.request.send(b"250 OK\r\n")
-                
-                elif data.upper() == 'DATA':
-                    self.request.send(b"354 End data with <CR><LF>.<CR><LF>\r\n")
-                    in_data_mode = True
-                    mail_data = ""
-                
-                elif in_data_mode:
-                    if data == '.':
-                        # End of data
-                        self._save_email(mail_from, mail_to, mail_data)
-                        self.request.send(b"250 OK Message accepted\r\n")
-                        in_data_mode = False
-                    else:
-                        mail_data += data + "\n"
-                
-                elif data.upper() == 'QUIT':
-                    self.request.send(b"221 Bye\r\n")
+                except asyncio.LimitOverrunError:
+                    self.reply("500 Line too long")
                     break
-                
-                else:
-                    self.request.send(b"250 OK\r\n")
-                    
+
+                command = line.rstrip(b"\r\n").decode('utf-8', 'replace')
+                if self.verbose:
+                    print(f"📨 SMTP Command: {command}")
+                if not await self.handle(command):
+                    break
+                await self.writer.drain()
+            await self.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
         except Exception as e:
             print(f"❌ SMTP Handler error: {e}")
-    
-    def _extract_email(self, line):
-        """Extract email address from SMTP command"""
-        match = re.search(r'<([^>]+)>', line)
-        if match:
-            return match.group(1)
-        return line.split(':')[1].strip()
-    
-    def _save_email(self, mail_from, mail_to, mail_data):
-        """Save email to file and log to console"""
-        try:
-            # Parse the email
-            msg = email.message_from_string(mail_data)
-            
-            # Extract email details
-            email_data = {
-                'timestamp': datetime.now().isoformat(),
-                'from': mail_from,
-                'to': mail_to,
-                'subject': msg.get('Subject', 'No Subject'),
-                'headers': dict(msg.items()),
-                'body': self._get_body(msg)
-            }
-            
-            # Save to file
-            filename = f"email_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(self.data_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(email_data, f, indent=2, ensure_ascii=False)
-            
-            # Log to console
-            print(f"\n📨 Email Received ({datetime.now().strftime('%H:%M:%S')})")
-            print(f"   From: {mail_from}")
-            print(f"   To: {', '.join(mail_to)}")
-            print(f"   Subject: {email_data['subject']}")
-            print(f"   Saved: {filepath}")
-            print(f"   Body Preview: {email_data['body'][:100]}...")
-            
-        except Exception as e:
-            print(f"❌ Error saving email: {e}")
-    
-    def _get_body(self, msg):
-        """Extract email body text"""
-        try:
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            return payload.decode('utf-8')
+        finally:
+            self.writer.close()
+
+    async def handle(self, command):
+        """Handle one command line; returns False when the session should end"""
+        verb, _, argument = command.partition(' ')
+        verb = verb.upper()
+
+        if verb == 'EHLO':
+            self.reset()
+            self.reply(f"250-{self.hostname} Hello {argument}")
+            self.reply("250-PIPELINING")
+            self.reply("250-8BITMIME")
+            self.reply(f"250 SIZE {MAX_MESSAGE_SIZE}")
+        elif verb == 'HELO':
+            self.reset()
+            self.reply(f"250 {self.hostname} Hello {argument}")
+        elif verb == 'MAIL' and argument.upper().startswith('FROM:'):
+            self.reset()
+            self.mail_from = extract_address(argument)
+            self.reply("250 OK")
+        elif verb == 'RCPT' and argument.upper().startswith('TO:'):
+            if self.mail_from is None:
+                self.reply("503 Need MAIL before RCPT")
             else:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    return payload.decode('utf-8')
-        except Exception as e:
-            print(f"Warning: Could not decode email body: {e}")
-        return "Could not decode email body"
+                self.rcpt_to.append(extract_address(argument))
+                self.reply("250 OK")
+        elif verb == 'DATA':
+            if not self.rcpt_to:
+                self.reply("503 Need RCPT before DATA")
+            else:
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                await self.writer.drain()
+                await self.receive_data()
+        elif verb == 'RSET':
+            self.reset()
+            self.reply("250 OK")
+        elif verb == 'NOOP':
+            self.reply("250 OK")
+        elif verb == 'VRFY':
+            self.reply("252 Cannot VRFY user")
+        elif verb == 'QUIT':
+            self.reply("221 Bye")
+            return False
+        else:
+            self.reply("502 Command not implemented")
+        return True
+
+    async def receive_data(self):
+        """Read the message body up to the lone dot, undoing dot-stuffing"""
+        chunks = []
+        size = 0
+        too_big = False
+        while True:
+            line = await self.readline()
+            if line in (b".\r\n", b".\n"):
+                break
+            if line.startswith(b".."):
+                line = line[1:]
+            size += len(line)
+            if size > MAX_MESSAGE_SIZE:
+                too_big = True
+            elif not too_big:
+                chunks.append(line)
+
+        if too_big:
+            self.reply("552 Message exceeds fixed maximum message size")
+        else:
+            try:
+                record = self.store.append(self.mail_from, self.rcpt_to, b"".join(chunks))
+                self.reply(f"250 OK Message accepted as {record['id']}")
+            except Exception as e:
+                print(f"❌ Error saving email: {e}")
+                self.reply("451 Could not store message")
+        self.reset()
+
+
+class DevSMTPServer:
+    """asyncio SMTP sink bound to host:port and writing to a MailStore"""
+
+    def __init__(self, host='localhost', port=1025, data_dir=DEFAULT_DATA_DIR,
+                 verbose=True):
+        self.host = host
+        self.port = port
+        self.verbose = verbose
+        self.store = MailStore(data_dir, verbose=verbose)
+        self.server = None
+
+    async def _handle_client(self, reader, writer):
+        session = SMTPSession(reader, writer, self.store, hostname=self.host)
+        await session.run()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.store.flush_interval)
+            self.store.flush()
 
-class ThreadedSMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-    """Threaded SMTP server"""
-    allow_reuse_address = True
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self._handle_client, self.host, self.port, limit=MAX_LINE_LENGTH * 2
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._flusher = asyncio.ensure_future(self._flush_periodically())
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        if self.verbose:
+            print(f"📧 Dev SMTP Server started on {self.host}:{self.port}")
+            print(f"📁 Email logs will be saved to: {self.store.path}")
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.store.close()
+
+
+def start_smtp_server(host='localhost', port=1025, data_dir=DEFAULT_DATA_DIR, verbose=True):
+    """Start the SMTP server on its own event loop in a separate thread.
+    Returns the thread; the running DevSMTPServer is available as thread.smtp_server
+    once thread.ready is set.
+    """
+    smtp_server = DevSMTPServer(host, port, data_dir, verbose=verbose)
+    ready = threading.Event()
 
-def start_smtp_server(host='localhost', port=1025):
-    """Start the SMTP server in a separate thread"""
     def run_server():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
         try:
-            server = ThreadedSMTPServer((host, port), SimpleSMTPHandler)
-            print(f"📧 Dev SMTP Server started on {host}:{port}")
-            print(f"📁 Email logs will be saved to: email_logs/")
-            print(f"🚀 Starting email server...")
-            server.serve_forever()
-        except KeyboardInterrupt:
-            print("\n📧 SMTP Server stopped")
-            server.shutdown()
+            loop.run_until_complete(smtp_server.start())
+            if verbose:
+                print(f"📧 Dev SMTP Server started on {host}:{smtp_server.port}")
+                print(f"📁 Email logs will be saved to: {smtp_server.store.path}")
+            ready.set()
+            loop.run_forever()
         except Exception as e:
             print(f"❌ SMTP Server error: {e}")
-    
-    # Run server in a separate thread
-    server_thread = threading.Thread(target=run_server, daemon=True)
+            ready.set()
+        finally:
+            smtp_server.store.close()
+
+    server_thread = threading.Thread(target=run_server, name='dev-smtp', daemon=True)
+    server_thread.smtp_server = smtp_server
+    server_thread.ready = ready
     server_thread.start()
     return server_thread
 
+
 if __name__ == '__main__':
     print("🎯 Starting Development SMTP Server...")
     print("   Host: localhost")
     print("   Port: 1025")
-    print("   Email logs: email_logs/")
+    print(f"   Email logs: {DEFAULT_DATA_DIR}/{STORE_FILENAME}")
     print("   Press Ctrl+C to stop")
-    
+
     try:
-        server = ThreadedSMTPServer(('localhost', 1025), SimpleSMTPHandler)
-        print(f"📧 Dev SMTP Server started on localhost:1025")
-        print(f"📁 Email logs will be saved to: email_logs/")
-        server.serve_forever()
+        asyncio.run(DevSMTPServer('localhost', 1025).serve_forever())
     except KeyboardInterrupt:
         print("\n👋 SMTP Server stopped")
-        server.shutdown()
     except Exception as e:
         print(f"❌ Error: {e}")
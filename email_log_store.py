@@ -0,0 +1,199 @@
+"""
+Indexed Email Log Store
+SQLite store for messages captured by the development SMTP server. Messages
+are indexed by arrival sequence, time and recipient, with an FTS5 full-text
+index over subject and body, so listing, filtering, searching and tailing
+cost O(page) rather than O(all messages).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_DB_PATH = os.path.join("email_logs", "emails.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    mail_from TEXT,
+    recipients TEXT NOT NULL,
+    subject TEXT,
+    body TEXT,
+    headers TEXT,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_emails_timestamp ON emails (timestamp);
+CREATE TABLE IF NOT EXISTS email_recipients (
+    seq INTEGER NOT NULL,
+    address TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_email_recipients ON email_recipients (address, seq);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+    subject, body, content='emails', content_rowid='seq'
+);
+CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails BEGIN
+    INSERT INTO emails_fts (rowid, subject, body) VALUES (new.seq, new.subject, new.body);
+END;
+"""
+
+SUMMARY_COLUMNS = "e.seq, e.id, e.timestamp, e.mail_from, e.recipients, e.subject, e.size"
+
+
+class EmailLogStore:
+    """Append-mostly message store with indexed, paginated reads"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            try:
+                self._conn.executescript(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: fall back to LIKE scans for search
+                self.has_fts = False
+
+    def add_many(self, records):
+        """Insert a batch of message records in one transaction"""
+        if not records:
+            return
+        with self._lock, self._conn:
+            for record in records:
+                cursor = self._conn.execute(
+                    "INSERT INTO emails (id, timestamp, mail_from, recipients, subject, body, "
+                    "headers, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (record['id'], record['timestamp'], record['from'], json.dumps(record['to']),
+                     record['subject'], record['body'], json.dumps(record.get('headers', {})),
+                     record.get('size', 0)),
+                )
+                self._conn.executemany(
+                    "INSERT INTO email_recipients (seq, address) VALUES (?, ?)",
+                    [(cursor.lastrowid, address.lower()) for address in record['to']],
+                )
+
+    def add(self, record):
+        self.add_many([record])
+
+    def list(self, limit=20, before=None, after=None, recipient=None, subject=None,
+             since=None, until=None, query=None):
+        """Return one page of message summaries, newest first.
+        `before`/`after` are sequence cursors from a previous page; `since`/`until`
+        are ISO timestamps; `subject` and `query` are full-text terms.
+        """
+        joins = []
+        where = []
+        params = []
+
+        if recipient:
+            joins.append("JOIN email_recipients r ON r.seq = e.seq")
+            where.append("r.address = ?")
+            params.append(recipient.lower())
+
+        match = self._match_expression(query, subject)
+        if match and self.has_fts:
+            joins.append("JOIN emails_fts f ON f.rowid = e.seq")
+            where.append("emails_fts MATCH ?")
+            params.append(match)
+        else:
+            if query:
+                where.append("(e.subject LIKE ? OR e.body LIKE ?)")
+                params.extend([f"%{query}%", f"%{query}%"])
+            if subject:
+                where.append("e.subject LIKE ?")
+                params.append(f"%{subject}%")
+
+        if before is not None:
+            where.append("e.seq < ?")
+            params.append(before)
+        if after is not None:
+            where.append("e.seq > ?")
+            params.append(after)
+        if since:
+            where.append("e.timestamp >= ?")
+            params.append(since)
+        if until:
+            where.append("e.timestamp < ?")
+            params.append(until)
+
+        order = "ASC" if after is not None and before is None else "DESC"
+        sql = f"SELECT DISTINCT {SUMMARY_COLUMNS} FROM emails e {' '.join(joins)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY e.seq {order} LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def get(self, message_id):
+        """Return the full record for a message id (or sequence number)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM emails WHERE id = ? OR seq = ?",
+                (message_id, message_id if str(message_id).isdigit() else -1),
+            ).fetchone()
+        if row is None:
+            return None
+        record = self._summary(row)
+        record['body'] = row['body']
+        record['headers'] = json.loads(row['headers'] or '{}')
+        return record
+
+    def latest_seq(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(seq) AS seq FROM emails").fetchone()
+        return row['seq'] or 0
+
+    def clear(self):
+        """Delete every stored message. Returns how many were removed."""
+        with self._lock, self._conn:
+            count = self._conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+            self._conn.execute("DELETE FROM emails")
+            self._conn.execute("DELETE FROM email_recipients")
+            if self.has_fts:
+                self._conn.execute("INSERT INTO emails_fts (emails_fts) VALUES ('delete-all')")
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _match_expression(query, subject):
+        """Build an FTS5 MATCH expression; terms are quoted and prefix-matched"""
+        def terms(text):
+            return ['"{}"*'.format(word.replace('"', '""')) for word in text.split()]
+
+        parts = []
+        if query:
+            parts.extend(terms(query))
+        if subject:
+            parts.append("subject : ({})".format(' '.join(terms(subject))))
+        return ' AND '.join(parts)
+
+    @staticmethod
+    def _summary(row):
+        return {
+            'seq': row['seq'],
+            'id': row['id'],
+            'timestamp': row['timestamp'],
+            'from': row['mail_from'],
+            'to': json.loads(row['recipients']),
+            'subject': row['subject'],
+            'size': row['size'],
+        }
@@ -0,0 +1,364 @@
+"""
+Durable Email Outbox
+A SQLite-backed queue for notification emails. Web requests record a
+notification and return immediately; a background sender delivers it with
+retries, exponential backoff and dead-lettering. In digest mode the sender
+collects events of one kind and delivers them as a single combined message.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    claimed_until REAL,
+    sent_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_sent ON outbox (status, sent_at);
+"""
+
+
+class EmailOutbox:
+    """Durable queue of outgoing notifications stored in a local SQLite file"""
+
+    def __init__(self, path, max_attempts=5, base_backoff=30, max_backoff=3600,
+                 lease_seconds=300):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    def enqueue(self, kind, payload):
+        """Record a notification for delivery and return its id"""
+        notification_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO outbox (id, kind, payload, status, created_at, next_attempt_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (notification_id, kind, json.dumps(payload), STATUS_PENDING, now, now),
+        )
+        return notification_id
+
+    def claim(self, limit=10, kind=None, exclude_kind=None):
+        """Lease up to `limit` due notifications for delivery, optionally only of
+        (or excluding) one kind. Records whose lease expired (e.g. the sender
+        crashed mid-send) are reclaimed.
+        """
+        conn = self._connection()
+        now = time.time()
+        where = "((status = ? AND next_attempt_at <= ?) OR (status = ? AND claimed_until < ?))"
+        params = [STATUS_PENDING, now, STATUS_SENDING, now]
+        if kind is not None:
+            where += " AND kind = ?"
+            params.append(kind)
+        if exclude_kind is not None:
+            where += " AND kind != ?"
+            params.append(exclude_kind)
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM outbox WHERE {where} ORDER BY created_at LIMIT ?",
+                params + [limit],
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = ?, claimed_until = ? WHERE id = ?",
+                [(STATUS_SENDING, now + self.lease_seconds, row['id']) for row in rows],
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [self._record(row) for row in rows]
+
+    def due_summary(self, kind):
+        """Return (count, oldest created_at) of notifications of a kind awaiting delivery"""
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT COUNT(*) AS n, MIN(created_at) AS oldest FROM outbox "
+            "WHERE kind = ? AND ((status = ? AND next_attempt_at <= ?) "
+            "   OR (status = ? AND claimed_until < ?))",
+            (kind, STATUS_PENDING, now, STATUS_SENDING, now),
+        ).fetchone()
+        return row['n'], row['oldest']
+
+    def mark_sent(self, notification_id):
+        """Mark a notification as delivered"""
+        self._connection().execute(
+            "UPDATE outbox SET status = ?, sent_at = ?, claimed_until = NULL, "
+            "attempts = attempts + 1 WHERE id = ?",
+            (STATUS_SENT, time.time(), notification_id),
+        )
+
+    def mark_failed(self, notification_id, error):
+        """Schedule a retry with exponential backoff, or dead-letter the notification
+        once it has used up its attempts. Returns the new status.
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT attempts FROM outbox WHERE id = ?",
+                           (notification_id,)).fetchone()
+        if row is None:
+            return None
+
+        attempts = row['attempts'] + 1
+        if attempts >= self.max_attempts:
+            status = STATUS_DEAD
+            next_attempt_at = time.time()
+        else:
+            status = STATUS_PENDING
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            next_attempt_at = time.time() + delay
+
+        conn.execute(
+            "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+            "claimed_until = NULL, last_error = ? WHERE id = ?",
+            (status, attempts, next_attempt_at, str(error)[:1000], notification_id),
+        )
+        return status
+
+    def retry_dead(self):
+        """Move dead-lettered notifications back into the queue. Returns the count."""
+        cursor = self._connection().execute(
+            "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ? WHERE status = ?",
+            (STATUS_PENDING, time.time(), STATUS_DEAD),
+        )
+        return cursor.rowcount
+
+    def purge_sent(self, older_than_seconds=7 * 24 * 3600):
+        """Delete delivered notifications older than the given age. Returns the count."""
+        cursor = self._connection().execute(
+            "DELETE FROM outbox WHERE status = ? AND sent_at < ?",
+            (STATUS_SENT, time.time() - older_than_seconds),
+        )
+        return cursor.rowcount
+
+    def stats(self, window_seconds=3600):
+        """Queue depth by status plus delivery latency over the recent window"""
+        conn = self._connection()
+        now = time.time()
+        counts = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_SENT: 0, STATUS_DEAD: 0}
+        for row in conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status"):
+            counts[row['status']] = row['n']
+
+        oldest = conn.execute(
+            "SELECT MIN(created_at) AS oldest FROM outbox WHERE status IN (?, ?)",
+            (STATUS_PENDING, STATUS_SENDING),
+        ).fetchone()['oldest']
+
+        latencies = [row['latency'] for row in conn.execute(
+            "SELECT sent_at - created_at AS latency FROM outbox "
+            "WHERE status = ? AND sent_at >= ? ORDER BY latency",
+            (STATUS_SENT, now - window_seconds),
+        )]
+
+        return {
+            'queue_depth': counts[STATUS_PENDING] + counts[STATUS_SENDING],
+            'counts': counts,
+            'oldest_pending_age_seconds': round(now - oldest, 3) if oldest else 0,
+            'delivery_latency_seconds': {
+                'window_seconds': window_seconds,
+                'count': len(latencies),
+                'avg': round(sum(latencies) / len(latencies), 3) if latencies else None,
+                'p50': round(_percentile(latencies, 0.50), 3) if latencies else None,
+                'p95': round(_percentile(latencies, 0.95), 3) if latencies else None,
+                'max': round(latencies[-1], 3) if latencies else None,
+            },
+        }
+
+    @staticmethod
+    def _record(row):
+        record = dict(row)
+        record['payload'] = json.loads(record['payload'])
+        return record
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class DigestPolicy:
+    """Deliver notifications of one kind as a combined digest.
+    A digest is sent once the oldest waiting event is `window_seconds` old or
+    `max_events` have accumulated. `deliver_batch(records)` returns True on success.
+    """
+
+    def __init__(self, kind, deliver_batch, window_seconds=900, max_events=20):
+        self.kind = kind
+        self.deliver_batch = deliver_batch
+        self.window_seconds = window_seconds
+        self.max_events = max_events
+
+    def is_due(self, count, oldest, now=None):
+        if not count:
+            return False
+        now = time.time() if now is None else now
+        return count >= self.max_events or now - oldest >= self.window_seconds
+
+
+class OutboxSender:
+    """Background thread that drains an EmailOutbox through a delivery function.
+    `deliver(record)` returns True on success; False or an exception means retry.
+    An optional DigestPolicy batches one kind of notification into digests.
+    Every `purge_interval` seconds it deletes notifications delivered more than
+    `retention_seconds` ago so the outbox file stays small.
+    """
+
+    def __init__(self, outbox, deliver, poll_interval=5.0, batch_size=10, logger=None,
+                 digest=None, purge_interval=3600, retention_seconds=7 * 24 * 3600):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.logger = logger
+        self.digest = digest
+        self.purge_interval = purge_interval
+        self.retention_seconds = retention_seconds
+        self.messages_sent = 0
+        self.events_delivered = 0
+        self.purged = 0
+        self._next_purge_at = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the sender thread if it is not already running"""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the sender thread"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Ask the sender to check the outbox now instead of at the next poll"""
+        self._wake.set()
+
+    def run_once(self):
+        """Deliver one batch of due notifications. Returns the number delivered."""
+        delivered = 0
+        digest = self.digest
+
+        if digest is not None:
+            count, oldest = self.outbox.due_summary(digest.kind)
+            if digest.is_due(count, oldest):
+                records = self.outbox.claim(digest.max_events, kind=digest.kind)
+                if records:
+                    delivered += self._deliver(digest.deliver_batch, records)
+
+        records = self.outbox.claim(self.batch_size,
+                                    exclude_kind=digest.kind if digest else None)
+        for record in records:
+            delivered += self._deliver(self.deliver, [record], single=True)
+        return delivered
+
+    def purge_if_due(self, now=None):
+        """Delete old delivered notifications once per purge interval.
+        Returns the number deleted.
+        """
+        now = time.time() if now is None else now
+        if now < self._next_purge_at:
+            return 0
+        self._next_purge_at = now + self.purge_interval
+        purged = self.outbox.purge_sent(self.retention_seconds)
+        self.purged += purged
+        if purged:
+            self._log('info', f"🧹 Purged {purged} delivered notifications from the outbox")
+        return purged
+
+    def _deliver(self, deliver, records, single=False):
+        """Send one message covering `records` and record the outcome on each"""
+        try:
+            ok = deliver(records[0] if single else records)
+            error = 'delivery returned False'
+        except Exception as e:
+            ok = False
+            error = e
+
+        for record in records:
+            if ok:
+                self.outbox.mark_sent(record['id'])
+            else:
+                status = self.outbox.mark_failed(record['id'], error)
+                self._log('warning', f"⚠️ Notification {record['id']} failed ({error}); now {status}")
+
+        if not ok:
+            return 0
+        self.messages_sent += 1
+        self.events_delivered += len(records)
+        return len(records)
+
+    def metrics(self):
+        """Messages actually sent versus notification events they covered"""
+        return {
+            'digest_mode': self.digest is not None,
+            'messages_sent': self.messages_sent,
+            'events_delivered': self.events_delivered,
+            'purged': self.purged,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while self.run_once() >= self.batch_size:
+                    pass
+                self.purge_if_due()
+            except Exception as e:
+                self._log('error', f"❌ Email outbox sender error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
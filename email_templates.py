@@ -0,0 +1,68 @@
+"""
+Notification Email Templates
+Renders registry notifications from Jinja templates in templates/email into
+a plain-text and an HTML part. Templates are compiled once at import and
+reused, and the same rendered payload feeds both ACS and SMTP.
+"""
+
+import os
+from collections import namedtuple
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+SITE_URL = os.environ.get('SITE_URL', 'https://menkevaccawedding.azurewebsites.net')
+
+RenderedEmail = namedtuple('RenderedEmail', ['subject', 'text', 'html'])
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,
+)
+
+# Compile every template up front so rendering never touches the filesystem
+_templates = {
+    name: _env.get_template(name)
+    for name in (
+        'registry_purchase.txt',
+        'registry_purchase.html',
+        'registry_digest.txt',
+        'registry_digest.html',
+    )
+}
+
+
+def purchase_subject(event):
+    return f"Registry Item Purchased: {event['item_title']}"
+
+
+def digest_subject(events):
+    if len(events) == 1:
+        return purchase_subject(events[0])
+    return f"{len(events)} Registry Items Purchased"
+
+
+def render_purchase_email(event):
+    """Render the notification for one registry purchase"""
+    subject = purchase_subject(event)
+    context = {'event': event, 'subject': subject, 'site_url': SITE_URL}
+    return RenderedEmail(
+        subject,
+        _templates['registry_purchase.txt'].render(context),
+        _templates['registry_purchase.html'].render(context),
+    )
+
+
+def render_digest_email(events):
+    """Render one combined notification covering several purchases"""
+    subject = digest_subject(events)
+    context = {'events': events, 'subject': subject, 'site_url': SITE_URL}
+    return RenderedEmail(
+        subject,
+        _templates['registry_digest.txt'].render(context),
+        _templates['registry_digest.html'].render(context),
+    )
+
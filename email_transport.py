@@ -0,0 +1,150 @@
+"""
+Email Transports for Notifications
+Long-lived Azure Communication Services client and a pooled, keep-alive SMTP
+connection, so a burst of notifications does not pay connection setup and
+STARTTLS handshakes for every message.
+"""
+
+import smtplib
+import threading
+import time
+
+
+class AcsEmailTransport:
+    """Keeps one ACS EmailClient per connection string for the life of the process"""
+
+    def __init__(self, client_factory):
+        self.client_factory = client_factory
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, connection_string):
+        """Return the shared EmailClient for a connection string"""
+        client = self._clients.get(connection_string)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(connection_string)
+                if client is None:
+                    client = self.client_factory(connection_string)
+                    self._clients[connection_string] = client
+        return client
+
+    def send(self, connection_string, message):
+        """Send an ACS message dict and wait for the operation result"""
+        poller = self.client(connection_string).begin_send(message)
+        return poller.result()
+
+    def reset(self):
+        """Drop cached clients (e.g. after the connection string is rotated)"""
+        with self._lock:
+            self._clients.clear()
+
+
+class PooledSmtpTransport:
+    """Small pool of authenticated SMTP sessions that are reused across messages.
+    Sessions idle longer than idle_timeout are checked with NOOP before reuse;
+    a send that fails on a stale session is retried once on a fresh connection.
+    """
+
+    RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+    def __init__(self, host, port, use_tls=False, use_ssl=False, username=None,
+                 password=None, timeout=30, max_idle=2, idle_timeout=240,
+                 smtp_class=smtplib.SMTP, smtp_ssl_class=smtplib.SMTP_SSL):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.smtp_class = smtp_class
+        self.smtp_ssl_class = smtp_ssl_class
+        self._idle = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _open(self):
+        """Open, secure and authenticate a new SMTP session"""
+        if self.use_ssl:
+            conn = self.smtp_ssl_class(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = self.smtp_class(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                conn.starttls()
+        if self.username and self.password:
+            conn.login(self.username, self.password)
+        self.connections_opened += 1
+        return conn
+
+    def _acquire(self):
+        """Take a live idle session from the pool, or open a new one"""
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                return self._open()
+
+            conn, last_used = entry
+            if time.monotonic() - last_used > self.idle_timeout and not self._is_alive(conn):
+                self._close(conn)
+                continue
+            return conn
+
+    def _release(self, conn):
+        """Return a healthy session to the pool"""
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            return conn.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _send_on(self, conn, message):
+        conn.send_message(message)
+
+    def send(self, message):
+        """Send one email.message.EmailMessage"""
+        self.send_many([message])
+
+    def send_many(self, messages):
+        """Send several messages over a single SMTP session"""
+        conn = self._acquire()
+        try:
+            for message in messages:
+                try:
+                    self._send_on(conn, message)
+                except self.RECONNECT_ERRORS:
+                    # Stale session: reconnect and retry this message once
+                    self._close(conn)
+                    conn = self._open()
+                    self._send_on(conn, message)
+        except Exception:
+            self._close(conn)
+            raise
+        self._release(conn)
+
+    def close(self):
+        """Close all idle sessions"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
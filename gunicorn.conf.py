@@ -0,0 +1,12 @@
+# Gunicorn settings, picked up automatically from the app directory.
+# Live registry updates (/registry/events) keep one request open per viewer,
+# so requests are served by threads rather than one-at-a-time sync workers.
+# A single worker process keeps every stream on the same in-process event
+# broker as the write that publishes the change. Extra workers would see each
+# other's writes through the change feed (registry_feed.py), but each would
+# re-read storage and hold its own read model in memory.
+import os
+
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 100))
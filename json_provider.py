@@ -0,0 +1,155 @@
+"""
+Fast JSON Responses
+A Flask JSON provider backed by orjson, falling back to the standard library
+when orjson isn't installed. Every jsonify() in the app goes through it, and
+the output matches Flask's default provider: dates as HTTP dates, sorted
+keys, and compact output unless debugging.
+
+Registry API responses can also be negotiated as msgpack, for clients that
+send `Accept: application/msgpack` (when msgpack is installed). Only the
+format is negotiated here; content encoding is left to the app's response
+compression hook (response_compression.py), like every other response.
+
+SerializedCache keeps the encoded bytes of responses that only change with
+the registry version (a full snapshot), so unchanged data is serialized
+once rather than on every request.
+"""
+
+import threading
+from collections import OrderedDict
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+
+# Flask's encoder for dates, decimals, UUIDs and __html__ objects
+flask_default = DefaultJSONProvider.default
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that encodes with orjson when it is available"""
+
+    def _orjson_options(self, pretty=False):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj, **kwargs):
+        if not ORJSON_AVAILABLE or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self.dump_bytes(obj, pretty=bool(kwargs.get('indent'))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if not ORJSON_AVAILABLE or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def dump_bytes(self, obj, pretty=False):
+        """Serialize straight to UTF-8 bytes"""
+        if ORJSON_AVAILABLE:
+            try:
+                return orjson.dumps(obj, default=flask_default, option=self._orjson_options(pretty))
+            except orjson.JSONEncodeError:
+                pass  # e.g. integers beyond 64 bits; the stdlib encoder handles or reports them
+        if pretty:
+            return super().dumps(obj, indent=2).encode('utf-8')
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = self.dump_bytes(obj, pretty=self._pretty()) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def dump_msgpack(obj):
+    """Serialize to msgpack, encoding other types as the JSON provider would"""
+    return msgpack.packb(obj, default=flask_default, use_bin_type=True)
+
+
+class SerializedCache:
+    """Encoded response bodies keyed by (content key, format), least recently
+    used first out. Keys should include the registry version so a change
+    naturally misses.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = build()
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def negotiate_format(request):
+    """'msgpack' if the client prefers it and msgpack is installed, else 'json'"""
+    if MSGPACK_AVAILABLE:
+        best = request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE],
+                                                   default=JSON_MIMETYPE)
+        if best == MSGPACK_MIMETYPE:
+            return 'msgpack'
+    return 'json'
+
+
+def negotiated_response(app, request, payload, status=200, headers=None, cache=None,
+                        cache_key=None):
+    """Encode `payload` as JSON or msgpack, as the client prefers, and return
+    the Response. `payload` may be a function returning it; with a cache
+    and a cache_key it is then only called when that format isn't cached yet.
+    """
+    body_format = negotiate_format(request)
+
+    def encode():
+        data = payload() if callable(payload) else payload
+        if body_format == 'msgpack':
+            return dump_msgpack(data)
+        return app.json.dump_bytes(data) + b'\n'
+
+    if cache is not None and cache_key is not None:
+        body = cache.get_or_build((cache_key, body_format), encode)
+    else:
+        body = encode()
+
+    mimetype = MSGPACK_MIMETYPE if body_format == 'msgpack' else JSON_MIMETYPE
+    response = app.response_class(body, status=status, mimetype=mimetype, headers=headers)
+    response.vary.add('Accept')
+    return response
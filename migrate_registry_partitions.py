@@ -0,0 +1,211 @@
+"""
+Copy the registry into a container partitioned by registry id.
+
+The live container is partitioned on /id, which makes every registry listing
+a cross-partition query. A partition key can't be changed in place, so this
+copies every item into a new container partitioned on /registry_id (see
+cosmos_layout.py), stamping each one with the registry id.
+
+The migration runs while the site stays up. Each pass re-reads the source,
+compares it with the target, and re-copies anything missing or out of date.
+Items the app wrote to the target after the switch-over are left alone,
+because their target copy is newer than the source. The run stops once a
+pass finds no differences. Writes run concurrently with --workers.
+
+Switch over once the run reports "verified": set COSMOS_CONTAINER to the
+target and COSMOS_PARTITION_KEY=/registry_id, and restart the app. Running
+again after the switch catches anything written to the old container in
+between.
+
+Usage:
+    python migrate_registry_partitions.py --target registry-v2
+    python migrate_registry_partitions.py --target registry-v2 --verify-only
+    python migrate_registry_partitions.py --target registry-v2 --prune   # delete items not in source
+
+Requires environment variables:
+    COSMOS_ENDPOINT, COSMOS_KEY  (or COSMOS_DATABASE / COSMOS_CONTAINER overrides)
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from cosmos_indexing import (LIVE_ITEM_CONDITION, REGISTRY_DEFAULT_TTL, REGISTRY_INDEXING_POLICY,
+                             ensure_indexing_policy)
+from cosmos_layout import DEFAULT_REGISTRY_ID, REGISTRY_PARTITION_KEY, RegistryLayout
+
+load_dotenv()
+
+try:
+    from azure.cosmos import CosmosClient, PartitionKey
+    COSMOS_AVAILABLE = True
+except ImportError:
+    COSMOS_AVAILABLE = False
+
+# Properties Cosmos adds to every document; never copied or compared
+SYSTEM_FIELDS = frozenset(('_rid', '_self', '_etag', '_attachments', '_ts', '_lsn'))
+
+
+def document_body(item):
+    """An item without Cosmos system properties"""
+    return {key: value for key, value in item.items() if key not in SYSTEM_FIELDS}
+
+
+def migrated_copy(item, layout):
+    """The document to write to the target container for a source item"""
+    return layout.stamp(document_body(item))
+
+
+def plan_pass(source_items, target_items, layout):
+    """Compare source and target. Returns (to_copy, extra_ids, newer_in_target):
+    source items missing or stale in the target, ids only in the target, and
+    ids whose differing target copy was written after the source (the app
+    already writes to the target, so they are kept).
+    """
+    targets = {item['id']: item for item in target_items}
+    to_copy = []
+    newer_in_target = []
+    for item in source_items:
+        current = targets.pop(item['id'], None)
+        if current is None:
+            to_copy.append(item)
+        elif document_body(current) != migrated_copy(item, layout):
+            if current.get('_ts', 0) > item.get('_ts', 0):
+                newer_in_target.append(item['id'])
+            else:
+                to_copy.append(item)
+    return to_copy, sorted(targets), newer_in_target
+
+
+def copy_items(target, items, layout, workers=8):
+    """Upsert items into the target concurrently. Returns (copied, failures)
+    where failures is a list of (item id, error).
+    """
+    def copy(item):
+        try:
+            target.upsert_item(body=migrated_copy(item, layout))
+            return None
+        except Exception as e:
+            return item['id'], e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='migrate') as executor:
+        failures = [result for result in executor.map(copy, items) if result is not None]
+    return len(items) - len(failures), failures
+
+
+def read_all(container, live_only=False, **options):
+    """Every document in a container; live_only leaves out delete tombstones"""
+    query = f"SELECT * FROM c WHERE {LIVE_ITEM_CONDITION}" if live_only else "SELECT * FROM c"
+    return list(container.query_items(query=query, **options))
+
+
+def migrate(source, target, layout, workers=8, max_passes=5, prune=False, verify_only=False,
+            log=print):
+    """Copy and verify until a pass finds nothing left to copy. Returns a
+    summary dict; 'verified' is True when source and target agree.
+    """
+    source_options = {'enable_cross_partition_query': True}
+    summary = {'passes': 0, 'copied': 0, 'failed': 0, 'pruned': 0,
+               'extra': 0, 'newer_in_target': 0, 'verified': False}
+
+    for number in range(1, max_passes + 1):
+        summary['passes'] = number
+        started = time.perf_counter()
+        # Tombstones in the source are not copied. Those in the target are
+        # read, so an item deleted after the switch-over counts as newer there
+        # instead of being copied back.
+        source_items = read_all(source, live_only=True, **source_options)
+        target_items = read_all(target, **layout.query_options())
+        to_copy, extra_ids, newer = plan_pass(source_items, target_items, layout)
+        summary['extra'] = len(extra_ids)
+        summary['newer_in_target'] = len(newer)
+        log(f"Pass {number}: {len(source_items)} source items, {len(target_items)} in target, "
+            f"{len(to_copy)} to copy, {len(extra_ids)} only in target, {len(newer)} newer in target")
+
+        if not to_copy and (not extra_ids or not prune):
+            summary['verified'] = True
+            break
+        if verify_only:
+            break
+
+        copied, failures = copy_items(target, to_copy, layout, workers)
+        summary['copied'] += copied
+        summary['failed'] = len(failures)
+        for item_id, error in failures:
+            log(f"  FAIL  {item_id} — {error}")
+
+        if prune:
+            for item_id in extra_ids:
+                target.delete_item(item=item_id, partition_key=layout.partition_key(item_id))
+                log(f"  PRUNE {item_id}")
+            summary['pruned'] += len(extra_ids)
+
+        elapsed = time.perf_counter() - started
+        log(f"  copied {copied} items in {elapsed:.1f}s "
+            f"({copied / elapsed if elapsed else 0:.0f} items/s)")
+
+    return summary
+
+
+def connect(target_name, layout):
+    """Return (source, target) container clients, creating the target. The
+    target gets the app's indexing policy and TTL, which delete tombstones
+    need in order to expire.
+    """
+    client = CosmosClient(os.environ['COSMOS_ENDPOINT'], os.environ['COSMOS_KEY'])
+    database = client.get_database_client(os.environ.get('COSMOS_DATABASE', 'wedding'))
+    source = database.get_container_client(os.environ.get('COSMOS_CONTAINER', 'registry'))
+    partition_key = PartitionKey(path=layout.path)
+    target = database.create_container_if_not_exists(
+        id=target_name,
+        partition_key=partition_key,
+        indexing_policy=REGISTRY_INDEXING_POLICY,
+        default_ttl=REGISTRY_DEFAULT_TTL,
+        offer_throughput=400,
+    )
+    # A target created by an earlier run may predate the TTL setting
+    ensure_indexing_policy(database, target, partition_key)
+    return source, target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', required=True, help='Name of the new container')
+    parser.add_argument('--registry-id', default=DEFAULT_REGISTRY_ID)
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent writes')
+    parser.add_argument('--passes', type=int, default=5, help='Most copy/verify passes to run')
+    parser.add_argument('--prune', action='store_true', help='Delete target items missing from the source')
+    parser.add_argument('--verify-only', action='store_true', help='Compare without writing')
+    args = parser.parse_args(argv)
+
+    if not COSMOS_AVAILABLE:
+        print("ERROR: azure-cosmos is required.  pip install azure-cosmos")
+        return 1
+    if not os.environ.get('COSMOS_ENDPOINT') or not os.environ.get('COSMOS_KEY'):
+        print("ERROR: COSMOS_ENDPOINT and COSMOS_KEY must be set.")
+        return 1
+    if args.target == os.environ.get('COSMOS_CONTAINER', 'registry'):
+        print("ERROR: --target must be a new container, not the source.")
+        return 1
+
+    layout = RegistryLayout(REGISTRY_PARTITION_KEY, args.registry_id)
+    source, target = connect(args.target, layout)
+    summary = migrate(source, target, layout, workers=args.workers, max_passes=args.passes,
+                      prune=args.prune, verify_only=args.verify_only)
+
+    print(f"\nDone: {summary['copied']} copied, {summary['failed']} failed, "
+          f"{summary['pruned']} pruned in {summary['passes']} pass(es).")
+    if summary['verified']:
+        print(f"Verified. Set COSMOS_CONTAINER={args.target} and "
+              f"COSMOS_PARTITION_KEY={layout.path} to switch over.")
+        return 0
+    print("NOT verified: source and target still differ; run again.")
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
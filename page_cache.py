@@ -0,0 +1,155 @@
+"""
+Page Cache
+Pages whose HTML is the same for every visitor (home, our story, venue,
+RSVP) are rendered once and kept with their gzip and brotli encodings. Each
+request then only has to pick the encoding its Accept-Encoding allows, or
+answer 304 when the browser's strong ETag still matches. Nothing is
+rendered or compressed per request.
+
+A cached page records the files of its template and of every template it
+extends or includes. If any of them changes on disk, the page is
+re-rendered on its next request, so template edits show up without a
+restart. A deploy starts with an empty cache, which warm() fills before
+requests arrive.
+
+Requests carrying flashed messages are rendered normally, since the base
+template shows them.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import render_template, request, session
+from jinja2 import TemplateNotFound, meta
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+HTML_MIMETYPE = 'text/html'
+
+# Encodings in order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip', 'identity') if BROTLI_AVAILABLE else ('gzip', 'identity')
+
+
+class CachedPage:
+    """One rendered page: its encodings, their ETags and the template files
+    it was rendered from
+    """
+
+    __slots__ = ('bodies', 'etags', 'sources')
+
+    def __init__(self, html, sources):
+        body = html.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        # Compressed ahead of time, so use the smallest settings
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, 9, mtime=0)}
+        if BROTLI_AVAILABLE:
+            self.bodies['br'] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=11)
+        # Each encoding is a different byte sequence, so each has its own
+        # strong ETag
+        self.etags = {encoding: digest if encoding == 'identity' else f'{digest}-{encoding}'
+                      for encoding in self.bodies}
+        self.sources = sources
+
+    def current(self):
+        """False if one of the page's template files has changed"""
+        for path, mtime in self.sources:
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+
+class PageCache:
+    """Rendered, precompressed pages for an app, keyed by template name"""
+
+    def __init__(self, app):
+        self.app = app
+        self.renders = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def _sources(self, name, seen=None):
+        """(filename, mtime) of a template and every template it references"""
+        seen = set() if seen is None else seen
+        if name in seen:
+            return []
+        seen.add(name)
+        env = self.app.jinja_env
+        source, filename, _ = env.loader.get_source(env, name)
+        sources = [(filename, os.stat(filename).st_mtime_ns)] if filename else []
+        for referenced in meta.find_referenced_templates(env.parse(source)):
+            if referenced is None:
+                continue  # a dynamic name we can't follow
+            try:
+                sources += self._sources(referenced, seen)
+            except TemplateNotFound:
+                pass
+        return sources
+
+    def page(self, template):
+        """The CachedPage for a template, rendering it if needed. Call within
+        a request context.
+        """
+        page = self._pages.get(template)
+        if page is not None and page.current():
+            return page
+        with self._lock:
+            page = self._pages.get(template)
+            if page is None or not page.current():
+                if page is not None and self.app.jinja_env.cache is not None:
+                    # Jinja only checks its compiled templates for changes
+                    # when auto-reload is on
+                    self.app.jinja_env.cache.clear()
+                # Read the sources first, so an edit made during the render
+                # is picked up next time
+                sources = self._sources(template)
+                page = CachedPage(render_template(template), sources)
+                self._pages[template] = page
+                self.renders += 1
+        return page
+
+    def _has_flashes(self):
+        if self.app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+            return False
+        return bool(session.get('_flashes'))
+
+    def serve(self, template):
+        """Response for a cached page, in the encoding the client prefers"""
+        if self._has_flashes():
+            return render_template(template)
+
+        page = self.page(template)
+        encoding = request.accept_encodings.best_match(ENCODINGS, default='identity')
+        if encoding not in page.bodies:
+            encoding = 'identity'
+
+        # Only the ETag of the encoding being served may revalidate: a client
+        # holding the identity copy must not get a 304 for the gzip one
+        headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if request.if_none_match.contains_weak(page.etags[encoding]):
+            response = self.app.response_class(status=304, headers=headers)
+        else:
+            response = self.app.response_class(page.bodies[encoding], mimetype=HTML_MIMETYPE,
+                                               headers=headers)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(page.etags[encoding])
+        return response
+
+    def warm(self, templates):
+        """Render and compress pages ahead of their first request"""
+        with self.app.test_request_context():
+            for template in templates:
+                self.page(template)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
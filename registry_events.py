@@ -0,0 +1,122 @@
+"""
+Registry Change Events
+An in-process publish/subscribe broker that fans item-level registry changes
+(bought, added, removed, updated) out to Server-Sent Event streams. Recent
+events are kept in a ring buffer so a reconnecting browser can replay what it
+missed via the Last-Event-ID header instead of reloading the page.
+"""
+
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+EVENT_BOUGHT = 'bought'
+EVENT_ADDED = 'added'
+EVENT_REMOVED = 'removed'
+EVENT_UPDATED = 'updated'
+
+
+class Subscription:
+    """One connected stream's queue of pending events"""
+
+    def __init__(self, max_pending):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A client that stops reading is cut off rather than buffered forever;
+            # its browser reconnects and replays from Last-Event-ID
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RegistryEventBroker:
+    """Thread-safe fan-out of registry change events to subscribers"""
+
+    def __init__(self, history=256, max_subscribers=64, max_pending=100):
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data):
+        """Record an event and deliver it to every subscriber. Returns the event."""
+        with self._lock:
+            event = {'id': next(self._ids), 'type': event_type, 'data': data,
+                     'time': time.time()}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """Register a new stream. Returns (subscription, missed events), or
+        (None, []) when the broker is at capacity.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None, []
+            subscription = Subscription(self.max_pending)
+            self._subscribers.add(subscription)
+            missed = []
+            if last_event_id is not None:
+                missed = [event for event in self._history if event['id'] > last_event_id]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, subscription, missed=(), heartbeat=15.0, max_duration=300.0):
+        """Yield SSE frames for a subscription until it overflows or reaches
+        `max_duration`; the browser's EventSource then reconnects on its own.
+        Always unsubscribes when the generator finishes or is closed.
+        """
+        deadline = time.monotonic() + max_duration
+        try:
+            yield "retry: 3000\n\n"
+            for event in missed:
+                yield format_sse(event)
+            while not subscription.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                event = subscription.get(timeout=min(heartbeat, remaining))
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield format_sse(event)
+        finally:
+            self.unsubscribe(subscription)
+
+
+def format_sse(event):
+    """Serialize one event as a Server-Sent Events frame"""
+    payload = json.dumps(event['data'], separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+def parse_last_event_id(value):
+    """Parse a Last-Event-ID header; anything unusable means 'no replay'"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
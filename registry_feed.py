@@ -0,0 +1,251 @@
+"""
+Registry Change Feed Consumer
+Keeps a worker's in-process registry cache coherent with writes made by
+other workers and other App Service instances. A background thread polls
+the store's change stream (the Cosmos change feed, or the SQLite change
+log) and passes each changed item to a callback. The callback patches the
+local read model, so only the changed items are touched.
+
+Every worker needs every change, so this is not a competing-consumer
+setup. Each local consumer instead leases a numbered slot with an fcntl
+lock and checkpoints its cursor under that slot. A restarted worker takes
+a free slot. Two live processes never write the same checkpoint.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+def default_consumer_name():
+    """This instance's name: the App Service instance id, else the hostname"""
+    return os.environ.get('WEBSITE_INSTANCE_ID', '')[:12] or socket.gethostname()
+
+
+class FeedLease:
+    """An exclusive numbered slot among this instance's feed consumers"""
+
+    def __init__(self, directory, name, slots=32):
+        self.directory = directory
+        self.name = name
+        self.slots = slots
+        self.slot = None
+        self._file = None
+
+    def acquire(self):
+        """Lock the first free slot. Returns the slot number, or None if all are taken."""
+        if self.slot is not None:
+            return self.slot
+        os.makedirs(self.directory, exist_ok=True)
+        for slot in range(self.slots):
+            handle = open(os.path.join(self.directory, f'{self.name}-{slot}.lease'), 'a+')
+            if not FCNTL_AVAILABLE:
+                self.slot, self._file = slot, handle
+                return slot
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            handle.seek(0)
+            handle.truncate()
+            handle.write(str(os.getpid()))
+            handle.flush()
+            self.slot, self._file = slot, handle
+            return slot
+        return None
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self.slot = None
+
+    @property
+    def checkpoint_path(self):
+        if self.slot is None:
+            return None
+        return os.path.join(self.directory, f'{self.name}-{self.slot}.checkpoint.json')
+
+
+class FeedCheckpoint:
+    """The last change-feed cursor a consumer applied, stored as a small JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved state dict, or None"""
+        try:
+            with open(self.path) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, cursor, **extra):
+        state = dict(extra, cursor=cursor, saved_at=time.time())
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as handle:
+            json.dump(state, handle)
+        os.replace(temp_path, self.path)
+
+
+class RegistryChangeFeed:
+    """Background poller that streams store changes into a local cache.
+
+    get_store: returns the RegistryStore, or None while it is unavailable.
+    apply_change: called with each registry_store.Change; returns True if
+        the local cache changed.
+    bootstrap: called once the start position is known, to load the full
+        registry. Changes made during the load are replayed afterwards,
+        so nothing falls in between.
+    resume: optional; called with the leased slot's saved checkpoint. Return
+        a cursor the cache already holds everything up to (e.g. it was
+        restored from disk) to continue from there without a bootstrap, or
+        None to bootstrap.
+    checkpoint_state: optional; returns extra fields saved with each
+        checkpoint, such as what `resume` needs to check the cache against.
+    """
+
+    def __init__(self, get_store, apply_change, bootstrap=None, resume=None, interval=2.0,
+                 lease=None, logger=None, checkpoint_state=None):
+        self.get_store = get_store
+        self.apply_change = apply_change
+        self.bootstrap = bootstrap
+        self.resume = resume
+        self.checkpoint_state = checkpoint_state
+        self.interval = interval
+        self.lease = lease
+        self.logger = logger
+        self.cursor = None
+        self.checkpoint = None
+        self.applied = 0
+        self.polls = 0
+        self.errors = 0
+        self.last_poll = None
+        self._opened = False
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def start(self):
+        """Start the polling thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='registry-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.lease is not None:
+            self.lease.release()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def healthy(self, max_lag=None):
+        """True if the feed has polled successfully within max_lag seconds
+        (three poll intervals by default)
+        """
+        max_lag = self.interval * 3 if max_lag is None else max_lag
+        return (self.running() and self.last_poll is not None
+                and time.monotonic() - self.last_poll <= max_lag)
+
+    def open(self):
+        """Find the start position and bootstrap the cache. Returns False while
+        the store is unavailable.
+        """
+        store = self.get_store()
+        if store is None:
+            return False
+        if self.lease is not None and self.lease.acquire() is not None:
+            self.checkpoint = FeedCheckpoint(self.lease.checkpoint_path)
+        state = self.checkpoint.load() if self.checkpoint else None
+        cursor = self.resume(state) if state and self.resume is not None else None
+        if cursor:
+            self.cursor = cursor
+        else:
+            self.cursor = store.start_cursor()
+            if self.bootstrap is not None:
+                self.bootstrap()
+        self._opened = True
+        self.save_checkpoint()
+        slot = self.lease.slot if self.lease else None
+        self._log('info', f"📡 Registry change feed started (slot {slot})")
+        return True
+
+    def poll_once(self):
+        """Apply every change since the cursor. Returns the number of items that
+        changed the local cache.
+        """
+        store = self.get_store()
+        if store is None:
+            raise RuntimeError('registry store unavailable')
+        changes, cursor = store.changes(self.cursor)
+        applied = 0
+        for change in changes:
+            if self.apply_change(change):
+                applied += 1
+        self.cursor = cursor
+        self.polls += 1
+        self.applied += applied
+        self.last_poll = time.monotonic()
+        if changes:
+            self.save_checkpoint()
+        return applied
+
+    def save_checkpoint(self):
+        """Record the cursor (and any checkpoint_state) for a restart"""
+        if self.checkpoint is None or not self._opened:
+            return
+        extra = self.checkpoint_state() if self.checkpoint_state is not None else {}
+        try:
+            with self._checkpoint_lock:
+                self.checkpoint.save(self.cursor, **dict(extra, pid=os.getpid(), applied=self.applied))
+        except OSError as e:
+            self._log('warning', f"⚠️ Could not save change feed checkpoint: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self._opened:
+                    if not self.open():
+                        self._stop.wait(self.interval)
+                        continue
+                applied = self.poll_once()
+                if applied:
+                    self._log('info', f"📡 Applied {applied} registry change(s) from the change feed")
+            except Exception as e:
+                self.errors += 1
+                self._log('warning', f"⚠️ Registry change feed poll failed: {e}")
+            self._stop.wait(self.interval)
+
+    def metrics(self):
+        checkpoint = self.checkpoint.load() if self.checkpoint else None
+        return {
+            'running': self.running(),
+            'healthy': self.healthy(),
+            'slot': self.lease.slot if self.lease else None,
+            'polls': self.polls,
+            'applied': self.applied,
+            'errors': self.errors,
+            'seconds_since_poll': (time.monotonic() - self.last_poll) if self.last_poll else None,
+            'checkpoint': checkpoint,
+        }
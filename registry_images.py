@@ -0,0 +1,112 @@
+"""
+Registry Images
+Copies of registry item images in Azure Blob Storage, shared by the app's
+read-through cache and the cache_registry_images.py backfill.
+
+Blobs are named by the SHA-256 of their bytes (<sha256><ext>), so an image
+used by several items, or cached again later, is stored once. The hash is
+computed while the download streams into a spooled temporary file, so a
+large image doesn't sit in memory.
+
+A blob is only deleted once it has been unmodified for GC_GRACE_PERIOD, and
+the delete itself is conditional on that. Reusing an existing blob touches
+its metadata, which resets the clock. A blob that an item is about to record
+therefore can't be collected from under it, even if nothing references it
+yet.
+"""
+
+import hashlib
+import re
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+try:
+    from azure.storage.blob import ContentSettings
+    from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+    BLOB_AVAILABLE = True
+except ImportError:
+    BLOB_AVAILABLE = False
+
+CONTENT_HASH_BLOB_PATTERN = re.compile(r'^[0-9a-f]{64}\.\w{2,4}$')
+
+# Blobs modified more recently than this are never deleted: a fetch may have
+# stored or reused one that its item has not recorded yet
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+IMAGE_EXTENSIONS = {
+    'image/jpeg': '.jpg', 'image/png': '.png',
+    'image/webp': '.webp', 'image/gif': '.gif',
+}
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+}
+CHUNK_SIZE = 64 * 1024
+# Downloads larger than this spill from memory to a temporary file
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+def download_image(image_url, timeout=15):
+    """Stream an image into a spooled temporary file, hashing it on the way.
+    Returns (blob_name, content_type, file) with the file rewound; the caller
+    closes it.
+    """
+    resp = requests.get(image_url, headers=REQUEST_HEADERS, timeout=timeout, stream=True)
+    resp.raise_for_status()
+    content_type = resp.headers.get('Content-Type', 'image/jpeg').split(';')[0].strip()
+
+    hasher = hashlib.sha256()
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+            hasher.update(chunk)
+            body.write(chunk)
+    except BaseException:
+        body.close()
+        raise
+    body.seek(0)
+    return f"{hasher.hexdigest()}{IMAGE_EXTENSIONS.get(content_type, '.jpg')}", content_type, body
+
+
+def store_image(blob_container, image_url):
+    """Download an image and store it under its content hash. Returns
+    (blob_name, uploaded), where uploaded is False when the bytes were
+    already stored.
+    """
+    blob_name, content_type, body = download_image(image_url)
+    with body:
+        blob_client = blob_container.get_blob_client(blob_name)
+        try:
+            # Reuse the stored copy, and reset its GC grace period while we do
+            blob_client.set_blob_metadata({'last_used': datetime.now(timezone.utc).isoformat()})
+            return blob_name, False
+        except ResourceNotFoundError:
+            pass
+
+        try:
+            blob_client.upload_blob(
+                body,
+                overwrite=False,
+                content_settings=ContentSettings(
+                    content_type=content_type,
+                    cache_control='public, max-age=31536000, immutable',
+                ),
+            )
+        except ResourceExistsError:
+            # Another worker stored the same bytes first
+            return blob_name, False
+        return blob_name, True
+
+
+def delete_unused_image(blob_container, blob_name, now=None):
+    """Delete a blob no item references, unless it was stored or reused within
+    GC_GRACE_PERIOD. Returns True if it was deleted.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - GC_GRACE_PERIOD
+    try:
+        blob_container.delete_blob(blob_name, if_unmodified_since=cutoff)
+    except (ResourceModifiedError, ResourceNotFoundError):
+        return False
+    return True
@@ -0,0 +1,105 @@
+"""
+Registry Items
+The typed, immutable form of a registry item that the read model, queries,
+search index, snapshot and templates share. Documents from storage are
+validated and normalised once, when they are ingested: price becomes a
+float, bought a bool, and missing text fields empty strings. Cosmos system
+properties (_rid, _self, _etag, _attachments, _ts) and private fields such
+as bought_by are dropped. Nothing downstream re-checks types.
+
+Items use __slots__, so a cached item costs a fraction of the dict it
+replaces. Being frozen, they are shared between threads and views without
+copying.
+"""
+
+import math
+from dataclasses import dataclass
+from urllib.parse import quote
+
+# URL prefix of the app route that serves images cached in Blob Storage
+CACHED_IMAGE_PATH = '/registry/image/'
+
+_TRUE_STRINGS = frozenset(('true', '1', 'yes', 'on'))
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _price(value):
+    try:
+        price = float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return price if math.isfinite(price) and price > 0 else 0.0
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_STRINGS
+    return bool(value)
+
+
+@dataclass(frozen=True, slots=True)
+class RegistryItem:
+    """One registry item as the public pages and APIs see it"""
+
+    id: str
+    title: str = ''
+    url: str = ''
+    price: float = 0.0
+    bought: bool = False
+    image_url: str = ''
+    cached_image: str = ''
+
+    @classmethod
+    def from_document(cls, document):
+        """Validate and normalise a storage document. Raises ValueError if it
+        has no id.
+        """
+        item_id = document.get('id')
+        if not item_id:
+            raise ValueError('registry item has no id')
+        return cls(
+            str(item_id),
+            _text(document.get('title')),
+            _text(document.get('url')),
+            _price(document.get('price')),
+            _flag(document.get('bought')),
+            _text(document.get('image_url')),
+            _text(document.get('cached_image')),
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild an item from `to_row()` output; the values are trusted"""
+        return cls(*row)
+
+    def to_row(self):
+        """The item as a list in field order, the compact form the snapshot stores"""
+        return [self.id, self.title, self.url, self.price, self.bought,
+                self.image_url, self.cached_image]
+
+    def to_document(self):
+        """The item as a listing document (the fields REGISTRY_LIST_QUERY projects)"""
+        return {'id': self.id, 'title': self.title, 'url': self.url, 'price': self.price,
+                'bought': self.bought, 'image_url': self.image_url,
+                'cached_image': self.cached_image}
+
+    @property
+    def display_title(self):
+        return self.title or 'Product'
+
+    @property
+    def display_image_url(self):
+        """Our cached copy of the image when there is one, else the original URL"""
+        if self.cached_image:
+            return CACHED_IMAGE_PATH + quote(self.cached_image)
+        return self.image_url
+
+
+def as_registry_item(item):
+    """A RegistryItem for either a RegistryItem or a storage document"""
+    if isinstance(item, RegistryItem):
+        return item
+    return RegistryItem.from_document(item)
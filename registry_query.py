@@ -0,0 +1,176 @@
+"""
+Registry Queries
+Server-side sorting, filtering and keyset pagination over the registry read
+model. Each sort order is computed once per registry version and reused, and
+pages are located with a binary search on the sort key, so fetching page N
+costs O(log items + page size) rather than re-sorting and skipping.
+
+Each sorted view is laid out column-wise (RegistryColumns): prices in a
+float array, bought flags in a byte string and folded titles in a list, so
+filters scan flat arrays instead of looking fields up item by item.
+"""
+
+import base64
+import binascii
+import json
+import math
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+DEFAULT_SORT = 'price-low'
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+RegistryPage = namedtuple('RegistryPage', ['items', 'next_cursor', 'version'])
+
+
+# Sort keys match the sort buttons on the registry page. The item id breaks
+# ties so every key is unique and a cursor identifies one exact position.
+SORT_KEYS = {
+    'price-low': lambda item: (item.price, item.id),
+    'price-high': lambda item: (-item.price, item.id),
+    'name': lambda item: (item.display_title.casefold(), item.id),
+}
+
+
+class RegistryFilters(namedtuple('RegistryFilters',
+                                 ['available_only', 'min_price', 'max_price', 'title', 'ids'])):
+    """Which items a page includes; every field is optional. `ids`, when set,
+    restricts the page to those items (e.g. search index matches for `title`);
+    otherwise `title` is matched as a substring.
+    """
+
+    def __new__(cls, available_only=False, min_price=None, max_price=None, title=None, ids=None):
+        return super().__new__(cls, available_only, min_price, max_price,
+                               title.casefold().strip() if title else None, ids)
+
+    @property
+    def active(self):
+        return bool(self.available_only or self.min_price is not None
+                    or self.max_price is not None or self.title)
+
+    def matches(self, item):
+        """True if a RegistryItem passes every filter"""
+        return self._matches(item.id, item.bought, item.price, item.display_title.casefold())
+
+    def matches_at(self, columns, index):
+        """True if the item at `index` of a RegistryColumns passes every filter"""
+        return self._matches(columns.ids[index], columns.bought[index], columns.prices[index],
+                             columns.titles[index])
+
+    def _matches(self, item_id, bought, price, folded_title):
+        if self.ids is not None and item_id not in self.ids:
+            return False
+        if self.available_only and bought:
+            return False
+        if self.min_price is not None and price < self.min_price:
+            return False
+        if self.max_price is not None and price > self.max_price:
+            return False
+        if self.ids is None and self.title and self.title not in folded_title:
+            return False
+        return True
+
+
+class RegistryColumns:
+    """A list of RegistryItems with the fields filters read as flat columns"""
+
+    __slots__ = ('items', 'ids', 'prices', 'bought', 'titles')
+
+    def __init__(self, items):
+        self.items = items
+        self.ids = [item.id for item in items]
+        self.prices = array('d', [item.price for item in items])
+        self.bought = bytes([item.bought for item in items])
+        self.titles = [item.display_title.casefold() for item in items]
+
+    def __len__(self):
+        return len(self.items)
+
+
+def price_range(sort, filters, keys):
+    """The (start, stop) slice of a price-sorted view that can hold items within
+    the filters' price bounds, found by binary search; the whole view otherwise
+    """
+    low, high = filters.min_price, filters.max_price
+    if sort == 'price-high':
+        low, high = (-high if high is not None else None), (-low if low is not None else None)
+    elif sort != 'price-low':
+        return 0, len(keys)
+    # (price,) sorts before every (price, id) key, so these land on price boundaries
+    start = bisect_left(keys, (low,)) if low is not None else 0
+    stop = bisect_left(keys, (math.nextafter(high, math.inf),)) if high is not None else len(keys)
+    return start, max(start, stop)
+
+
+def encode_cursor(sort, key):
+    """Opaque, URL-safe cursor pointing just past the item with this sort key"""
+    raw = json.dumps([sort, *key], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Return the sort key a cursor points past. Raises ValueError if the cursor
+    is malformed or was issued for a different sort order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(value, list) or len(value) != 3 or value[0] != sort:
+        raise ValueError('Cursor does not match this sort order')
+    return tuple(value[1:])
+
+
+class RegistryQuery:
+    """Sorted views of a RegistryReadModel, cached per registry version"""
+
+    def __init__(self, model):
+        self.model = model
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def sorted_view(self, sort):
+        """Return (version, columns, keys) with the RegistryColumns in `sort` order"""
+        with self._lock:
+            view = self._views.get(sort)
+        if view is not None and view[0] == self.model.cursor():
+            return view
+        version, items = self.model.snapshot()
+        key = SORT_KEYS[sort]
+        items.sort(key=key)
+        view = (version, RegistryColumns(items), [key(item) for item in items])
+        with self._lock:
+            self._views[sort] = view
+        return view
+
+    def page(self, sort=DEFAULT_SORT, filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Return one RegistryPage. Raises ValueError for an unknown sort or bad cursor."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f'Unknown sort: {sort}')
+        filters = filters or RegistryFilters()
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        version, columns, keys = self.sorted_view(sort)
+
+        start, stop = price_range(sort, filters, keys)
+        if cursor:
+            try:
+                start = max(start, bisect_right(keys, decode_cursor(cursor, sort)))
+            except TypeError as e:
+                raise ValueError('Invalid cursor') from e
+
+        page = []
+        next_cursor = None
+        filtered = filters.active or filters.ids is not None
+        for index in range(start, stop):
+            if filtered and not filters.matches_at(columns, index):
+                continue
+            if len(page) == limit:
+                next_cursor = encode_cursor(sort, keys[page_end])
+                break
+            page.append(columns.items[index])
+            page_end = index
+        return RegistryPage(page, next_cursor, version)
@@ -0,0 +1,245 @@
+"""
+Registry Search Index
+An in-memory inverted index over registry items: title tokens (with prefix
+lookup through a sorted vocabulary), price buckets and the bought flag. It is
+kept current by replaying the read model's change log, so an add, edit,
+delete or purchase only re-indexes the items it touched.
+
+Queries are plain text. Words are prefix-matched and all must match;
+phrases such as "under $50", "over 100", "$20-$40" and "unbought" /
+"available" become price and availability filters.
+"""
+
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from registry_item import as_registry_item
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+PRICE = r"\$?\s*(\d+(?:\.\d+)?)"
+MAX_PRICE_PATTERN = re.compile(r"\b(?:under|below|less than|cheaper than|up to|at most)\s*" + PRICE
+                               + r"|<=?\s*" + PRICE, re.IGNORECASE)
+MIN_PRICE_PATTERN = re.compile(r"\b(?:over|above|more than|at least)\s*" + PRICE
+                               + r"|>=?\s*" + PRICE, re.IGNORECASE)
+RANGE_PATTERN = re.compile(PRICE + r"\s*(?:-|to)\s*" + PRICE, re.IGNORECASE)
+AVAILABLE_PATTERN = re.compile(r"\b(?:unbought|available|unpurchased|not (?:yet )?(?:bought|purchased)"
+                               r"|still needed)\b", re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+    a an the any anything something everything that thats s is are it its for with and or of
+    in on to me my our us we please show find item items thing things
+""".split())
+
+SearchQuery = namedtuple('SearchQuery', ['terms', 'min_price', 'max_price', 'available_only'])
+
+
+def tokenize(text):
+    """Lowercase word tokens of a title or query"""
+    return TOKEN_PATTERN.findall((text or '').casefold())
+
+
+def parse_query(text):
+    """Split a free-text query into search terms and price/availability filters"""
+    text = text or ''
+    min_price = max_price = None
+    available_only = False
+
+    def take(pattern, handler):
+        nonlocal text
+        match = pattern.search(text)
+        while match:
+            values = [float(group) for group in match.groups() if group is not None]
+            # A run of digits too long for a float parses as inf; ignore the phrase
+            if all(math.isfinite(value) for value in values):
+                handler(values)
+            text = text[:match.start()] + ' ' + text[match.end():]
+            match = pattern.search(text)
+
+    def set_range(values):
+        nonlocal min_price, max_price
+        min_price, max_price = min(values), max(values)
+
+    def set_max(values):
+        nonlocal max_price
+        max_price = values[0]
+
+    def set_min(values):
+        nonlocal min_price
+        min_price = values[0]
+
+    def set_available(_values):
+        nonlocal available_only
+        available_only = True
+
+    take(RANGE_PATTERN, set_range)
+    take(MAX_PRICE_PATTERN, set_max)
+    take(MIN_PRICE_PATTERN, set_min)
+    take(AVAILABLE_PATTERN, set_available)
+
+    terms = [token for token in tokenize(text) if token not in STOPWORDS]
+    return SearchQuery(terms, min_price, max_price, available_only)
+
+
+class RegistrySearchIndex:
+    """Inverted index over registry titles, price buckets and availability"""
+
+    def __init__(self, bucket_size=25.0):
+        self.bucket_size = bucket_size
+        self.cursor = None
+        self._docs = {}
+        self._postings = {}
+        self._vocabulary = []
+        self._buckets = {}
+        self._available = set()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def sync(self, model):
+        """Bring the index up to date with a RegistryReadModel, re-indexing
+        only the items changed since the last sync. Returns how many items
+        were (re-)indexed or removed.
+        """
+        with self._lock:
+            if self.cursor is not None and self.cursor == model.cursor():
+                return 0
+            full, items, removed, cursor = model.changes_since(self.cursor)
+            if full:
+                self.rebuild(items)
+            else:
+                for item in items:
+                    self.add(item)
+                for item_id in removed:
+                    self.remove(item_id)
+            self.cursor = cursor
+            return len(items) + len(removed)
+
+    def rebuild(self, items):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._vocabulary = []
+            self._buckets.clear()
+            self._available.clear()
+            for item in items:
+                self.add(item)
+
+    def add(self, item):
+        """Index a new item, or re-index a changed one"""
+        item = as_registry_item(item)
+        with self._lock:
+            item_id = item.id
+            if item_id in self._docs:
+                self.remove(item_id)
+
+            title = item.title
+            tokens = frozenset(tokenize(title))
+            price = item.price
+            bucket = int(price // self.bucket_size)
+            bought = item.bought
+            order = (price, title.casefold(), item_id)
+            self._docs[item_id] = (tokens, price, bucket, bought, order)
+
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    posting = self._postings[token] = set()
+                    insort(self._vocabulary, token)
+                posting.add(item_id)
+            self._buckets.setdefault(bucket, set()).add(item_id)
+            if not bought:
+                self._available.add(item_id)
+
+    def remove(self, item_id):
+        with self._lock:
+            doc = self._docs.pop(item_id, None)
+            if doc is None:
+                return
+            tokens, _price_value, bucket, _bought, _order = doc
+            for token in tokens:
+                posting = self._postings[token]
+                posting.discard(item_id)
+                if not posting:
+                    del self._postings[token]
+                    del self._vocabulary[bisect_left(self._vocabulary, token)]
+            self._buckets[bucket].discard(item_id)
+            if not self._buckets[bucket]:
+                del self._buckets[bucket]
+            self._available.discard(item_id)
+
+    def _prefix_ids(self, prefix):
+        """Ids of items with any title token starting with `prefix`"""
+        start = bisect_left(self._vocabulary, prefix)
+        postings = []
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            postings.append(self._postings[token])
+        if len(postings) == 1:
+            return postings[0]
+        return set().union(*postings)
+
+    def _price_candidates(self, min_price, max_price):
+        # Walk the buckets that exist rather than every bucket number in the
+        # range, which a bound like "under $10000000000" makes enormous
+        low = min_price // self.bucket_size if min_price is not None else -math.inf
+        high = max_price // self.bucket_size if max_price is not None else math.inf
+        return set().union(*(ids for bucket, ids in self._buckets.items() if low <= bucket <= high))
+
+    def match_ids(self, query):
+        """Return the set of item ids matching a SearchQuery or query string"""
+        if not isinstance(query, SearchQuery):
+            query = parse_query(query)
+        with self._lock:
+            if not self._docs:
+                return set()
+
+            candidates = None
+            # Smallest posting lists first keeps the intersections cheap
+            for ids in sorted((self._prefix_ids(term) for term in query.terms), key=len):
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return set()
+
+            has_price = query.min_price is not None or query.max_price is not None
+            if candidates is None and has_price:
+                candidates = self._price_candidates(query.min_price, query.max_price)
+
+            if query.available_only:
+                candidates = (candidates & self._available if candidates is not None
+                              else set(self._available))
+
+            if has_price:
+                low = query.min_price if query.min_price is not None else float('-inf')
+                high = query.max_price if query.max_price is not None else float('inf')
+                candidates = {item_id for item_id in candidates
+                              if low <= self._docs[item_id][1] <= high}
+
+            if candidates is None:
+                candidates = set(self._docs)
+            return candidates
+
+    def search(self, query, limit=20):
+        """Return up to `limit` matching item ids, best first: items whose words
+        match the terms exactly rank above prefix-only matches, then cheaper first.
+        """
+        query = parse_query(query) if not isinstance(query, SearchQuery) else query
+        with self._lock:
+            ids = self.match_ids(query)
+            docs = self._docs
+            if not query.terms:
+                return heapq.nsmallest(limit, ids, key=lambda item_id: docs[item_id][4])
+
+            terms = frozenset(query.terms)
+
+            def rank(item_id):
+                doc = docs[item_id]
+                return (-len(terms & doc[0]), doc[4])
+
+            return heapq.nsmallest(limit, ids, key=rank)
@@ -0,0 +1,110 @@
+"""
+Registry Snapshot
+The last full registry listing read from storage, in a compact binary file,
+so a cold-started worker can serve the registry before storage answers and
+keep the site up while storage is down.
+
+Each full read is written to a temporary file and renamed over the old one
+under the next version number, so a reader never sees a half-written file.
+The file is only read at start-up: a running worker serves its own read
+model, which the change feed and its own re-reads keep current.
+
+File layout (little-endian):
+    header   magic b'RGSN', format, reserved, version, saved_at, item count
+    index    (offset, length) of each record
+    records  each RegistryItem as a compact UTF-8 JSON row, in listing order
+"""
+
+import json
+import os
+import struct
+import time
+
+from registry_item import RegistryItem, as_registry_item
+
+MAGIC = b'RGSN'
+FORMAT = 2
+HEADER = struct.Struct('<4sHHQdI')
+ENTRY = struct.Struct('<II')
+
+
+def encode_snapshot(items, version, saved_at):
+    """The snapshot file contents for a list of RegistryItems (or documents)"""
+    records = [json.dumps(as_registry_item(item).to_row(), separators=(',', ':')).encode('utf-8')
+               for item in items]
+    offset = HEADER.size + ENTRY.size * len(records)
+    index = bytearray()
+    for record in records:
+        index += ENTRY.pack(offset, len(record))
+        offset += len(record)
+    header = HEADER.pack(MAGIC, FORMAT, 0, version, saved_at, len(records))
+    return b''.join([header, bytes(index)] + records)
+
+
+class SnapshotFile:
+    """The contents of one snapshot file; records are decoded on access"""
+
+    def __init__(self, buffer):
+        magic, file_format, _, version, saved_at, count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or file_format != FORMAT:
+            raise ValueError('not a registry snapshot')
+        if HEADER.size + ENTRY.size * count > len(buffer):
+            raise ValueError('truncated registry snapshot')
+        self._buffer = buffer
+        self.version = version
+        self.saved_at = saved_at
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def age(self):
+        return max(time.time() - self.saved_at, 0.0)
+
+    def item(self, n):
+        """Decode the n-th RegistryItem"""
+        offset, length = ENTRY.unpack_from(self._buffer, HEADER.size + ENTRY.size * n)
+        return RegistryItem.from_row(json.loads(self._buffer[offset:offset + length]))
+
+    def items(self):
+        return [self.item(n) for n in range(self.count)]
+
+
+class RegistrySnapshot:
+    """The registry snapshot file: write a new version, read the latest"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, items, saved_at=None):
+        """Write the items as the next version, stamped with when they were
+        read from storage. Returns the new version.
+        """
+        current = self.current()
+        version = (current.version if current is not None else 0) + 1
+        saved_at = time.time() if saved_at is None else saved_at
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as handle:
+            handle.write(encode_snapshot(items, version, saved_at))
+        os.replace(temp_path, self.path)
+        return version
+
+    def current(self):
+        """The latest snapshot, or None when there is no readable snapshot"""
+        try:
+            with open(self.path, 'rb') as handle:
+                return SnapshotFile(handle.read())
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def load(self, max_age=None):
+        """Return (items, age in seconds) from the latest snapshot, or None
+        when there is none or it is older than max_age
+        """
+        snapshot = self.current()
+        if snapshot is None or (max_age is not None and snapshot.age() > max_age):
+            return None
+        return snapshot.items(), snapshot.age()
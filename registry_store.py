@@ -0,0 +1,386 @@
+"""
+Registry Storage
+The storage operations the registry needs, behind one interface with two
+engines:
+
+- CosmosRegistryStore: the production Azure Cosmos DB container.
+- SqliteRegistryStore: a local SQLite file. It needs no credentials, so the
+  site, the load tests and the benchmarks run realistically on a laptop or
+  CI box, and it gives a performance baseline.
+
+REGISTRY_BACKEND selects the engine in app.py. Both engines pass the same
+conformance tests (tests/test_registry_store.py).
+
+Items are plain dicts with the Cosmos document shape, including `_etag`.
+Missing items raise ItemNotFound. Failed preconditions (an etag mismatch,
+or buying an item that is already bought) raise PreconditionFailed. Both
+errors carry the HTTP-style status_code Cosmos uses.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from cosmos_indexing import (LIVE_ITEM_CONDITION, REGISTRY_ADMIN_QUERY, REGISTRY_LIST_QUERY,
+                             project_registry_item)
+
+try:
+    from azure.core import MatchConditions
+except ImportError:
+    MatchConditions = None
+
+# Patch filters: only touch items that aren't tombstones, and only let an
+# item be bought once
+LIVE_PREDICATE = f"FROM c WHERE {LIVE_ITEM_CONDITION}"
+UNBOUGHT_PREDICATE = (f"FROM c WHERE {LIVE_ITEM_CONDITION} "
+                      "AND (NOT IS_DEFINED(c.bought) OR c.bought = false)")
+
+COUNT_CACHED_IMAGE_QUERY = ("SELECT VALUE COUNT(1) FROM c "
+                            f"WHERE c.cached_image = @blob_name AND {LIVE_ITEM_CONDITION}")
+
+# How long a Cosmos tombstone lives before Cosmos expires it. Longer than the
+# full refresh interval, so a worker that misses it on the change feed still
+# drops the item at its next full load.
+TOMBSTONE_TTL_SECONDS = int(os.environ.get('REGISTRY_TOMBSTONE_TTL_SECONDS', str(24 * 3600)))
+
+# One entry of a change stream; `item` is None when `deleted` is True
+Change = namedtuple('Change', ['item_id', 'item', 'deleted'])
+
+
+class StoreError(Exception):
+    """Base class for registry storage errors"""
+    status_code = 500
+
+
+class ItemNotFound(StoreError):
+    status_code = 404
+
+
+class PreconditionFailed(StoreError):
+    status_code = 412
+
+
+class RegistryStore:
+    """Registry storage interface"""
+
+    def list_items(self):
+        """Every item projected to the listing fields, cheapest first"""
+        raise NotImplementedError
+
+    def list_all(self):
+        """Every full item for the admin page: unbought first, then by price"""
+        raise NotImplementedError
+
+    def get(self, item_id):
+        """The full item; raises ItemNotFound"""
+        raise NotImplementedError
+
+    def create(self, item):
+        """Insert a new item and return it as stored"""
+        raise NotImplementedError
+
+    def replace(self, item):
+        """Overwrite an existing item and return it as stored; raises ItemNotFound"""
+        raise NotImplementedError
+
+    def patch(self, item_id, changes, only_if_unbought=False, etag=None):
+        """Set the fields in `changes` and return the updated item. With
+        only_if_unbought or etag, raises PreconditionFailed when the item is
+        already bought or was modified since `etag`. Raises ItemNotFound.
+        """
+        raise NotImplementedError
+
+    def delete(self, item_id):
+        """Remove an item; raises ItemNotFound"""
+        raise NotImplementedError
+
+    def count_cached_image(self, blob_name):
+        """How many items reference a cached image blob"""
+        raise NotImplementedError
+
+    def changes(self, cursor=None):
+        """Items changed since `cursor` (everything when None).
+        Returns (changes, cursor), where changes is a list of Change.
+        """
+        raise NotImplementedError
+
+    def start_cursor(self):
+        """A cursor for the current end of the change stream, so that
+        changes(cursor) reports only changes made from now on
+        """
+        raise NotImplementedError
+
+
+class CosmosRegistryStore(RegistryStore):
+    """Registry storage in an Azure Cosmos DB container laid out by a RegistryLayout.
+
+    The change stream is the Cosmos change feed in latest-version mode, which
+    does not report deletes. So `delete()` doesn't delete: it marks the item
+    `deleted` with a `ttl`, the feed picks that tombstone up like any other
+    write, and Cosmos removes it once the ttl runs out (the container needs
+    TTL enabled; see REGISTRY_DEFAULT_TTL). Reads, queries and patches all
+    treat tombstones as missing.
+    """
+
+    def __init__(self, container, layout):
+        self.container = container
+        self.layout = layout
+
+    def _translate(self, error):
+        status = getattr(error, 'status_code', None)
+        if status == 404:
+            return ItemNotFound(str(error))
+        if status == 412:
+            return PreconditionFailed(str(error))
+        return None
+
+    def list_items(self):
+        items = self.container.query_items(query=REGISTRY_LIST_QUERY, **self.layout.query_options())
+        return [project_registry_item(item) for item in items]
+
+    def list_all(self):
+        return list(self.container.query_items(query=REGISTRY_ADMIN_QUERY,
+                                               **self.layout.query_options()))
+
+    def get(self, item_id):
+        try:
+            item = self.container.read_item(item=item_id,
+                                            partition_key=self.layout.partition_key(item_id))
+        except Exception as e:
+            raise self._translate(e) or e
+        if item.get('deleted'):
+            raise ItemNotFound(f"Item {item_id} was deleted")
+        return item
+
+    def create(self, item):
+        return self.container.create_item(body=self.layout.stamp(item))
+
+    def replace(self, item):
+        # Replacing a tombstone would bring it back, so check it is still live
+        # and make the replace conditional on that read
+        current = self.get(item['id'])
+        try:
+            return self.container.replace_item(item=item['id'], body=item, etag=current['_etag'],
+                                               match_condition=MatchConditions.IfNotModified)
+        except Exception as e:
+            raise self._translate(e) or e
+
+    def patch(self, item_id, changes, only_if_unbought=False, etag=None):
+        operations = [{'op': 'set', 'path': f'/{field}', 'value': value}
+                      for field, value in changes.items()]
+        options = {'filter_predicate': UNBOUGHT_PREDICATE if only_if_unbought else LIVE_PREDICATE}
+        if etag:
+            options['etag'] = etag
+            options['match_condition'] = MatchConditions.IfNotModified
+        try:
+            return self.container.patch_item(item=item_id,
+                                             partition_key=self.layout.partition_key(item_id),
+                                             patch_operations=operations, **options)
+        except Exception as e:
+            error = self._translate(e) or e
+            # With no other precondition, only the tombstone filter can fail.
+            # Otherwise the caller re-reads, and get() reports the delete.
+            if isinstance(error, PreconditionFailed) and not (only_if_unbought or etag):
+                error = ItemNotFound(f"Item {item_id} was deleted")
+            raise error
+
+    def delete(self, item_id):
+        self.patch(item_id, {'deleted': True, 'ttl': TOMBSTONE_TTL_SECONDS})
+
+    def count_cached_image(self, blob_name):
+        result = list(self.container.query_items(
+            query=COUNT_CACHED_IMAGE_QUERY,
+            parameters=[{'name': '@blob_name', 'value': blob_name}],
+            **self.layout.query_options(),
+        ))
+        return result[0] if result else 0
+
+    def _change_feed(self, **options):
+        """Read the change feed; returns (items, continuation)"""
+        headers = {}
+        if not self.layout.per_item and 'continuation' not in options:
+            options['partition_key'] = self.layout.registry_id
+        items = list(self.container.query_items_change_feed(
+            response_hook=lambda response_headers, _body: headers.update(response_headers),
+            **options))
+        return items, headers.get('etag', options.get('continuation'))
+
+    def changes(self, cursor=None):
+        options = {'continuation': cursor} if cursor else {'start_time': 'Beginning'}
+        items, next_cursor = self._change_feed(**options)
+        # Tombstones are deletes; a stream read from the beginning skips them
+        # like the SQLite engine does
+        changes = [Change(item['id'], None, True) if item.get('deleted') else
+                   Change(item['id'], item, False)
+                   for item in items if not (item.get('deleted') and cursor is None)]
+        return changes, next_cursor
+
+    def start_cursor(self):
+        return self._change_feed(start_time='Now')[1]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registry_items (
+    id TEXT PRIMARY KEY,
+    doc TEXT,
+    price REAL NOT NULL DEFAULT 0,
+    bought INTEGER NOT NULL DEFAULT 0,
+    cached_image TEXT,
+    etag TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_registry_price ON registry_items (deleted, price, id);
+CREATE INDEX IF NOT EXISTS idx_registry_bought_price ON registry_items (deleted, bought, price);
+CREATE INDEX IF NOT EXISTS idx_registry_cached_image ON registry_items (cached_image)
+    WHERE deleted = 0;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_registry_seq ON registry_items (seq);
+"""
+
+
+def _price(item):
+    try:
+        return float(item.get('price') or 0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+class SqliteRegistryStore(RegistryStore):
+    """Registry storage in a local SQLite file.
+
+    Each item is one row: the document as JSON plus indexed price, bought
+    and cached_image columns. Every write takes the next `seq`, and deletes
+    leave a tombstone row, so `changes()` reports deletes as well.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    def _write(self, conn, item, deleted=False):
+        """Store an item (or its tombstone) under the next sequence number.
+        Must be called inside a transaction.
+        """
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM registry_items").fetchone()[0]
+        if deleted:
+            conn.execute("UPDATE registry_items SET doc = NULL, deleted = 1, cached_image = NULL, "
+                         "etag = NULL, seq = ? WHERE id = ?", (seq, item['id']))
+            return None
+        item = dict(item, _etag=uuid.uuid4().hex, _ts=int(time.time()))
+        conn.execute(
+            "INSERT OR REPLACE INTO registry_items "
+            "(id, doc, price, bought, cached_image, etag, deleted, seq) VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+            (item['id'], json.dumps(item), _price(item), int(bool(item.get('bought'))),
+             item.get('cached_image') or None, item['_etag'], seq),
+        )
+        return item
+
+    def _transaction(self, action):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = action(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def _current(self, conn, item_id):
+        row = conn.execute("SELECT doc FROM registry_items WHERE id = ? AND deleted = 0",
+                           (item_id,)).fetchone()
+        if row is None:
+            raise ItemNotFound(item_id)
+        return json.loads(row['doc'])
+
+    def list_items(self):
+        rows = self._connection().execute(
+            "SELECT doc FROM registry_items WHERE deleted = 0 ORDER BY price, id")
+        return [project_registry_item(json.loads(row['doc'])) for row in rows]
+
+    def list_all(self):
+        rows = self._connection().execute(
+            "SELECT doc FROM registry_items WHERE deleted = 0 ORDER BY bought, price")
+        return [json.loads(row['doc']) for row in rows]
+
+    def get(self, item_id):
+        return self._current(self._connection(), item_id)
+
+    def create(self, item):
+        def action(conn):
+            exists = conn.execute("SELECT 1 FROM registry_items WHERE id = ? AND deleted = 0",
+                                  (item['id'],)).fetchone()
+            if exists:
+                raise StoreError(f"Item {item['id']} already exists")
+            return self._write(conn, item)
+        return self._transaction(action)
+
+    def replace(self, item):
+        def action(conn):
+            self._current(conn, item['id'])
+            return self._write(conn, item)
+        return self._transaction(action)
+
+    def patch(self, item_id, changes, only_if_unbought=False, etag=None):
+        def action(conn):
+            current = self._current(conn, item_id)
+            if only_if_unbought and current.get('bought'):
+                raise PreconditionFailed(f"Item {item_id} is already bought")
+            if etag and current.get('_etag') != etag:
+                raise PreconditionFailed(f"Item {item_id} was modified")
+            current.update(changes)
+            return self._write(conn, current)
+        return self._transaction(action)
+
+    def delete(self, item_id):
+        def action(conn):
+            self._current(conn, item_id)
+            self._write(conn, {'id': item_id}, deleted=True)
+        self._transaction(action)
+
+    def count_cached_image(self, blob_name):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM registry_items WHERE cached_image = ? AND deleted = 0",
+            (blob_name,)).fetchone()[0]
+
+    def changes(self, cursor=None):
+        try:
+            since = int(cursor or 0)
+        except (TypeError, ValueError):
+            since = 0
+        rows = self._connection().execute(
+            "SELECT id, doc, deleted, seq FROM registry_items WHERE seq > ? ORDER BY seq",
+            (since,)).fetchall()
+        changes = [Change(row['id'], None if row['deleted'] else json.loads(row['doc']),
+                          bool(row['deleted']))
+                   for row in rows if not (row['deleted'] and cursor is None)]
+        return changes, str(rows[-1]['seq'] if rows else since)
+
+    def start_cursor(self):
+        return str(self._connection().execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM registry_items").fetchone()[0])
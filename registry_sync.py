@@ -0,0 +1,151 @@
+"""
+Registry Read Model
+An in-memory copy of the registry with a monotonically increasing version and
+a bounded change log, so clients can ask "what changed since version N" and
+receive only the changed and removed items. Cursors are "<epoch>:<version>";
+the epoch changes whenever the process restarts, which tells a client holding
+an old cursor to take a full snapshot instead.
+
+Items are stored as immutable RegistryItems. Documents are converted once
+when they are loaded or upserted, and readers share the items without copying.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+
+from registry_item import as_registry_item
+
+
+class RegistryReadModel:
+    """Versioned registry snapshot with a change log for delta sync"""
+
+    def __init__(self, history=1000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.history = history
+        self._items = {}
+        self._changes = deque()
+        self._version = 0
+        self._floor = 0
+        self._loaded_at = None
+        self._touched = {}
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def is_stale(self, max_age, now=None):
+        """True if never loaded, or last loaded more than max_age seconds ago"""
+        if self._loaded_at is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - self._loaded_at >= max_age
+
+    def age(self, now=None):
+        """Seconds since the model was last loaded, or None if never loaded"""
+        if self._loaded_at is None:
+            return None
+        now = time.monotonic() if now is None else now
+        return now - self._loaded_at
+
+    def cursor(self):
+        with self._lock:
+            return f"{self.epoch}:{self._version}"
+
+    def load(self, items, read_at=None):
+        """Diff a full list of registry documents against the model, recording
+        every added, changed or removed item. `read_at` is the wall-clock
+        time the list was read (now by default), e.g. when it comes from a
+        snapshot; upserts and removes applied after it are newer than the
+        list and are kept. Returns the number of changes.
+        """
+        with self._lock:
+            now = time.time()
+            read_at = now if read_at is None else min(read_at, now)
+            incoming = {}
+            for item in items:
+                item = as_registry_item(item)
+                incoming[item.id] = item
+            self._touched = {item_id: touched for item_id, touched in self._touched.items()
+                             if touched > read_at}
+            for item_id in self._touched:
+                incoming.pop(item_id, None)
+                if item_id in self._items:
+                    incoming[item_id] = self._items[item_id]
+
+            changed = 0
+            for item_id, item in incoming.items():
+                if self._items.get(item_id) != item:
+                    self._record(item_id)
+                    changed += 1
+            for item_id in list(self._items):
+                if item_id not in incoming:
+                    self._record(item_id)
+                    changed += 1
+            self._items = incoming
+            self._loaded_at = time.monotonic() - (now - read_at)
+            return changed
+
+    def upsert(self, item):
+        """Record an added or updated item (a RegistryItem or a document)"""
+        item = as_registry_item(item)
+        with self._lock:
+            self._touched[item.id] = time.time()
+            if self._items.get(item.id) != item:
+                self._items[item.id] = item
+                self._record(item.id)
+
+    def remove(self, item_id):
+        """Record a removed item"""
+        with self._lock:
+            self._touched[item_id] = time.time()
+            if self._items.pop(item_id, None) is not None:
+                self._record(item_id)
+
+    def items(self):
+        """Every item in the model"""
+        with self._lock:
+            return list(self._items.values())
+
+    def get(self, item_id):
+        """One item, or None"""
+        return self._items.get(item_id)
+
+    def snapshot(self):
+        """Return (cursor, every item) taken at the same instant"""
+        with self._lock:
+            return self.cursor(), self.items()
+
+    def changes_since(self, cursor):
+        """Return (full, items, removed_ids, cursor) for a client at `cursor`.
+        `full` is True when the cursor is missing, from another epoch, or older
+        than the change log; then `items` is the whole registry.
+        """
+        with self._lock:
+            since = self._parse_cursor(cursor)
+            if since is None or since < self._floor or since > self._version:
+                return True, self.items(), [], self.cursor()
+
+            changed_ids = {item_id for version, item_id in self._changes if version > since}
+            items = [self._items[item_id] for item_id in changed_ids if item_id in self._items]
+            removed = sorted(item_id for item_id in changed_ids if item_id not in self._items)
+            return False, items, removed, self.cursor()
+
+    def _record(self, item_id):
+        self._version += 1
+        self._changes.append((self._version, item_id))
+        if len(self._changes) > self.history:
+            self._floor = self._changes.popleft()[0]
+
+    def _parse_cursor(self, cursor):
+        if not cursor:
+            return None
+        epoch, _, version = cursor.partition(':')
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(version)
+        except ValueError:
+            return None
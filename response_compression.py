@@ -0,0 +1,121 @@
+"""
+Response Compression
+Compresses HTML, JSON and other text responses on their way out, with
+brotli when the client accepts it and the brotli package is installed, else
+gzip. Responses smaller than min_bytes are sent as they are, since the
+framing would cost more than it saves.
+
+Skipped:
+- responses that already have a Content-Encoding (the page cache
+  compresses ahead of time),
+- formats that are already compressed (images, fonts, archives), which are
+  simply not on the compressible list,
+- Server-Sent Events, which must reach the browser event by event,
+- file responses (static files, send_file), partial content, and anything
+  marked Cache-Control: no-transform.
+
+Streamed (generator) responses are compressed chunk by chunk, flushing after
+each one so the client still receives data as it is produced.
+"""
+
+import gzip
+import zlib
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_MIMETYPES = frozenset((
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/msgpack',
+    'image/svg+xml',
+))
+NEVER_COMPRESS_MIMETYPES = frozenset(('text/event-stream',))
+
+
+def compressible(mimetype):
+    if not mimetype or mimetype in NEVER_COMPRESS_MIMETYPES:
+        return False
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+class ResponseCompressor:
+    """Compresses eligible Flask responses. Use compress() as (or from) an
+    after_request hook.
+    """
+
+    def __init__(self, min_bytes=1024, level=6, brotli_quality=4):
+        self.min_bytes = min_bytes
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+
+    def choose_encoding(self, request):
+        """The encoding to use for this client, or None"""
+        return request.accept_encodings.best_match(self.encodings)
+
+    def eligible(self, request, response):
+        if request.method == 'HEAD' or response.status_code < 200 or \
+                response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers or response.direct_passthrough:
+            return False
+        if 'no-transform' in response.cache_control:
+            return False
+        return compressible(response.mimetype)
+
+    def compress(self, request, response):
+        """Compress the response in place when it is eligible; returns it"""
+        if not self.eligible(request, response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_bytes:
+                return response
+            response.set_data(self.compress_bytes(body, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the original, so a strong ETag
+        # no longer identifies them exactly
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def compress_bytes(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, mode=brotli.MODE_TEXT, quality=self.brotli_quality)
+        return gzip.compress(body, self.level, mtime=0)
+
+    def _stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.brotli_quality)
+            process, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            process = compressor.compress
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            finish = compressor.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if chunk:
+                    yield process(chunk) + flush()
+            yield finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
@@ -1,5 +1,7 @@
 # Azure App Service startup file
-from app import app
+from app import app, start_background_workers
+
+start_background_workers()
 
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=8000)
@@ -0,0 +1,89 @@
+"""
+Test cases for the managed Cosmos DB indexing policy
+"""
+
+import copy
+import unittest
+from unittest.mock import Mock
+import os
+import sys
+
+# Add the parent directory to the path so we can import the indexing module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cosmos_indexing import (REGISTRY_DEFAULT_TTL, REGISTRY_INDEXING_POLICY, REGISTRY_LIST_QUERY,
+                             ensure_indexing_policy, policy_matches, project_registry_item)
+
+
+def echoed_policy():
+    """The managed policy the way Cosmos returns it: extra defaults, other order"""
+    policy = copy.deepcopy(REGISTRY_INDEXING_POLICY)
+    policy['indexingMode'] = 'Consistent'
+    policy['includedPaths'] = [dict(entry, indexes=[]) for entry in reversed(policy['includedPaths'])]
+    policy['compositeIndexes'] = list(reversed(policy['compositeIndexes']))
+    policy['spatialIndexes'] = []
+    return policy
+
+
+class IndexingPolicyTestCase(unittest.TestCase):
+    """Test cases for comparing and applying the indexing policy"""
+
+    def test_policy_matches_ignores_echoed_defaults(self):
+        """Test that Cosmos' reordering and extra fields don't count as a change"""
+        self.assertTrue(policy_matches(echoed_policy()))
+
+        default_policy = {'indexingMode': 'consistent', 'includedPaths': [{'path': '/*'}],
+                          'excludedPaths': [{'path': '/"_etag"/?'}]}
+        self.assertFalse(policy_matches(default_policy))
+        self.assertFalse(policy_matches(None))
+
+    def test_ensure_replaces_only_when_different(self):
+        """Test that the container is replaced once and left alone afterwards"""
+        database = Mock()
+        container = Mock()
+        container.read.return_value = {'indexingPolicy': {'includedPaths': [{'path': '/*'}]}}
+
+        self.assertTrue(ensure_indexing_policy(database, container, 'pk'))
+        database.replace_container.assert_called_once_with(
+            container, partition_key='pk', indexing_policy=REGISTRY_INDEXING_POLICY,
+            default_ttl=REGISTRY_DEFAULT_TTL)
+
+        database.reset_mock()
+        container.read.return_value = {'indexingPolicy': echoed_policy(),
+                                       'defaultTtl': REGISTRY_DEFAULT_TTL}
+        self.assertFalse(ensure_indexing_policy(database, container, 'pk'))
+        database.replace_container.assert_not_called()
+
+    def test_ensure_turns_on_ttl(self):
+        """Test that a container without TTL is updated so tombstones can expire"""
+        database = Mock()
+        container = Mock()
+        container.read.return_value = {'indexingPolicy': echoed_policy()}
+
+        self.assertTrue(ensure_indexing_policy(database, container, 'pk'))
+        self.assertEqual(database.replace_container.call_args.kwargs['default_ttl'],
+                         REGISTRY_DEFAULT_TTL)
+
+    def test_composite_indexes_cover_registry_sorts(self):
+        """Test that every ORDER BY the app issues has a matching composite index"""
+        composites = {tuple((entry['path'], entry['order']) for entry in composite)
+                      for composite in REGISTRY_INDEXING_POLICY['compositeIndexes']}
+        self.assertIn((('/bought', 'ascending'), ('/price', 'ascending')), composites)
+        self.assertIn((('/price', 'ascending'), ('/id', 'ascending')), composites)
+        self.assertIn('ORDER BY c.price ASC', REGISTRY_LIST_QUERY)
+
+
+class ProjectionTestCase(unittest.TestCase):
+    """Test cases for the listing projection"""
+
+    def test_project_keeps_only_listing_fields(self):
+        """Test that admin-only and system fields are dropped"""
+        item = {'id': 'a', 'title': 'Kettle', 'price': 60.0, 'bought': True,
+                'bought_by': 'Guest', 'purchase_key': 'k', '_etag': '"1"', '_ts': 1}
+
+        self.assertEqual(project_registry_item(item),
+                         {'id': 'a', 'title': 'Kettle', 'price': 60.0, 'bought': True})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
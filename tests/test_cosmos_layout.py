@@ -0,0 +1,152 @@
+"""
+Test cases for the registry partition layout and the partition migration tool
+"""
+
+import unittest
+import os
+import sys
+
+# Add the parent directory to the path so we can import the layout modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cosmos_indexing import LIVE_ITEM_CONDITION
+from cosmos_layout import RegistryLayout
+from migrate_registry_partitions import migrate, plan_pass
+
+
+class FakeContainer:
+    """Just enough of a Cosmos container for the migration: documents by id,
+    with a _ts that advances on every write
+    """
+
+    def __init__(self, items=(), fail_ids=()):
+        self.clock = 100
+        self.items = {}
+        self.fail_ids = set(fail_ids)
+        self.query_options = []
+        for item in items:
+            self.upsert_item(body=item)
+
+    def query_items(self, query, **options):
+        self.query_options.append(options)
+        live_only = query == f"SELECT * FROM c WHERE {LIVE_ITEM_CONDITION}"
+        return [dict(item) for item in self.items.values() if not (live_only and 'deleted' in item)]
+
+    def upsert_item(self, body):
+        if body['id'] in self.fail_ids:
+            self.fail_ids.discard(body['id'])
+            raise RuntimeError('throttled')
+        self.clock += 1
+        self.items[body['id']] = dict(body, _ts=self.clock, _etag=f'"{self.clock}"')
+
+    def delete_item(self, item, partition_key):
+        del self.items[item]
+
+
+def make_items(count):
+    return [{'id': f'item-{n}', 'title': f'Gift {n}', 'price': float(n), 'bought': False}
+            for n in range(count)]
+
+
+class RegistryLayoutTestCase(unittest.TestCase):
+    """Test cases for partition keys and query scoping"""
+
+    def test_legacy_layout_is_per_item(self):
+        """Test that /id keeps each item in its own partition"""
+        layout = RegistryLayout('/id')
+
+        self.assertEqual(layout.partition_key('item-1'), 'item-1')
+        self.assertEqual(layout.query_options(), {'enable_cross_partition_query': True})
+        self.assertEqual(layout.stamp({'id': 'item-1'}), {'id': 'item-1'})
+
+    def test_registry_layout_is_single_partition(self):
+        """Test that /registry_id scopes reads, writes and queries to one partition"""
+        layout = RegistryLayout('/registry_id', 'wedding')
+
+        self.assertEqual(layout.partition_key('item-1'), 'wedding')
+        self.assertEqual(layout.query_options(), {'partition_key': 'wedding'})
+        self.assertEqual(layout.stamp({'id': 'item-1'}), {'id': 'item-1', 'registry_id': 'wedding'})
+
+    def test_nested_paths_rejected(self):
+        """Test that only top-level partition key paths are accepted"""
+        with self.assertRaises(ValueError):
+            RegistryLayout('/registry/id')
+
+
+class MigrationTestCase(unittest.TestCase):
+    """Test cases for the copy-and-verify migration"""
+
+    def setUp(self):
+        self.layout = RegistryLayout('/registry_id', 'main')
+        self.source = FakeContainer(make_items(30))
+        self.target = FakeContainer()
+
+    def run_migration(self, **kwargs):
+        return migrate(self.source, self.target, self.layout, log=lambda _message: None, **kwargs)
+
+    def test_copies_and_verifies(self):
+        """Test that every item is copied, stamped, and verified on the next pass"""
+        summary = self.run_migration(workers=4)
+
+        self.assertTrue(summary['verified'])
+        self.assertEqual((summary['copied'], summary['passes']), (30, 2))
+        self.assertEqual(len(self.target.items), 30)
+        self.assertTrue(all(item['registry_id'] == 'main' for item in self.target.items.values()))
+        self.assertEqual(self.target.query_options[-1], {'partition_key': 'main'})
+
+    def test_failed_writes_are_retried(self):
+        """Test that a write that fails in one pass is copied in the next"""
+        self.target.fail_ids = {'item-3', 'item-7'}
+
+        summary = self.run_migration()
+
+        self.assertTrue(summary['verified'])
+        self.assertEqual(summary['passes'], 3)
+        self.assertIn('item-3', self.target.items)
+
+    def test_rerun_picks_up_source_changes_but_keeps_newer_target_writes(self):
+        """Test that a later pass copies source edits but never clobbers the app's target writes"""
+        self.run_migration()
+        self.source.upsert_item(body=dict(self.source.items['item-1'], bought=True))
+        self.target.upsert_item(body=dict(self.target.items['item-2'], bought=True))
+
+        to_copy, extra, newer = plan_pass(list(self.source.items.values()),
+                                          list(self.target.items.values()), self.layout)
+        self.assertEqual(([item['id'] for item in to_copy], extra, newer), (['item-1'], [], ['item-2']))
+
+        summary = self.run_migration()
+        self.assertTrue(summary['verified'])
+        self.assertTrue(self.target.items['item-1']['bought'])
+        self.assertTrue(self.target.items['item-2']['bought'])
+
+    def test_tombstones_are_not_copied_or_revived(self):
+        """Test that deleted source items stay behind and target deletes are kept"""
+        self.run_migration()
+        self.source.upsert_item(body=dict(self.source.items['item-1'], deleted=True, ttl=60))
+        self.source.upsert_item(body={'id': 'gone', 'deleted': True, 'ttl': 60})
+        self.target.upsert_item(body=dict(self.target.items['item-2'], deleted=True, ttl=60))
+
+        summary = self.run_migration()
+
+        self.assertTrue(summary['verified'])
+        self.assertNotIn('gone', self.target.items)
+        self.assertNotIn('deleted', self.target.items['item-1'])
+        self.assertEqual(summary['extra'], 1)
+        self.assertTrue(self.target.items['item-2']['deleted'])
+
+    def test_verify_only_and_prune(self):
+        """Test that verify-only writes nothing and prune removes target-only items"""
+        summary = self.run_migration(verify_only=True)
+        self.assertFalse(summary['verified'])
+        self.assertEqual(self.target.items, {})
+
+        self.run_migration()
+        self.target.upsert_item(body={'id': 'stray', 'registry_id': 'main'})
+        summary = self.run_migration(prune=True)
+        self.assertTrue(summary['verified'])
+        self.assertEqual(summary['pruned'], 1)
+        self.assertNotIn('stray', self.target.items)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,112 @@
+"""
+Test cases for the Cosmos DB request-charge instrumentation
+"""
+
+import unittest
+import os
+import sys
+
+# Add the parent directory to the path so we can import the metrics module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cosmos_metrics import CosmosMetrics, CosmosUsage, InstrumentedContainer
+
+
+class StubContainer:
+    """Answers every call with a fixed charge in the response headers"""
+
+    id = 'registry'
+
+    def read_item(self, item, partition_key, response_hook=None):
+        response_hook({'x-ms-request-charge': '1.5'}, {'id': item})
+        if item == 'missing':
+            raise KeyError(item)
+        return {'id': item}
+
+    def query_items(self, query, response_hook=None, **kwargs):
+        for page in range(3):
+            response_hook({'x-ms-request-charge': '2.5'}, None)
+            yield from ({'id': f'{page}-{n}'} for n in range(10))
+
+
+class InstrumentedContainerTestCase(unittest.TestCase):
+    """Test cases for recording calls through the wrapper"""
+
+    def setUp(self):
+        self.metrics = CosmosMetrics()
+        self.usage = CosmosUsage()
+        self.container = InstrumentedContainer(StubContainer(), self.metrics,
+                                               lambda: ('registry', self.usage))
+
+    def operation(self, name, route='registry'):
+        return self.metrics.snapshot()['routes'][route]['operations'][name]
+
+    def test_point_read_records_charge_and_keeps_caller_hook(self):
+        """Test that the wrapper records the charge and still calls the caller's hook"""
+        seen = []
+
+        item = self.container.read_item(item='a', partition_key='a',
+                                        response_hook=lambda headers, _body: seen.append(headers))
+
+        self.assertEqual(item, {'id': 'a'})
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(self.operation('read_item')['request_charge'], 1.5)
+        self.assertEqual((self.usage.operations, self.usage.request_charge), (1, 1.5))
+
+    def test_failed_calls_count_as_errors(self):
+        """Test that an exception is re-raised and recorded as an error"""
+        with self.assertRaises(KeyError):
+            self.container.read_item(item='missing', partition_key='missing')
+
+        read = self.operation('read_item')
+        self.assertEqual((read['calls'], read['errors'], read['items']), (1, 1, 0))
+
+    def test_query_records_pages_and_items(self):
+        """Test that a query is recorded once, after its results are consumed"""
+        results = self.container.query_items(query='SELECT * FROM c')
+        self.assertEqual(self.metrics.snapshot()['routes'], {})
+
+        self.assertEqual(len(list(results)), 30)
+        query = self.operation('query_items')
+        self.assertEqual((query['calls'], query['pages'], query['items'], query['request_charge']),
+                         (1, 3, 30, 7.5))
+
+    def test_abandoned_query_is_still_recorded(self):
+        """Test that stopping early records only the pages actually fetched"""
+        results = self.container.query_items(query='SELECT * FROM c')
+        next(results)
+        results.close()
+
+        query = self.operation('query_items')
+        self.assertEqual((query['pages'], query['items']), (1, 1))
+
+    def test_other_attributes_pass_through(self):
+        """Test that attributes the wrapper doesn't instrument reach the container"""
+        self.assertEqual(self.container.id, 'registry')
+
+
+class CosmosUsageTestCase(unittest.TestCase):
+    """Test cases for the per-request summary"""
+
+    def test_server_timing(self):
+        """Test the Server-Timing header value"""
+        usage = CosmosUsage()
+        usage.add(2.5, 0.004)
+        usage.add(1.0, 0.002)
+
+        self.assertEqual(usage.server_timing(), 'cosmos;dur=6.0;desc="3.50 RU, 2 ops"')
+
+    def test_routes_sorted_by_cost(self):
+        """Test that the most expensive route is listed first"""
+        metrics = CosmosMetrics()
+        metrics.record('home', 'read_item', 1.0, 0.01)
+        metrics.record('registry', 'query_items', 40.0, 0.05, items=100, pages=2)
+
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(list(snapshot['routes']), ['registry', 'home'])
+        self.assertEqual(snapshot['request_charge'], 41.0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
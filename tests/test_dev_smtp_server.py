@@ -0,0 +1,150 @@
+"""
+Test cases for the development SMTP sink
+"""
+
+import unittest
+import os
+import smtplib
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+# Add the parent directory to the path so we can import the server
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dev_smtp_server import start_smtp_server
+from email_log_store import EmailLogStore
+
+
+class DevSMTPServerTestCase(unittest.TestCase):
+    """Test cases for protocol handling and the append-only store"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.thread = start_smtp_server('127.0.0.1', 0, data_dir=cls.tmpdir.name, verbose=False)
+        cls.thread.ready.wait(5)
+        cls.server = cls.thread.smtp_server
+        cls.port = cls.server.port
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+    
+    def stored_emails(self):
+        self.server.store.flush()
+        log_store = self.server.store.log_store
+        return [log_store.get(summary['id']) for summary in log_store.list(limit=1000)]
+    
+    def send(self, subject, body='Hello'):
+        msg = EmailMessage()
+        msg['Subject'] = subject
+        msg['From'] = 'dev@menkevaccawedding.com'
+        msg['To'] = 'couple@example.com'
+        msg.set_content(body)
+        with smtplib.SMTP('127.0.0.1', self.port, timeout=10) as smtp:
+            smtp.send_message(msg)
+    
+    def test_message_is_stored_with_unique_id(self):
+        """Test that a delivered message lands in the store"""
+        self.send('Stored message')
+        
+        records = [r for r in self.stored_emails() if r['subject'] == 'Stored message']
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['to'], ['couple@example.com'])
+        self.assertTrue(records[0]['id'])
+    
+    def test_dot_stuffed_and_large_bodies(self):
+        """Test that lines starting with a dot and bodies over 1 KB survive intact"""
+        body = '.leading dot line\n' + ('x' * 70 + '\n') * 200 + '.\n..two dots\n'
+        self.send('Large message', body)
+        
+        record = [r for r in self.stored_emails() if r['subject'] == 'Large message'][0]
+        self.assertEqual(record['body'].replace('\r\n', '\n'), body)
+    
+    def test_pipelined_commands_in_one_write(self):
+        """Test that commands sent together in one packet are each answered"""
+        with socket.create_connection(('127.0.0.1', self.port), timeout=10) as sock:
+            sock.recv(1024)
+            sock.sendall(b'EHLO test\r\nMAIL FROM:<a@example.com>\r\n'
+                         b'RCPT TO:<b@example.com>\r\nDATA\r\n')
+            replies = b''
+            while b'354' not in replies:
+                replies += sock.recv(4096)
+            sock.sendall(b'Subject: Pipelined\r\n\r\nbody\r\n.\r\nQUIT\r\n')
+            while b'221' not in replies:
+                replies += sock.recv(4096)
+        
+        self.assertIn(b'250-PIPELINING', replies)
+        self.assertIn(b'250 OK Message accepted', replies)
+        self.assertEqual(len([r for r in self.stored_emails() if r['subject'] == 'Pipelined']), 1)
+    
+    def test_concurrent_messages_do_not_overwrite(self):
+        """Test that messages received in the same second are all kept"""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda n: self.send(f'Concurrent {n}'), range(40)))
+        
+        records = [r for r in self.stored_emails() if r['subject'].startswith('Concurrent ')]
+        self.assertEqual(len(records), 40)
+        self.assertEqual(len({r['id'] for r in records}), 40)
+
+
+class EmailLogStoreTestCase(unittest.TestCase):
+    """Test cases for indexed listing, filtering and search"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = EmailLogStore(os.path.join(self.tmpdir.name, 'emails.db'))
+        records = []
+        for n in range(50):
+            records.append({
+                'id': f'msg-{n:03d}',
+                'timestamp': f'2025-08-30T12:{n:02d}:00',
+                'from': 'dev@menkevaccawedding.com',
+                'to': ['couple@example.com' if n % 2 else 'planner@example.com'],
+                'subject': f'Registry Item Purchased: Knife Sharpener {n}' if n % 10 == 0
+                           else f'Registry Item Purchased: Vase {n}',
+                'body': f'Purchased by Guest {n}',
+            })
+        self.store.add_many(records)
+    
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+    
+    def test_pages_follow_cursor(self):
+        """Test that keyset pages are newest-first and do not overlap"""
+        first = self.store.list(limit=20)
+        second = self.store.list(limit=20, before=first[-1]['seq'])
+        
+        self.assertEqual(first[0]['id'], 'msg-049')
+        self.assertEqual(second[0]['seq'], first[-1]['seq'] - 1)
+        self.assertFalse({m['id'] for m in first} & {m['id'] for m in second})
+    
+    def test_filters_by_recipient_subject_and_time(self):
+        """Test recipient, subject and time-range filters"""
+        self.assertEqual(len(self.store.list(limit=100, recipient='couple@example.com')), 25)
+        self.assertEqual(len(self.store.list(limit=100, subject='knife')), 5)
+        recent = self.store.list(limit=100, since='2025-08-30T12:45:00')
+        self.assertEqual([m['id'] for m in recent][-1], 'msg-045')
+    
+    def test_full_text_search_with_prefix(self):
+        """Test that search matches body words and prefixes"""
+        results = self.store.list(limit=10, query='sharp')
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.store.list(limit=10, query='Guest 7')[0]['id'], 'msg-007')
+    
+    def test_tail_after_cursor(self):
+        """Test that following returns only messages after the last seen one"""
+        last = self.store.latest_seq()
+        self.store.add({'id': 'msg-new', 'timestamp': '2025-08-30T13:00:00', 'from': 'a',
+                        'to': ['b'], 'subject': 'New', 'body': 'New'})
+        
+        self.assertEqual([m['id'] for m in self.store.list(after=last)], ['msg-new'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
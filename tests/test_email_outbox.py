@@ -0,0 +1,182 @@
+"""
+Test cases for the durable email outbox
+"""
+
+import unittest
+from unittest.mock import Mock
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the path so we can import the outbox
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_outbox import DigestPolicy, EmailOutbox, OutboxSender
+
+
+class EmailOutboxTestCase(unittest.TestCase):
+    """Test cases for outbox storage, retries and dead-lettering"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.outbox = EmailOutbox(os.path.join(self.tmpdir.name, 'outbox.db'),
+                                  max_attempts=3, base_backoff=0)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_enqueue_and_claim(self):
+        """Test that a queued notification is claimed once with its payload"""
+        notification_id = self.outbox.enqueue('registry_purchase', {'name': 'Jane'})
+        
+        claimed = self.outbox.claim()
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claimed[0]['id'], notification_id)
+        self.assertEqual(claimed[0]['payload'], {'name': 'Jane'})
+        
+        # A leased record is not handed out twice
+        self.assertEqual(self.outbox.claim(), [])
+    
+    def test_failed_delivery_is_retried_then_dead_lettered(self):
+        """Test that failures back off and end up in the dead-letter state"""
+        notification_id = self.outbox.enqueue('registry_purchase', {})
+        
+        self.outbox.claim()
+        self.assertEqual(self.outbox.mark_failed(notification_id, 'boom'), 'pending')
+        self.outbox.claim()
+        self.assertEqual(self.outbox.mark_failed(notification_id, 'boom'), 'pending')
+        self.outbox.claim()
+        self.assertEqual(self.outbox.mark_failed(notification_id, 'boom'), 'dead')
+        
+        stats = self.outbox.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['counts']['dead'], 1)
+        
+        self.assertEqual(self.outbox.retry_dead(), 1)
+        self.assertEqual(self.outbox.stats()['queue_depth'], 1)
+    
+    def test_stats_report_delivery_latency(self):
+        """Test that delivered notifications feed the latency summary"""
+        notification_id = self.outbox.enqueue('registry_purchase', {})
+        self.outbox.claim()
+        self.outbox.mark_sent(notification_id)
+        
+        stats = self.outbox.stats()
+        self.assertEqual(stats['counts']['sent'], 1)
+        self.assertEqual(stats['delivery_latency_seconds']['count'], 1)
+        self.assertIsNotNone(stats['delivery_latency_seconds']['p95'])
+
+
+class OutboxSenderTestCase(unittest.TestCase):
+    """Test cases for the background sender"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.outbox = EmailOutbox(os.path.join(self.tmpdir.name, 'outbox.db'),
+                                  max_attempts=2, base_backoff=0)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_run_once_delivers_and_records_failures(self):
+        """Test that the sender marks delivered and failed records"""
+        self.outbox.enqueue('registry_purchase', {'ok': True})
+        self.outbox.enqueue('registry_purchase', {'ok': False})
+        deliver = Mock(side_effect=lambda record: record['payload']['ok'])
+        sender = OutboxSender(self.outbox, deliver)
+        
+        self.assertEqual(sender.run_once(), 1)
+        counts = self.outbox.stats()['counts']
+        self.assertEqual(counts['sent'], 1)
+        self.assertEqual(counts['pending'], 1)
+    
+    def test_delivery_exception_counts_as_failure(self):
+        """Test that an exception from the transport does not lose the record"""
+        self.outbox.enqueue('registry_purchase', {})
+        sender = OutboxSender(self.outbox, Mock(side_effect=RuntimeError('SMTP down')))
+        
+        self.assertEqual(sender.run_once(), 0)
+        self.assertEqual(self.outbox.stats()['queue_depth'], 1)
+
+    
+    def test_purge_runs_once_per_interval(self):
+        """Test that the sender purges old delivered notifications on a timer"""
+        notification_id = self.outbox.enqueue('registry_purchase', {})
+        self.outbox.claim()
+        self.outbox.mark_sent(notification_id)
+        sender = OutboxSender(self.outbox, Mock(return_value=True),
+                              purge_interval=3600, retention_seconds=0)
+        
+        now = time.time() + 1
+        self.assertEqual(sender.purge_if_due(now), 1)
+        self.assertEqual(self.outbox.stats()['counts']['sent'], 0)
+        
+        later_id = self.outbox.enqueue('registry_purchase', {})
+        self.outbox.claim()
+        self.outbox.mark_sent(later_id)
+        self.assertEqual(sender.purge_if_due(now + 60), 0)
+        self.assertEqual(sender.purge_if_due(now + 3601), 1)
+        self.assertEqual(sender.metrics()['purged'], 2)
+
+
+class DigestPolicyTestCase(unittest.TestCase):
+    """Test cases for digest batching of purchase notifications"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.outbox = EmailOutbox(os.path.join(self.tmpdir.name, 'outbox.db'),
+                                  max_attempts=3, base_backoff=0)
+        self.deliver = Mock(return_value=True)
+        self.deliver_batch = Mock(return_value=True)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def make_sender(self, window_seconds=3600, max_events=3):
+        digest = DigestPolicy('registry_purchase', self.deliver_batch,
+                              window_seconds=window_seconds, max_events=max_events)
+        return OutboxSender(self.outbox, self.deliver, digest=digest)
+    
+    def test_digest_waits_for_window(self):
+        """Test that events are held until the window or event limit is reached"""
+        sender = self.make_sender()
+        self.outbox.enqueue('registry_purchase', {'item_title': 'Vase'})
+        
+        self.assertEqual(sender.run_once(), 0)
+        self.deliver_batch.assert_not_called()
+        self.assertEqual(self.outbox.stats()['queue_depth'], 1)
+    
+    def test_digest_sends_one_message_at_event_limit(self):
+        """Test that reaching max_events sends a single combined message"""
+        sender = self.make_sender()
+        for title in ['Vase', 'Coffee Maker', 'Toaster']:
+            self.outbox.enqueue('registry_purchase', {'item_title': title})
+        
+        self.assertEqual(sender.run_once(), 3)
+        self.deliver_batch.assert_called_once()
+        self.assertEqual(len(self.deliver_batch.call_args.args[0]), 3)
+        self.assertEqual(sender.metrics()['messages_sent'], 1)
+        self.assertEqual(sender.metrics()['events_delivered'], 3)
+    
+    def test_digest_sends_when_window_elapses(self):
+        """Test that an expired window flushes a partial digest"""
+        sender = self.make_sender(window_seconds=0)
+        self.outbox.enqueue('registry_purchase', {'item_title': 'Vase'})
+        
+        self.assertEqual(sender.run_once(), 1)
+        self.deliver_batch.assert_called_once()
+    
+    def test_other_kinds_are_sent_immediately(self):
+        """Test that kinds outside the digest are still delivered one by one"""
+        sender = self.make_sender()
+        self.outbox.enqueue('registry_purchase', {'item_title': 'Vase'})
+        self.outbox.enqueue('rsvp', {'name': 'Jane'})
+        
+        self.assertEqual(sender.run_once(), 1)
+        self.deliver.assert_called_once()
+        self.deliver_batch.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,69 @@
+"""
+Test cases for the notification email templates
+"""
+
+import unittest
+import os
+import sys
+
+# Add the parent directory to the path so we can import the templates
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_templates import render_digest_email, render_purchase_email
+
+
+class EmailTemplatesTestCase(unittest.TestCase):
+    """Test cases for plain-text and HTML notification rendering"""
+    
+    def setUp(self):
+        self.event = {
+            'item_title': 'Beautiful Vase',
+            'name': 'Jane Smith',
+            'purchase_date': '2025-08-30',
+            'item_url': 'https://example.com/item1',
+            'delivery_date': '2025-09-05',
+            'note': 'Congratulations <3',
+        }
+    
+    def test_purchase_email_has_text_and_html_parts(self):
+        """Test that one purchase renders both parts with every detail"""
+        rendered = render_purchase_email(self.event)
+        
+        self.assertEqual(rendered.subject, 'Registry Item Purchased: Beautiful Vase')
+        self.assertIn('- Item: Beautiful Vase', rendered.text)
+        self.assertIn('- Purchased by: Jane Smith', rendered.text)
+        self.assertIn('- Estimated delivery: 2025-09-05', rendered.text)
+        self.assertIn('"Congratulations <3"', rendered.text)
+        self.assertIn('<a href="https://example.com/item1"', rendered.html)
+        self.assertIn('Jane Smith', rendered.html)
+    
+    def test_html_part_escapes_guest_input(self):
+        """Test that guest-supplied text cannot inject markup into the HTML part"""
+        event = dict(self.event, note='<script>alert(1)</script>')
+        
+        rendered = render_purchase_email(event)
+        
+        self.assertNotIn('<script>', rendered.html)
+        self.assertIn('&lt;script&gt;', rendered.html)
+    
+    def test_optional_fields_are_omitted(self):
+        """Test that missing delivery date and note leave no empty lines behind"""
+        event = dict(self.event, delivery_date='', note='')
+        
+        rendered = render_purchase_email(event)
+        
+        self.assertNotIn('Estimated delivery', rendered.text)
+        self.assertNotIn('Personal message', rendered.text)
+    
+    def test_digest_rendering(self):
+        """Test the digest template"""
+        second = dict(self.event, item_title='Coffee Maker', name='John Doe')
+        
+        digest = render_digest_email([self.event, second])
+        
+        self.assertEqual(digest.subject, '2 Registry Items Purchased')
+        self.assertIn('2. Coffee Maker', digest.text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,86 @@
+"""
+Test cases for the notification email transports
+"""
+
+import unittest
+from unittest.mock import Mock
+from email.message import EmailMessage
+import smtplib
+import os
+import sys
+
+# Add the parent directory to the path so we can import the transports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_transport import AcsEmailTransport, PooledSmtpTransport
+
+
+def make_message(subject):
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = 'dev@menkevaccawedding.com'
+    msg['To'] = 'couple@example.com'
+    msg.set_content('Body')
+    return msg
+
+
+class AcsEmailTransportTestCase(unittest.TestCase):
+    """Test cases for the shared ACS client"""
+    
+    def test_client_is_created_once(self):
+        """Test that repeated sends reuse one EmailClient"""
+        factory = Mock()
+        transport = AcsEmailTransport(factory)
+        
+        transport.send('endpoint=x', {'subject': 'a'})
+        transport.send('endpoint=x', {'subject': 'b'})
+        
+        factory.assert_called_once_with('endpoint=x')
+        self.assertEqual(factory.return_value.begin_send.call_count, 2)
+
+
+class PooledSmtpTransportTestCase(unittest.TestCase):
+    """Test cases for the pooled SMTP connection"""
+    
+    def setUp(self):
+        self.smtp_class = Mock()
+        self.transport = PooledSmtpTransport('smtp.example.com', 587, use_tls=True,
+                                             username='user', password='secret',
+                                             smtp_class=self.smtp_class)
+    
+    def test_messages_share_one_session(self):
+        """Test that consecutive sends reuse the same authenticated session"""
+        self.transport.send(make_message('one'))
+        self.transport.send(make_message('two'))
+        self.transport.send_many([make_message('three'), make_message('four')])
+        
+        self.smtp_class.assert_called_once()
+        conn = self.smtp_class.return_value
+        conn.starttls.assert_called_once()
+        conn.login.assert_called_once_with('user', 'secret')
+        self.assertEqual(conn.send_message.call_count, 4)
+    
+    def test_reconnects_when_server_drops_session(self):
+        """Test that a dropped session is replaced and the message retried"""
+        stale = Mock()
+        stale.send_message.side_effect = smtplib.SMTPServerDisconnected('gone')
+        fresh = Mock()
+        self.smtp_class.side_effect = [stale, fresh]
+        
+        self.transport.send(make_message('retry me'))
+        
+        fresh.send_message.assert_called_once()
+        self.assertEqual(self.transport.connections_opened, 2)
+    
+    def test_failed_session_is_not_returned_to_pool(self):
+        """Test that a session that raised a non-retryable error is discarded"""
+        conn = self.smtp_class.return_value
+        conn.send_message.side_effect = smtplib.SMTPRecipientsRefused({})
+        
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            self.transport.send(make_message('refused'))
+        self.assertEqual(self.transport._idle, [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
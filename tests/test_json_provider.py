@@ -0,0 +1,177 @@
+"""
+Test cases for the fast JSON provider and negotiated registry responses
+"""
+
+import json
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider
+
+# Add the parent directory to the path so we can import the provider module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_provider
+from json_provider import (MSGPACK_AVAILABLE, ORJSON_AVAILABLE, FastJSONProvider, SerializedCache,
+                           negotiated_response)
+from registry_item import RegistryItem
+
+SAMPLE = {
+    'version': 'abc:3',
+    'when': datetime(2025, 8, 30, 12, 0, tzinfo=timezone.utc),
+    'amount': Decimal('45.99'),
+    'item': RegistryItem('item-1', 'Vase', 'https://example.com/vase', 45.99, False),
+    'tags': ['a', 'b'],
+    'empty': None,
+}
+
+
+def make_app():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    return app
+
+
+class FastJSONProviderTestCase(unittest.TestCase):
+    """Test cases for output compatibility with Flask's default provider"""
+
+    def setUp(self):
+        self.app = make_app()
+        self.default = DefaultJSONProvider(self.app)
+
+    def test_matches_default_provider(self):
+        """Test that dates, decimals, dataclasses and key order match Flask"""
+        self.assertEqual(json.loads(self.app.json.dumps(SAMPLE)),
+                         json.loads(self.default.dumps(SAMPLE)))
+        self.assertEqual(list(json.loads(self.app.json.dumps({'b': 1, 'a': 2}))), ['a', 'b'])
+
+    def test_jsonify_round_trip(self):
+        """Test that jsonify responses decode to the same data"""
+        with self.app.test_request_context():
+            response = self.app.json.response(SAMPLE)
+
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(response.get_json(), json.loads(self.default.dumps(SAMPLE)))
+
+    def test_unencodable_value_raises_type_error(self):
+        """Test that unsupported types still fail the way the stdlib does"""
+        with self.assertRaises(TypeError):
+            self.app.json.dumps({'value': object()})
+
+    def test_large_integers_fall_back(self):
+        """Test that integers orjson can't represent are encoded by the stdlib"""
+        self.assertEqual(json.loads(self.app.json.dumps({'n': 2 ** 70})), {'n': 2 ** 70})
+
+    def test_stdlib_fallback(self):
+        """Test that the provider works without orjson installed"""
+        with patch.object(json_provider, 'ORJSON_AVAILABLE', False):
+            body = self.app.json.dump_bytes(SAMPLE)
+            loaded = self.app.json.loads(body)
+
+        self.assertEqual(loaded, json.loads(self.default.dumps(SAMPLE)))
+
+    @unittest.skipUnless(ORJSON_AVAILABLE, 'orjson is not installed')
+    def test_orjson_and_stdlib_agree(self):
+        """Test that both encoders produce the same document"""
+        fast = self.app.json.dump_bytes(SAMPLE)
+        with patch.object(json_provider, 'ORJSON_AVAILABLE', False):
+            slow = self.app.json.dump_bytes(SAMPLE)
+
+        self.assertEqual(json.loads(fast), json.loads(slow))
+
+
+class SerializedCacheTestCase(unittest.TestCase):
+    """Test cases for the encoded body cache"""
+
+    def test_builds_once_per_key(self):
+        """Test that a cached key is not rebuilt"""
+        cache = SerializedCache()
+        builds = []
+
+        def build():
+            builds.append(1)
+            return b'body'
+
+        self.assertEqual(cache.get_or_build('a', build), b'body')
+        self.assertEqual(cache.get_or_build('a', build), b'body')
+        self.assertEqual(len(builds), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the cache stays within max_entries"""
+        cache = SerializedCache(max_entries=2)
+        cache.get_or_build('a', lambda: 'a')
+        cache.get_or_build('b', lambda: 'b')
+        cache.get_or_build('a', lambda: 'a')
+        cache.get_or_build('c', lambda: 'c')
+
+        self.assertEqual(cache.get_or_build('a', lambda: 'rebuilt'), 'a')
+        self.assertEqual(cache.get_or_build('b', lambda: 'rebuilt'), 'rebuilt')
+
+
+class NegotiatedResponseTestCase(unittest.TestCase):
+    """Test cases for format negotiation"""
+
+    def setUp(self):
+        self.app = make_app()
+        self.payload = {'items': [{'id': f'item-{n}', 'title': 'Gift'} for n in range(200)]}
+
+    def respond(self, headers, payload=None, **kwargs):
+        with self.app.test_request_context(headers=headers):
+            return negotiated_response(self.app, request, payload or self.payload, **kwargs)
+
+    def test_plain_json_by_default(self):
+        """Test that clients without an Accept preference get JSON"""
+        response = self.respond({})
+
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(json.loads(response.get_data()), self.payload)
+        self.assertEqual(set(response.vary), {'Accept'})
+
+    def test_content_encoding_is_left_to_the_compression_hook(self):
+        """Test that a gzip client still gets an uncompressed body from here"""
+        response = self.respond({'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(json.loads(response.get_data()), self.payload)
+
+    def test_payload_function_is_only_called_on_a_miss(self):
+        """Test that a cached encoding skips building the payload"""
+        cache = SerializedCache()
+        calls = []
+
+        def payload():
+            calls.append(1)
+            return self.payload
+
+        first = self.respond({}, payload=payload, cache=cache, cache_key='v1')
+        second = self.respond({}, payload=payload, cache=cache, cache_key='v1')
+
+        self.assertEqual(second.get_data(), first.get_data())
+        self.assertEqual(len(calls), 1)
+
+    def test_msgpack_ignored_when_unavailable(self):
+        """Test that msgpack requests get JSON when msgpack isn't installed"""
+        with patch.object(json_provider, 'MSGPACK_AVAILABLE', False):
+            response = self.respond({'Accept': 'application/msgpack'})
+
+        self.assertEqual(response.mimetype, 'application/json')
+
+    @unittest.skipUnless(MSGPACK_AVAILABLE, 'msgpack is not installed')
+    def test_msgpack_when_preferred(self):
+        """Test that msgpack clients get msgpack"""
+        import msgpack
+
+        response = self.respond({'Accept': 'application/msgpack'})
+
+        self.assertEqual(response.mimetype, 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.get_data()), self.payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
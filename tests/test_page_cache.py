@@ -0,0 +1,147 @@
+"""
+Test cases for the rendered page cache
+"""
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, flash, redirect
+
+# Add the parent directory to the path so we can import the cache module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import page_cache as page_cache_module
+from page_cache import BROTLI_AVAILABLE, PageCache
+
+
+class PageCacheTestCase(unittest.TestCase):
+    """Test cases for rendering, encodings, ETags and invalidation"""
+
+    def setUp(self):
+        self.templates = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.templates, ignore_errors=True)
+        self.write('base.html', '<html>{% for m in get_flashed_messages() %}<p>{{ m }}</p>'
+                                '{% endfor %}{% block content %}{% endblock %}'
+                                '{% include "footer.html" %}</html>')
+        self.write('footer.html', '<footer>See you there</footer>')
+        self.write('page.html', '{% extends "base.html" %}{% block content %}'
+                                + 'Our story. ' * 200 + '{% endblock %}')
+
+        self.app = Flask(__name__, template_folder=self.templates)
+        self.app.secret_key = 'test'
+        self.cache = PageCache(self.app)
+        self.app.add_url_rule('/', 'page', lambda: self.cache.serve('page.html'))
+
+        @self.app.route('/flash')
+        def flash_and_redirect():
+            flash('Saved')
+            return redirect('/')
+
+        self.client = self.app.test_client()
+
+    def write(self, name, source, mtime=None):
+        path = os.path.join(self.templates, name)
+        with open(path, 'w') as handle:
+            handle.write(source)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_page_is_rendered_once(self):
+        """Test that repeat requests reuse the rendered page"""
+        first = self.client.get('/')
+        second = self.client.get('/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(b'Our story.', first.data)
+        self.assertIn(b'See you there', first.data)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.cache.renders, 1)
+
+    def test_gzip_when_accepted(self):
+        """Test that gzip clients get the precompressed body"""
+        plain = self.client.get('/')
+        compressed = self.client.get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertLess(len(compressed.data), len(plain.data))
+        self.assertEqual(compressed.headers['Vary'], 'Accept-Encoding')
+        self.assertNotEqual(compressed.headers['ETag'], plain.headers['ETag'])
+
+    @unittest.skipUnless(BROTLI_AVAILABLE, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test that brotli is chosen when the client accepts it"""
+        import brotli
+
+        plain = self.client.get('/')
+        response = self.client.get('/', headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.data), plain.data)
+
+    def test_brotli_skipped_when_unavailable(self):
+        """Test that br-only clients get the uncompressed page without brotli"""
+        with patch.object(page_cache_module, 'BROTLI_AVAILABLE', False), \
+                patch.object(page_cache_module, 'ENCODINGS', ('gzip', 'identity')):
+            self.cache.clear()
+            response = self.client.get('/', headers={'Accept-Encoding': 'br'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_matching_etag_returns_304(self):
+        """Test that a browser holding the current page gets 304"""
+        etag = self.client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+        response = self.client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.headers['ETag'], etag)
+
+    def test_etag_of_another_encoding_does_not_match(self):
+        """Test that a gzip copy's ETag doesn't revalidate the uncompressed page"""
+        etag = self.client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+        response = self.client.get('/', headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_template_change_rerenders(self):
+        """Test that editing an included template invalidates the page"""
+        first = self.client.get('/')
+        self.write('footer.html', '<footer>New date</footer>', mtime=2000000000)
+
+        second = self.client.get('/')
+
+        self.assertIn(b'New date', second.data)
+        self.assertNotEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(self.cache.renders, 2)
+
+    def test_flashed_messages_bypass_cache(self):
+        """Test that a page showing flashed messages is rendered for that request"""
+        self.client.get('/')
+        response = self.client.get('/flash', follow_redirects=True)
+
+        self.assertIn(b'<p>Saved</p>', response.data)
+        self.assertNotIn(b'Saved', self.client.get('/').data)
+        self.assertEqual(self.cache.renders, 1)
+
+    def test_warm_renders_ahead_of_requests(self):
+        """Test that warmed pages are served without rendering"""
+        self.cache.warm(['page.html'])
+
+        self.client.get('/')
+
+        self.assertEqual(self.cache.renders, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Test cases for the registry change event broker
+"""
+
+import unittest
+import os
+import sys
+
+# Add the parent directory to the path so we can import the broker
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_events import (EVENT_BOUGHT, EVENT_REMOVED, RegistryEventBroker, format_sse,
+                             parse_last_event_id)
+
+
+class RegistryEventBrokerTestCase(unittest.TestCase):
+    """Test cases for publishing, replay and stream lifecycle"""
+
+    def setUp(self):
+        self.broker = RegistryEventBroker(history=3, max_subscribers=2, max_pending=2)
+
+    def test_publish_reaches_every_subscriber(self):
+        """Test that one published event is delivered to each open stream"""
+        first, _ = self.broker.subscribe()
+        second, _ = self.broker.subscribe()
+
+        event = self.broker.publish(EVENT_BOUGHT, {'id': 'item-1'})
+
+        self.assertEqual(first.get(timeout=1), event)
+        self.assertEqual(second.get(timeout=1), event)
+
+    def test_reconnect_replays_missed_events(self):
+        """Test that Last-Event-ID replays only newer events still in history"""
+        events = [self.broker.publish(EVENT_BOUGHT, {'id': f'item-{n}'}) for n in range(5)]
+
+        _, missed = self.broker.subscribe(last_event_id=events[2]['id'])
+
+        self.assertEqual([event['id'] for event in missed], [events[3]['id'], events[4]['id']])
+
+    def test_subscriber_limit(self):
+        """Test that streams beyond the cap are refused"""
+        self.broker.subscribe()
+        self.broker.subscribe()
+
+        subscription, _ = self.broker.subscribe()
+
+        self.assertIsNone(subscription)
+
+    def test_slow_subscriber_is_cut_off(self):
+        """Test that a stream that stops reading ends instead of buffering forever"""
+        subscription, _ = self.broker.subscribe()
+        for n in range(3):
+            self.broker.publish(EVENT_BOUGHT, {'id': f'item-{n}'})
+
+        frames = list(self.broker.stream(subscription, heartbeat=0.01, max_duration=1))
+
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(frames, ["retry: 3000\n\n"])
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    def test_stream_frames_and_unsubscribes(self):
+        """Test that a stream yields replayed events and heartbeats, then cleans up"""
+        event = self.broker.publish(EVENT_REMOVED, {'id': 'item-1'})
+        subscription, missed = self.broker.subscribe(last_event_id=0)
+
+        frames = list(self.broker.stream(subscription, missed, heartbeat=0.01, max_duration=0.05))
+
+        self.assertEqual(frames[1], format_sse(event))
+        self.assertIn(": keep-alive\n\n", frames)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    def test_format_sse(self):
+        """Test the Server-Sent Events wire format"""
+        frame = format_sse({'id': 7, 'type': EVENT_BOUGHT, 'data': {'id': 'item-1'}})
+
+        self.assertEqual(frame, 'id: 7\nevent: bought\ndata: {"id":"item-1"}\n\n')
+
+    def test_parse_last_event_id(self):
+        """Test that unusable Last-Event-ID values disable replay"""
+        self.assertEqual(parse_last_event_id('12'), 12)
+        self.assertIsNone(parse_last_event_id(None))
+        self.assertIsNone(parse_last_event_id('abc'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
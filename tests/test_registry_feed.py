@@ -0,0 +1,143 @@
+"""
+Test cases for the registry change feed consumer
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the path so we can import the feed module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_feed import FCNTL_AVAILABLE, FeedCheckpoint, FeedLease, RegistryChangeFeed
+from registry_store import SqliteRegistryStore
+
+
+def make_item(item_id, price=10.0):
+    return {'id': item_id, 'title': f'Gift {item_id}', 'price': price, 'bought': False}
+
+
+class FeedLeaseTestCase(unittest.TestCase):
+    """Test cases for slot leases and checkpoints"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    @unittest.skipUnless(FCNTL_AVAILABLE, 'fcntl locks are POSIX-only')
+    def test_live_leases_get_distinct_slots(self):
+        """Test that concurrent consumers never share a slot, and a released slot is reused"""
+        first = FeedLease(self.directory, 'host', slots=2)
+        second = FeedLease(self.directory, 'host', slots=2)
+        third = FeedLease(self.directory, 'host', slots=2)
+
+        self.assertEqual((first.acquire(), second.acquire(), third.acquire()), (0, 1, None))
+        self.assertNotEqual(first.checkpoint_path, second.checkpoint_path)
+
+        first.release()
+        self.assertEqual(third.acquire(), 0)
+        second.release()
+        third.release()
+
+    def test_checkpoint_round_trip(self):
+        """Test that a checkpoint is saved atomically and read back"""
+        checkpoint = FeedCheckpoint(os.path.join(self.directory, 'feed.json'))
+        self.assertIsNone(checkpoint.load())
+
+        checkpoint.save('42', applied=3)
+
+        state = checkpoint.load()
+        self.assertEqual((state['cursor'], state['applied']), ('42', 3))
+        self.assertEqual(os.listdir(self.directory), ['feed.json'])
+
+
+class RegistryChangeFeedTestCase(unittest.TestCase):
+    """Test cases for streaming store changes into a cache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.store = SqliteRegistryStore(os.path.join(self.directory, 'registry.db'))
+        self.store.create(make_item('a'))
+        self.cache = {}
+        self.lease = FeedLease(self.directory, 'test')
+        self.addCleanup(self.lease.release)
+
+    def apply(self, change):
+        if change.deleted:
+            return self.cache.pop(change.item_id, None) is not None
+        if self.cache.get(change.item_id) == change.item:
+            return False
+        self.cache[change.item_id] = change.item
+        return True
+
+    def bootstrap(self):
+        # A write lands while the full load is running; the feed must replay it
+        for item in self.store.list_all():
+            self.cache[item['id']] = item
+        self.store.create(make_item('written-during-load'))
+
+    def make_feed(self, **kwargs):
+        return RegistryChangeFeed(lambda: self.store, self.apply, bootstrap=self.bootstrap,
+                                  lease=self.lease, **kwargs)
+
+    def test_bootstrap_then_only_changes(self):
+        """Test that the feed loads once and then applies only what changed"""
+        feed = self.make_feed()
+        self.assertTrue(feed.open())
+
+        self.assertEqual(feed.poll_once(), 1)
+        self.assertIn('written-during-load', self.cache)
+
+        self.store.patch('a', {'bought': True})
+        self.store.delete('written-during-load')
+        self.assertEqual(feed.poll_once(), 2)
+        self.assertTrue(self.cache['a']['bought'])
+        self.assertNotIn('written-during-load', self.cache)
+        self.assertEqual(feed.poll_once(), 0)
+        self.assertEqual(feed.checkpoint.load()['cursor'], feed.cursor)
+
+    def test_resume_from_checkpoint_skips_bootstrap(self):
+        """Test that a restarted consumer whose cache is current continues from its checkpoint"""
+        feed = self.make_feed()
+        feed.open()
+        feed.poll_once()
+        self.lease.release()
+        self.store.patch('a', {'title': 'Changed while down'})
+
+        resumed = self.make_feed(resume=lambda state: state['cursor'])
+        resumed.bootstrap = lambda: self.fail('bootstrap should not run')
+        resumed.open()
+
+        self.assertEqual(resumed.poll_once(), 1)
+        self.assertEqual(self.cache['a']['title'], 'Changed while down')
+
+    def test_resume_declined_bootstraps(self):
+        """Test that a checkpoint the cache doesn't match leads to a full load,
+        and that checkpoint_state is saved with the cursor
+        """
+        feed = self.make_feed(checkpoint_state=lambda: {'snapshot_version': 7})
+        feed.open()
+        feed.poll_once()
+        self.assertEqual(feed.checkpoint.load()['snapshot_version'], 7)
+        self.lease.release()
+
+        loads = []
+        resumed = self.make_feed(resume=lambda state: None)
+        resumed.bootstrap = lambda: loads.append(True)
+        resumed.open()
+
+        self.assertEqual(loads, [True])
+
+    def test_unavailable_store_is_retried(self):
+        """Test that the feed waits for the store instead of failing"""
+        feed = RegistryChangeFeed(lambda: None, self.apply)
+
+        self.assertFalse(feed.open())
+        self.assertFalse(feed.healthy())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,126 @@
+"""
+Test cases for content-addressed registry image storage
+"""
+
+import hashlib
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+# Add the parent directory to the path so we can import the images module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import registry_images
+from registry_images import GC_GRACE_PERIOD, delete_unused_image, download_image, store_image
+
+IMAGE_BYTES = b'\x89PNG' + bytes(range(256)) * 64
+
+
+def image_response(content_type='image/png; charset=binary', body=IMAGE_BYTES):
+    response = Mock()
+    response.headers = {'Content-Type': content_type}
+    response.iter_content.return_value = [body[n:n + 1000] for n in range(0, len(body), 1000)]
+    return response
+
+
+class DownloadImageTestCase(unittest.TestCase):
+    """Test cases for streaming downloads"""
+
+    @patch('registry_images.requests.get')
+    def test_hashes_while_streaming(self, mock_get):
+        """Test that the blob name is the content hash and the body is spooled"""
+        mock_get.return_value = image_response()
+
+        with patch.object(registry_images, 'SPOOL_MAX_BYTES', 4096):
+            blob_name, content_type, body = download_image('https://example.com/a.png')
+
+        with body:
+            self.assertEqual(blob_name, hashlib.sha256(IMAGE_BYTES).hexdigest() + '.png')
+            self.assertEqual(content_type, 'image/png')
+            self.assertTrue(body._rolled)  # spilled to disk rather than held in memory
+            self.assertEqual(body.read(), IMAGE_BYTES)
+
+    @patch('registry_images.requests.get')
+    def test_unknown_type_is_stored_as_jpeg(self, mock_get):
+        mock_get.return_value = image_response('application/octet-stream')
+
+        blob_name, _, body = download_image('https://example.com/a')
+        body.close()
+
+        self.assertTrue(blob_name.endswith('.jpg'))
+
+
+@patch('registry_images.requests.get', return_value=None)
+class StoreImageTestCase(unittest.TestCase):
+    """Test cases for uploading and reusing blobs"""
+
+    def setUp(self):
+        self.container = Mock()
+        self.blob = self.container.get_blob_client.return_value
+
+    def test_existing_blob_is_reused_and_touched(self, mock_get):
+        """Test that stored bytes are not uploaded again but their grace period restarts"""
+        mock_get.return_value = image_response()
+
+        blob_name, uploaded = store_image(self.container, 'https://example.com/a.png')
+
+        self.assertFalse(uploaded)
+        self.container.get_blob_client.assert_called_once_with(blob_name)
+        self.blob.set_blob_metadata.assert_called_once()
+        self.blob.upload_blob.assert_not_called()
+
+    def test_missing_blob_is_uploaded(self, mock_get):
+        """Test that new bytes are uploaded from the spooled file"""
+        mock_get.return_value = image_response()
+        self.blob.set_blob_metadata.side_effect = ResourceNotFoundError('missing')
+        self.blob.upload_blob.side_effect = lambda body, **kwargs: self.assertEqual(body.read(),
+                                                                                   IMAGE_BYTES)
+
+        _, uploaded = store_image(self.container, 'https://example.com/a.png')
+
+        self.assertTrue(uploaded)
+        self.assertFalse(self.blob.upload_blob.call_args.kwargs['overwrite'])
+
+    def test_concurrent_upload_is_not_an_error(self, mock_get):
+        """Test that losing an upload race to another worker is fine"""
+        mock_get.return_value = image_response()
+        self.blob.set_blob_metadata.side_effect = ResourceNotFoundError('missing')
+        self.blob.upload_blob.side_effect = ResourceExistsError('exists')
+
+        _, uploaded = store_image(self.container, 'https://example.com/a.png')
+
+        self.assertFalse(uploaded)
+
+
+class DeleteUnusedImageTestCase(unittest.TestCase):
+    """Test cases for grace-period deletes"""
+
+    def test_delete_is_conditional_on_age(self):
+        """Test that the delete only applies if the blob is older than the grace period"""
+        container = Mock()
+        now = datetime(2025, 8, 30, 12, 0, tzinfo=timezone.utc)
+
+        self.assertTrue(delete_unused_image(container, 'abc.jpg', now))
+        container.delete_blob.assert_called_once_with('abc.jpg',
+                                                      if_unmodified_since=now - GC_GRACE_PERIOD)
+
+    def test_recently_used_blob_is_kept(self):
+        """Test that a blob reused within the grace period survives"""
+        container = Mock()
+        container.delete_blob.side_effect = ResourceModifiedError('modified')
+
+        self.assertFalse(delete_unused_image(container, 'abc.jpg'))
+
+    def test_missing_blob_is_not_an_error(self):
+        container = Mock()
+        container.delete_blob.side_effect = ResourceNotFoundError('missing')
+
+        self.assertFalse(delete_unused_image(container, 'abc.jpg'))
+
+
+if __name__ == '__main__':
+    unittest.main()
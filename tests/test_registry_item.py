@@ -0,0 +1,67 @@
+"""
+Test cases for the typed registry item
+"""
+
+import dataclasses
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import the item module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cosmos_indexing import REGISTRY_LIST_FIELDS
+from registry_item import RegistryItem, as_registry_item
+
+
+class RegistryItemTestCase(unittest.TestCase):
+    """Test cases for validation, normalisation and conversions"""
+
+    def test_document_is_normalised_once(self):
+        """Test that loose Cosmos types become typed fields and extras are dropped"""
+        item = RegistryItem.from_document({
+            'id': 'item-1', 'title': None, 'price': '45.99', 'bought': 'false',
+            'image_url': 'https://example.com/vase.jpg', 'bought_by': 'Jane',
+            '_rid': 'x', '_self': 'y', '_etag': '"1"', '_attachments': 'z', '_ts': 1,
+        })
+
+        self.assertEqual(item, RegistryItem('item-1', '', '', 45.99, False,
+                                            'https://example.com/vase.jpg', ''))
+        self.assertEqual(set(item.to_document()), set(REGISTRY_LIST_FIELDS))
+
+    def test_bad_prices_become_zero(self):
+        """Test that missing, malformed, negative and non-finite prices read as 0"""
+        for price in (None, '', 'call us', -5, float('nan'), float('inf'), [1]):
+            self.assertEqual(RegistryItem.from_document({'id': 'a', 'price': price}).price, 0.0)
+
+    def test_missing_id_is_rejected(self):
+        """Test that a document without an id can't be ingested"""
+        with self.assertRaises(ValueError):
+            RegistryItem.from_document({'title': 'Vase'})
+
+    def test_row_and_document_round_trips(self):
+        """Test that the snapshot row and listing document convert back unchanged"""
+        item = RegistryItem('a', 'Vase', 'https://x', 45.99, True, 'https://img', 'abc.jpg')
+
+        self.assertEqual(RegistryItem.from_row(item.to_row()), item)
+        self.assertEqual(RegistryItem.from_document(item.to_document()), item)
+        self.assertIs(as_registry_item(item), item)
+
+    def test_display_fields(self):
+        """Test that the cached image is preferred and a missing title has a fallback"""
+        self.assertEqual(RegistryItem('a', cached_image='abc.jpg', image_url='https://img')
+                         .display_image_url, '/registry/image/abc.jpg')
+        self.assertEqual(RegistryItem('a', image_url='https://img').display_image_url, 'https://img')
+        self.assertEqual(RegistryItem('a').display_title, 'Product')
+
+    def test_items_are_compact_and_immutable(self):
+        """Test that items have no per-instance dict and can't be changed in place"""
+        item = RegistryItem('a')
+
+        self.assertFalse(hasattr(item, '__dict__'))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            item.price = 1.0
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
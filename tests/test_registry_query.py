@@ -0,0 +1,123 @@
+"""
+Test cases for server-side registry sorting, filtering and pagination
+"""
+
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the parent directory to the path so we can import the query module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_query import RegistryFilters, RegistryQuery, encode_cursor
+from registry_sync import RegistryReadModel
+
+
+def make_items(count):
+    return [{
+        'id': f'item-{n:03d}',
+        'title': f'Gift {chr(ord("A") + n % 26)}{n}',
+        'price': float(n % 7 * 10),
+        'bought': n % 3 == 0,
+    } for n in range(count)]
+
+
+class RegistryQueryTestCase(unittest.TestCase):
+    """Test cases for keyset pagination over the read model"""
+
+    def setUp(self):
+        self.model = RegistryReadModel()
+        self.model.load(make_items(50))
+        self.query = RegistryQuery(self.model)
+
+    def collect(self, sort, filters=None, limit=7):
+        """Walk every page and return the ids in order"""
+        ids = []
+        cursor = None
+        while True:
+            page = self.query.page(sort, filters, cursor, limit)
+            ids.extend(item.id for item in page.items)
+            self.assertLessEqual(len(page.items), limit)
+            if not page.next_cursor:
+                return ids
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_item_once_in_order(self):
+        """Test that paging visits each item exactly once in sort order"""
+        items = make_items(50)
+        expected = {
+            'price-low': sorted(items, key=lambda i: (i['price'], i['id'])),
+            'price-high': sorted(items, key=lambda i: (-i['price'], i['id'])),
+            'name': sorted(items, key=lambda i: (i['title'].casefold(), i['id'])),
+        }
+        for sort, ordered in expected.items():
+            self.assertEqual(self.collect(sort), [item['id'] for item in ordered], sort)
+
+    def test_filters(self):
+        """Test availability, price range and title filters"""
+        filters = RegistryFilters(available_only=True, min_price=20, max_price=40, title='GIFT')
+
+        ids = self.collect('price-low', filters, limit=2)
+
+        matching = [item for item in make_items(50)
+                    if not item['bought'] and 20 <= item['price'] <= 40
+                    and 'gift' in item['title'].casefold()]
+        self.assertEqual(sorted(ids), sorted(item['id'] for item in matching))
+        self.assertTrue(ids)
+
+    def test_price_bounds_hold_in_both_price_orders(self):
+        """Test that price-bounded pages start and stop at the right items either way"""
+        filters = RegistryFilters(min_price=20, max_price=40)
+        expected = [item for item in make_items(50) if 20 <= item['price'] <= 40]
+
+        low = self.collect('price-low', filters, limit=4)
+        high = self.collect('price-high', filters, limit=4)
+
+        self.assertEqual(low, [item['id'] for item in
+                               sorted(expected, key=lambda i: (i['price'], i['id']))])
+        self.assertEqual(high, [item['id'] for item in
+                                sorted(expected, key=lambda i: (-i['price'], i['id']))])
+
+    def test_last_full_page_has_no_cursor(self):
+        """Test that a page ending exactly at the last item reports no next page"""
+        page = self.query.page('price-low', limit=50)
+
+        self.assertEqual(len(page.items), 50)
+        self.assertIsNone(page.next_cursor)
+
+    def test_cursor_stays_valid_across_changes(self):
+        """Test that items added before the cursor don't shift the next page"""
+        first = self.query.page('price-low', limit=10)
+        self.model.upsert({'id': 'aaa-new', 'title': 'Cheap', 'price': 0.0, 'bought': False})
+
+        second = self.query.page('price-low', cursor=first.next_cursor, limit=10)
+
+        seen = {item.id for item in first.items}
+        self.assertFalse(seen & {item.id for item in second.items})
+        self.assertNotIn('aaa-new', [item.id for item in second.items])
+
+    def test_invalid_requests(self):
+        """Test that unknown sorts and bad or mismatched cursors are rejected"""
+        cursor = self.query.page('name', limit=5).next_cursor
+        bad_cursors = ['not-a-cursor', cursor, encode_cursor('price-low', ['x', 1])]
+        for bad in bad_cursors:
+            with self.assertRaises(ValueError):
+                self.query.page('price-low', cursor=bad)
+        with self.assertRaises(ValueError):
+            self.query.page('random')
+
+    def test_sorted_view_is_cached_per_version(self):
+        """Test that the sort runs once per registry version, not once per page"""
+        with patch.object(self.model, 'snapshot', wraps=self.model.snapshot) as snapshot:
+            self.query.page('price-low')
+            self.query.page('price-low')
+            self.assertEqual(snapshot.call_count, 1)
+
+            self.model.remove('item-001')
+            self.query.page('price-low')
+            self.assertEqual(snapshot.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
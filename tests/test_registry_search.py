@@ -0,0 +1,113 @@
+"""
+Test cases for the registry search index
+"""
+
+import time
+import unittest
+import os
+import sys
+
+# Add the parent directory to the path so we can import the search index
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_search import RegistrySearchIndex, parse_query, tokenize
+from registry_sync import RegistryReadModel
+
+
+ITEMS = [
+    {'id': 'sharpener', 'title': 'Chef Knife Sharpener', 'price': 39.99, 'bought': False},
+    {'id': 'block', 'title': 'Knife Block Set', 'price': 129.0, 'bought': False},
+    {'id': 'towels', 'title': 'Bath Towels (Set of 6)', 'price': 45.0, 'bought': True},
+    {'id': 'kettle', 'title': 'Electric Kettle', 'price': 60.0, 'bought': False},
+    {'id': 'board', 'title': 'Walnut Cutting Board', 'price': 25.0, 'bought': False},
+]
+
+
+class ParseQueryTestCase(unittest.TestCase):
+    """Test cases for turning free text into terms and filters"""
+
+    def test_terms_drop_stopwords(self):
+        """Test that filler words are not treated as search terms"""
+        self.assertEqual(parse_query('the knife sharpener').terms, ['knife', 'sharpener'])
+
+    def test_price_and_availability_phrases(self):
+        """Test that price and availability phrases become filters"""
+        query = parse_query("anything under $50 that's unbought")
+        self.assertEqual((query.terms, query.max_price, query.available_only), ([], 50.0, True))
+
+        query = parse_query('towels $20 - $40')
+        self.assertEqual((query.terms, query.min_price, query.max_price), (['towels'], 20.0, 40.0))
+
+        query = parse_query('over 100 available')
+        self.assertEqual((query.min_price, query.available_only), (100.0, True))
+
+    def test_tokenize(self):
+        """Test that titles are split into lowercase words"""
+        self.assertEqual(tokenize('Bath Towels (Set of 6)'), ['bath', 'towels', 'set', 'of', '6'])
+
+
+class RegistrySearchIndexTestCase(unittest.TestCase):
+    """Test cases for index lookups and incremental maintenance"""
+
+    def setUp(self):
+        self.model = RegistryReadModel()
+        self.model.load([dict(item) for item in ITEMS])
+        self.index = RegistrySearchIndex(bucket_size=25)
+        self.index.sync(self.model)
+
+    def test_prefix_and_multi_term(self):
+        """Test that words are prefix-matched and every word must match"""
+        self.assertEqual(self.index.match_ids('knif'), {'sharpener', 'block'})
+        self.assertEqual(self.index.match_ids('kni sharp'), {'sharpener'})
+        self.assertEqual(self.index.match_ids('knife towels'), set())
+
+    def test_price_and_availability_filters(self):
+        """Test filters alone and combined with words"""
+        self.assertEqual(self.index.match_ids("anything under $50 that's unbought"),
+                         {'sharpener', 'board'})
+        self.assertEqual(self.index.match_ids('set over 100'), {'block'})
+        self.assertEqual(self.index.match_ids('$40-$60'), {'towels', 'kettle'})
+
+    def test_huge_price_bounds_are_cheap(self):
+        """Test that a price-only query doesn't walk every bucket number up to its bound"""
+        start = time.perf_counter()
+        self.assertEqual(self.index.match_ids('under $10000000000000000'), set(self.index._docs))
+        self.assertEqual(self.index.match_ids('over $10000000000000000'), set())
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_non_finite_prices_are_ignored(self):
+        """Test that a price too long for a float is not used as a filter"""
+        query = parse_query('under $' + '9' * 400)
+
+        self.assertIsNone(query.max_price)
+        self.assertEqual(self.index.match_ids('under $' + '9' * 400), set(self.index._docs))
+
+    def test_ranking(self):
+        """Test that exact word matches outrank prefix matches, then cheaper first"""
+        self.index.add({'id': 'knives', 'title': 'Knives', 'price': 10.0, 'bought': False})
+
+        self.assertEqual(self.index.search('knife'), ['sharpener', 'block'])
+        self.assertEqual(self.index.search('kni'), ['knives', 'sharpener', 'block'])
+        self.assertEqual(self.index.search('kni', limit=1), ['knives'])
+
+    def test_sync_applies_only_changes(self):
+        """Test that purchases, edits and deletes are re-indexed incrementally"""
+        self.model.upsert(dict(ITEMS[0], bought=True))
+        self.model.upsert(dict(ITEMS[3], title='Gooseneck Kettle'))
+        self.model.remove('board')
+
+        self.assertEqual(self.index.sync(self.model), 3)
+        self.assertEqual(self.index.sync(self.model), 0)
+        self.assertEqual(self.index.match_ids('unbought'), {'block', 'kettle'})
+        self.assertEqual(self.index.match_ids('goose'), {'kettle'})
+        self.assertEqual(self.index.match_ids('walnut'), set())
+        self.assertNotIn('walnut', self.index._vocabulary)
+
+    def test_empty_query_matches_everything(self):
+        """Test that a query with no terms or filters returns every item"""
+        self.assertEqual(len(self.index.match_ids('')), len(ITEMS))
+        self.assertEqual(RegistrySearchIndex().match_ids('knife'), set())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,75 @@
+"""
+Test cases for the registry snapshot file
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# Add the parent directory to the path so we can import the snapshot module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_item import RegistryItem
+from registry_snapshot import RegistrySnapshot
+
+
+class RegistrySnapshotTestCase(unittest.TestCase):
+    """Test cases for saving and restoring the snapshot file"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.snapshot = RegistrySnapshot(os.path.join(self.directory, 'state', 'snapshot.bin'))
+
+    def test_round_trip_keeps_items_and_age(self):
+        """Test that saved items come back with the age they were read at"""
+        items = [RegistryItem('a', 'Vase', price=45.99),
+                 RegistryItem('b', 'Coffee Maker', bought=True, cached_image='abc.jpg')]
+        self.snapshot.save(items, saved_at=time.time() - 120)
+
+        restored, age = self.snapshot.load()
+
+        self.assertEqual(restored, items)
+        self.assertGreaterEqual(age, 120)
+        self.assertEqual(os.listdir(os.path.dirname(self.snapshot.path)), ['snapshot.bin'])
+
+    def test_each_save_is_a_new_version(self):
+        """Test that each save bumps the version and replaces the file"""
+        reader = RegistrySnapshot(self.snapshot.path)
+        self.assertEqual(self.snapshot.save([{'id': 'a', 'price': 1}]), 1)
+        first = reader.current()
+
+        self.assertEqual(self.snapshot.save([{'id': 'a', 'price': 2}, {'id': 'b'}]), 2)
+        second = reader.current()
+
+        self.assertEqual((second.version, len(second)), (2, 2))
+        self.assertEqual(second.item(0), RegistryItem('a', price=2.0))
+        self.assertEqual(first.items(), [RegistryItem('a', price=1.0)])
+
+    def test_too_old_snapshot_is_ignored(self):
+        """Test that max_age rejects a snapshot past the stale limit"""
+        self.snapshot.save([{'id': 'a'}], saved_at=time.time() - 7200)
+
+        self.assertIsNone(self.snapshot.load(max_age=3600))
+        self.assertIsNotNone(self.snapshot.load(max_age=86400))
+
+    def test_missing_or_corrupt_snapshot_loads_nothing(self):
+        """Test that a cold start without a usable file simply has no snapshot"""
+        self.assertIsNone(self.snapshot.load())
+
+        os.makedirs(os.path.dirname(self.snapshot.path))
+        with open(self.snapshot.path, 'w') as handle:
+            handle.write('{"items": [')
+        self.assertIsNone(self.snapshot.load())
+
+        with open(self.snapshot.path, 'w') as handle:
+            json.dump({'items': []}, handle)
+        self.assertIsNone(self.snapshot.load())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
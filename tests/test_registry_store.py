@@ -0,0 +1,306 @@
+"""
+Conformance tests for the registry storage engines
+
+The same cases run against every engine: SQLite always, Cosmos DB against
+an in-memory stand-in for the container, and against a real account or
+the emulator when REGISTRY_STORE_TEST_COSMOS=1 and COSMOS_ENDPOINT /
+COSMOS_KEY are set.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to the path so we can import the storage module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cosmos_indexing import (REGISTRY_ADMIN_QUERY, REGISTRY_DEFAULT_TTL, REGISTRY_INDEXING_POLICY,
+                             REGISTRY_LIST_FIELDS, REGISTRY_LIST_QUERY)
+from cosmos_layout import RegistryLayout
+from registry_store import (COUNT_CACHED_IMAGE_QUERY, LIVE_PREDICATE, UNBOUGHT_PREDICATE,
+                            CosmosRegistryStore, ItemNotFound, PreconditionFailed, SqliteRegistryStore,
+                            TOMBSTONE_TTL_SECONDS)
+
+
+class FakeCosmosError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Cosmos error {status_code}")
+        self.status_code = status_code
+
+
+class InMemoryContainer:
+    """Answers the queries and writes CosmosRegistryStore makes, the way Cosmos does"""
+
+    def __init__(self):
+        self._items = {}
+        self._lsn = 0
+        self._lock = threading.Lock()
+
+    def _store(self, body):
+        self._lsn += 1
+        doc = dict(body, _etag=uuid.uuid4().hex, _lsn=self._lsn)
+        self._items[doc['id']] = doc
+        return dict(doc)
+
+    def _get(self, item):
+        if item not in self._items:
+            raise FakeCosmosError(404)
+        return dict(self._items[item])
+
+    def query_items(self, query, parameters=None, **options):
+        with self._lock:
+            items = [dict(item) for item in self._items.values() if 'deleted' not in item]
+        if query == REGISTRY_LIST_QUERY:
+            return [{field: item[field] for field in REGISTRY_LIST_FIELDS if field in item}
+                    for item in sorted(items, key=lambda item: item['price'])]
+        if query == REGISTRY_ADMIN_QUERY:
+            return sorted(items, key=lambda item: (bool(item.get('bought')), item['price']))
+        if query == COUNT_CACHED_IMAGE_QUERY:
+            blob_name = parameters[0]['value']
+            return [sum(1 for item in items if item.get('cached_image') == blob_name)]
+        raise AssertionError(f"Unexpected query: {query}")
+
+    def read_item(self, item, partition_key):
+        with self._lock:
+            return self._get(item)
+
+    def create_item(self, body):
+        with self._lock:
+            if body['id'] in self._items:
+                raise FakeCosmosError(409)
+            return self._store(body)
+
+    def replace_item(self, item, body, etag=None, match_condition=None):
+        with self._lock:
+            if etag is not None and self._get(item)['_etag'] != etag:
+                raise FakeCosmosError(412)
+            return self._store(body)
+
+    def patch_item(self, item, partition_key, patch_operations, filter_predicate=None,
+                   etag=None, match_condition=None):
+        with self._lock:
+            doc = self._get(item)
+            if filter_predicate in (LIVE_PREDICATE, UNBOUGHT_PREDICATE) and 'deleted' in doc:
+                raise FakeCosmosError(412)
+            if filter_predicate == UNBOUGHT_PREDICATE and doc.get('bought'):
+                raise FakeCosmosError(412)
+            if etag is not None and doc['_etag'] != etag:
+                raise FakeCosmosError(412)
+            for operation in patch_operations:
+                doc[operation['path'].lstrip('/')] = operation['value']
+            return self._store(doc)
+
+    def delete_item(self, item, partition_key):
+        with self._lock:
+            self._get(item)
+            del self._items[item]
+
+    def query_items_change_feed(self, response_hook, continuation=None, start_time=None, **options):
+        since = self._lsn if start_time == 'Now' else int(continuation or 0)
+        with self._lock:
+            items = sorted((dict(item) for item in self._items.values() if item['_lsn'] > since),
+                           key=lambda item: item['_lsn'])
+        response_hook({'etag': str(self._lsn)}, None)
+        return items
+
+
+def make_item(item_id, price, bought=False, cached_image=''):
+    return {'id': item_id, 'title': f'Gift {item_id}', 'url': f'https://example.com/{item_id}',
+            'image_url': '', 'price': price, 'bought': bought, 'bought_by': '',
+            'cached_image': cached_image}
+
+
+class RegistryStoreConformance:
+    """Behaviour every registry store must have"""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+        for item in (make_item('b', 20.0), make_item('a', 5.0, cached_image='shared.jpg'),
+                     make_item('c', 10.0, bought=True, cached_image='shared.jpg')):
+            self.store.create(item)
+
+    def test_list_items_projected_and_sorted(self):
+        """Test that listing returns only listing fields, cheapest first"""
+        items = self.store.list_items()
+
+        self.assertEqual([item['id'] for item in items], ['a', 'c', 'b'])
+        self.assertNotIn('bought_by', items[0])
+        self.assertEqual(items[0]['title'], 'Gift a')
+
+    def test_list_all_puts_unbought_first(self):
+        """Test the admin ordering: unbought by price, then bought"""
+        self.assertEqual([item['id'] for item in self.store.list_all()], ['a', 'b', 'c'])
+
+    def test_get_and_missing_items(self):
+        """Test point reads and ItemNotFound for every single-item operation"""
+        item = self.store.get('a')
+        self.assertEqual((item['id'], item['price']), ('a', 5.0))
+        self.assertTrue(item['_etag'])
+
+        for operation in (lambda: self.store.get('zzz'),
+                          lambda: self.store.patch('zzz', {'title': 'x'}),
+                          lambda: self.store.replace(make_item('zzz', 1.0)),
+                          lambda: self.store.delete('zzz')):
+            with self.assertRaises(ItemNotFound):
+                operation()
+
+    def test_patch_sets_fields_and_changes_etag(self):
+        """Test that a patch updates only the given fields"""
+        before = self.store.get('b')
+
+        after = self.store.patch('b', {'title': 'Kettle', 'price': 25.0})
+
+        self.assertEqual((after['title'], after['price'], after['url']),
+                         ('Kettle', 25.0, before['url']))
+        self.assertNotEqual(after['_etag'], before['_etag'])
+        self.assertEqual(self.store.get('b')['title'], 'Kettle')
+
+    def test_patch_preconditions(self):
+        """Test the only-if-unbought and etag preconditions"""
+        with self.assertRaises(PreconditionFailed):
+            self.store.patch('c', {'bought_by': 'Someone'}, only_if_unbought=True)
+
+        stale = self.store.get('b')['_etag']
+        self.store.patch('b', {'title': 'Changed'})
+        with self.assertRaises(PreconditionFailed):
+            self.store.patch('b', {'title': 'Lost update'}, etag=stale)
+
+        current = self.store.get('b')['_etag']
+        self.assertEqual(self.store.patch('b', {'title': 'Kept'}, etag=current)['title'], 'Kept')
+
+    def test_only_one_concurrent_purchase_wins(self):
+        """Test that parallel only-if-unbought patches let exactly one through"""
+        def buy(name):
+            try:
+                self.store.patch('a', {'bought': True, 'bought_by': name}, only_if_unbought=True)
+                return name
+            except PreconditionFailed:
+                return None
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            winners = [name for name in executor.map(buy, [f'guest-{n}' for n in range(16)]) if name]
+
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(self.store.get('a')['bought_by'], winners[0])
+
+    def test_replace_and_delete(self):
+        """Test whole-document replace and delete"""
+        item = self.store.get('a')
+        item['cached_image'] = 'new.jpg'
+        self.store.replace(item)
+        self.assertEqual(self.store.get('a')['cached_image'], 'new.jpg')
+
+        self.store.delete('a')
+        with self.assertRaises(ItemNotFound):
+            self.store.get('a')
+        self.assertEqual([item['id'] for item in self.store.list_items()], ['c', 'b'])
+
+    def test_count_cached_image(self):
+        """Test counting references to a cached image"""
+        self.assertEqual(self.store.count_cached_image('shared.jpg'), 2)
+        self.store.patch('a', {'cached_image': ''})
+        self.assertEqual(self.store.count_cached_image('shared.jpg'), 1)
+        self.assertEqual(self.store.count_cached_image('other.jpg'), 0)
+
+    def test_change_stream(self):
+        """Test that the change stream starts with everything and then only reports changes"""
+        changes, cursor = self.store.changes()
+        self.assertEqual(sorted(change.item_id for change in changes), ['a', 'b', 'c'])
+
+        self.store.patch('b', {'bought': True})
+        self.store.create(make_item('d', 1.0))
+        changes, cursor = self.store.changes(cursor)
+        self.assertEqual(sorted(change.item_id for change in changes), ['b', 'd'])
+        self.assertTrue(next(change for change in changes if change.item_id == 'b').item['bought'])
+
+        self.assertEqual(self.store.changes(cursor)[0], [])
+
+        self.store.delete('d')
+        changes, cursor = self.store.changes(cursor)
+        self.assertEqual([(change.item_id, change.item, change.deleted) for change in changes],
+                         [('d', None, True)])
+        self.assertNotIn('d', [change.item_id for change in self.store.changes()[0]])
+
+    def test_start_cursor_skips_history(self):
+        """Test that a cursor taken now only sees later changes"""
+        cursor = self.store.start_cursor()
+        self.assertEqual(self.store.changes(cursor)[0], [])
+
+        self.store.patch('a', {'title': 'Later'})
+        changes, _cursor = self.store.changes(cursor)
+        self.assertEqual([(change.item_id, change.item['title']) for change in changes], [('a', 'Later')])
+
+
+class SqliteRegistryStoreTestCase(RegistryStoreConformance, unittest.TestCase):
+    """Conformance tests for the SQLite engine"""
+
+    def make_store(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        return SqliteRegistryStore(os.path.join(directory, 'registry.db'))
+
+    def test_queries_use_indexes(self):
+        """Test that listing and image lookups don't scan the table"""
+        conn = self.store._connection()
+        for query, params in (("SELECT doc FROM registry_items WHERE deleted = 0 ORDER BY price, id", ()),
+                              ("SELECT COUNT(*) FROM registry_items WHERE cached_image = ? "
+                               "AND deleted = 0", ('x',))):
+            plan = ' '.join(row['detail'] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+            self.assertIn('INDEX', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class CosmosRegistryStoreTestCase(RegistryStoreConformance, unittest.TestCase):
+    """Conformance tests for the Cosmos engine against an in-memory container"""
+
+    def make_store(self):
+        return CosmosRegistryStore(InMemoryContainer(), RegistryLayout('/id'))
+
+    def test_delete_leaves_an_expiring_tombstone(self):
+        """Test that a delete marks the item with a ttl instead of removing it"""
+        self.store.delete('a')
+
+        tombstone = self.store.container.read_item('a', 'a')
+        self.assertTrue(tombstone['deleted'])
+        self.assertEqual(tombstone['ttl'], TOMBSTONE_TTL_SECONDS)
+        self.assertEqual(self.store.count_cached_image('shared.jpg'), 1)
+        for operation in (lambda: self.store.get('a'),
+                          lambda: self.store.delete('a'),
+                          lambda: self.store.patch('a', {'title': 'x'}),
+                          lambda: self.store.replace(make_item('a', 1.0))):
+            with self.assertRaises(ItemNotFound):
+                operation()
+        with self.assertRaises(PreconditionFailed):
+            self.store.patch('a', {'bought': True}, only_if_unbought=True)
+
+
+@unittest.skipUnless(os.environ.get('REGISTRY_STORE_TEST_COSMOS') == '1'
+                     and os.environ.get('COSMOS_ENDPOINT') and os.environ.get('COSMOS_KEY'),
+                     'set REGISTRY_STORE_TEST_COSMOS=1 with COSMOS_ENDPOINT/COSMOS_KEY')
+class LiveCosmosRegistryStoreTestCase(RegistryStoreConformance, unittest.TestCase):
+    """Conformance tests for the Cosmos engine against a scratch container"""
+
+    def make_store(self):
+        from azure.cosmos import CosmosClient, PartitionKey
+
+        client = CosmosClient(os.environ['COSMOS_ENDPOINT'], os.environ['COSMOS_KEY'])
+        database = client.create_database_if_not_exists(id=os.environ.get('COSMOS_DATABASE', 'wedding'))
+        container_id = f'registry-conformance-{uuid.uuid4().hex[:8]}'
+        container = database.create_container(id=container_id,
+                                              partition_key=PartitionKey(path='/registry_id'),
+                                              indexing_policy=REGISTRY_INDEXING_POLICY,
+                                              default_ttl=REGISTRY_DEFAULT_TTL)
+        self.addCleanup(database.delete_container, container_id)
+        return CosmosRegistryStore(container, RegistryLayout('/registry_id'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
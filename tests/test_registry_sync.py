@@ -0,0 +1,130 @@
+"""
+Test cases for the versioned registry read model
+"""
+
+import unittest
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import the read model
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_item import RegistryItem
+from registry_sync import RegistryReadModel
+
+
+def make_item(item_id, price=10.0, bought=False):
+    return {'id': item_id, 'title': f'Item {item_id}', 'price': price, 'bought': bought}
+
+
+class RegistryReadModelTestCase(unittest.TestCase):
+    """Test cases for versioning, delta queries and cursor validation"""
+
+    def setUp(self):
+        self.model = RegistryReadModel(history=5)
+        self.model.load([make_item('a'), make_item('b'), make_item('c')])
+
+    def test_no_cursor_returns_full_snapshot(self):
+        """Test that a client without a cursor receives every item"""
+        full, items, removed, cursor = self.model.changes_since(None)
+
+        self.assertTrue(full)
+        self.assertEqual(sorted(item.id for item in items), ['a', 'b', 'c'])
+        self.assertEqual(removed, [])
+        self.assertEqual(cursor, self.model.cursor())
+
+    def test_delta_contains_only_changes(self):
+        """Test that a client receives changed and removed items since its cursor"""
+        cursor = self.model.cursor()
+        self.model.upsert(make_item('a', bought=True))
+        self.model.remove('b')
+
+        full, items, removed, new_cursor = self.model.changes_since(cursor)
+
+        self.assertFalse(full)
+        self.assertEqual(items, [RegistryItem.from_document(make_item('a', bought=True))])
+        self.assertEqual(removed, ['b'])
+        self.assertNotEqual(new_cursor, cursor)
+
+    def test_unchanged_cursor_has_no_changes(self):
+        """Test that an up-to-date client gets an empty delta"""
+        full, items, removed, _ = self.model.changes_since(self.model.cursor())
+
+        self.assertFalse(full)
+        self.assertEqual((items, removed), ([], []))
+
+    def test_reload_records_only_differences(self):
+        """Test that re-reading the registry only bumps the version for real changes"""
+        cursor = self.model.cursor()
+
+        changed = self.model.load([make_item('a'), make_item('b', price=20.0), make_item('d')])
+
+        self.assertEqual(changed, 3)
+        _, items, removed, _ = self.model.changes_since(cursor)
+        self.assertEqual(sorted(item.id for item in items), ['b', 'd'])
+        self.assertEqual(removed, ['c'])
+
+    def test_identical_writes_do_not_bump_version(self):
+        """Test that re-applying an unchanged item is not reported as a change"""
+        cursor = self.model.cursor()
+
+        self.model.upsert(make_item('a'))
+        self.model.remove('missing')
+
+        self.assertEqual(self.model.cursor(), cursor)
+
+    def test_cursor_older_than_history_gets_full_snapshot(self):
+        """Test that a client too far behind the change log resyncs fully"""
+        cursor = self.model.cursor()
+        for n in range(6):
+            self.model.upsert(make_item('a', price=float(n)))
+
+        full, items, _, _ = self.model.changes_since(cursor)
+
+        self.assertTrue(full)
+        self.assertEqual(len(items), 3)
+
+    def test_cursor_from_other_epoch_gets_full_snapshot(self):
+        """Test that cursors issued before a restart, or garbage, trigger a full sync"""
+        for cursor in ('deadbeef:3', f'{self.model.epoch}:x', f'{self.model.epoch}:999', 'junk'):
+            full, _, _, _ = self.model.changes_since(cursor)
+            self.assertTrue(full, cursor)
+
+    def test_staleness(self):
+        """Test that the model reports when it needs re-reading"""
+        self.assertFalse(self.model.is_stale(60))
+        self.assertTrue(self.model.is_stale(0))
+        self.assertTrue(RegistryReadModel().is_stale(60))
+
+    def test_load_keeps_age_of_restored_items(self):
+        """Test that items restored from an old snapshot keep their age"""
+        model = RegistryReadModel()
+        self.assertIsNone(model.age())
+
+        model.load([make_item('a')], read_at=time.time() - 600)
+
+        self.assertGreaterEqual(model.age(), 600)
+        self.assertTrue(model.is_stale(300))
+        self.assertFalse(model.is_stale(900))
+
+    def test_load_keeps_changes_newer_than_the_list(self):
+        """Test that an older full list doesn't undo changes applied after it was read"""
+        read_at = time.time() - 5
+        self.model.upsert(make_item('a', bought=True))
+        self.model.remove('b')
+
+        self.model.load([make_item('a'), make_item('b'), make_item('c', price=99.0)],
+                        read_at=read_at)
+
+        self.assertTrue(self.model.get('a').bought)
+        self.assertIsNone(self.model.get('b'))
+        self.assertEqual(self.model.get('c').price, 99.0)
+
+        self.model.load([make_item('a'), make_item('b')])
+        self.assertFalse(self.model.get('a').bought)
+        self.assertIsNotNone(self.model.get('b'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,157 @@
+"""
+Test cases for dynamic response compression
+"""
+
+import gzip
+import json
+import os
+import sys
+import unittest
+import zlib
+
+from flask import Flask, Response, jsonify, request
+
+# Add the parent directory to the path so we can import the compression module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_compression import BROTLI_AVAILABLE, ResponseCompressor, compressible
+
+GZIP = {'Accept-Encoding': 'gzip'}
+HTML = '<div class="card">Registry gift</div>' * 100
+
+
+class ResponseCompressorTestCase(unittest.TestCase):
+    """Test cases for what is compressed and how"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.compressor = ResponseCompressor(min_bytes=512, level=6)
+
+        @self.app.after_request
+        def compress_response(response):
+            return self.compressor.compress(request, response)
+
+        @self.app.route('/html')
+        def html():
+            return HTML
+
+        @self.app.route('/small')
+        def small():
+            return 'tiny'
+
+        @self.app.route('/json')
+        def json_items():
+            response = jsonify({'items': [{'id': n, 'title': 'Gift'} for n in range(100)]})
+            response.set_etag('v1')
+            return response
+
+        @self.app.route('/image')
+        def image():
+            return Response(b'\x89PNG' + b'\x00' * 4096, mimetype='image/png')
+
+        @self.app.route('/events')
+        def events():
+            return Response(iter(['data: x\n\n'] * 100), mimetype='text/event-stream')
+
+        @self.app.route('/precompressed')
+        def precompressed():
+            return Response(gzip.compress(HTML.encode()), mimetype='text/html',
+                            headers={'Content-Encoding': 'gzip'})
+
+        @self.app.route('/no-transform')
+        def no_transform():
+            return Response(HTML, mimetype='text/html', headers={'Cache-Control': 'no-transform'})
+
+        @self.app.route('/stream')
+        def stream():
+            return Response((f'<p>row {n}</p>\n' for n in range(500)), mimetype='text/html')
+
+        self.client = self.app.test_client()
+
+    def test_html_is_gzipped(self):
+        """Test that large HTML is gzipped for gzip clients"""
+        response = self.client.get('/html', headers=GZIP)
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data).decode(), HTML)
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_identity_without_accept_encoding(self):
+        """Test that clients that don't ask for compression get plain bodies"""
+        response = self.client.get('/html')
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data.decode(), HTML)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_small_responses_are_not_compressed(self):
+        """Test that bodies under min_bytes are left alone"""
+        self.assertNotIn('Content-Encoding', self.client.get('/small', headers=GZIP).headers)
+
+    def test_json_is_compressed_with_weak_etag(self):
+        """Test that JSON is compressed and its strong ETag becomes weak"""
+        response = self.client.get('/json', headers=GZIP)
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['ETag'], 'W/"v1"')
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))['items']), 100)
+
+    def test_images_events_and_precompressed_are_skipped(self):
+        """Test that already-compressed types, SSE and encoded bodies pass through"""
+        self.assertNotIn('Content-Encoding', self.client.get('/image', headers=GZIP).headers)
+        self.assertNotIn('Content-Encoding', self.client.get('/events', headers=GZIP).headers)
+        self.assertNotIn('Content-Encoding', self.client.get('/no-transform', headers=GZIP).headers)
+
+        response = self.client.get('/precompressed', headers=GZIP)
+        self.assertEqual(gzip.decompress(response.data).decode(), HTML)
+
+    def test_head_requests_are_skipped(self):
+        """Test that HEAD responses keep the uncompressed length"""
+        response = self.client.head('/html', headers=GZIP)
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(int(response.headers['Content-Length']), len(HTML))
+
+    def test_streamed_response_is_compressed_incrementally(self):
+        """Test that generator responses are compressed chunk by chunk"""
+        response = self.client.get('/stream', headers=GZIP, buffered=False)
+        chunks = list(response.response)
+        response.close()
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertGreater(len(chunks), 1)
+        # Every flushed chunk can be decoded as soon as it arrives
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decoder.decompress(chunks[0]), b'<p>row 0</p>\n')
+        body = b''.join(chunks)
+        self.assertEqual(gzip.decompress(body).decode(),
+                         ''.join(f'<p>row {n}</p>\n' for n in range(500)))
+
+    def test_refused_gzip(self):
+        """Test that gzip;q=0 is honoured"""
+        response = self.client.get('/html', headers={'Accept-Encoding': 'gzip;q=0'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    @unittest.skipUnless(BROTLI_AVAILABLE, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test that brotli is used when the client accepts it"""
+        import brotli
+
+        response = self.client.get('/html', headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.data).decode(), HTML)
+
+    def test_compressible_types(self):
+        """Test the compressible content type list"""
+        for mimetype in ('text/html', 'text/css', 'application/json', 'image/svg+xml'):
+            self.assertTrue(compressible(mimetype), mimetype)
+        for mimetype in ('image/jpeg', 'image/png', 'text/event-stream', 'application/zip', None):
+            self.assertFalse(compressible(mimetype), mimetype)
+
+
+if __name__ == '__main__':
+    unittest.main()
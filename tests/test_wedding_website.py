@@ -5,14 +5,27 @@ Comprehensive test suite following TDD principles
 
 import unittest
 from unittest.mock import Mock, patch, MagicMock
+import gzip
 import json
 import sys
 import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the parent directory to the path so we can import app
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import app as app_module
 from app import app, scrape_title_from_url
+from json_provider import SerializedCache
+from registry_snapshot import RegistrySnapshot
+from registry_store import LIVE_PREDICATE, UNBOUGHT_PREDICATE
+from registry_sync import RegistryReadModel
 
 
 class WeddingWebsiteTestCase(unittest.TestCase):
@@ -24,6 +37,29 @@ class WeddingWebsiteTestCase(unittest.TestCase):
         self.app.config['TESTING'] = True
         self.app.config['WTF_CSRF_ENABLED'] = False
         self.client = self.app.test_client()
+
+        # Each test starts with an empty read model and no snapshot on disk.
+        # Background refreshes run on a per-test executor that is drained
+        # before the patches are undone, so none reaches the real snapshot.
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        snapshot_path = os.path.join(snapshot_dir, 'registry_snapshot.bin')
+        self.registry_model = RegistryReadModel()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='test-registry-refresh')
+        patchers = [
+            patch('app.REGISTRY_SNAPSHOT_PATH', snapshot_path),
+            patch('app.registry_snapshot', RegistrySnapshot(snapshot_path)),
+            patch('app.registry_model', self.registry_model),
+            patch.object(app_module.registry_query, 'model', self.registry_model),
+            patch('app._registry_snapshot_version', 0),
+            patch('app._registry_snapshot_cursor', None),
+            patch('app.registry_refresh_executor', executor),
+            patch('app._registry_background_jobs', set()),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(executor.shutdown, wait=True)
         
         # Mock data for testing (Cosmos DB format)
         self.mock_registry_data = [
@@ -80,6 +116,19 @@ class HomePageTestCase(WeddingWebsiteTestCase):
         self.assertIn(b'See Our Venue', response.data)
         self.assertIn(b'View Registry', response.data)
 
+    def test_static_pages_are_precompressed(self):
+        """Test that cached pages are served gzipped, with 304 for a matching ETag"""
+        app_module.page_cache.warm(app_module.STATIC_PAGES)
+        for path in ('/', '/rsvp', '/venue', '/ourstory'):
+            plain = self.client.get(path)
+            compressed = self.client.get(path, headers={'Accept-Encoding': 'gzip'})
+            revalidated = self.client.get(path, headers={'Accept-Encoding': 'gzip',
+                                                         'If-None-Match': compressed.headers['ETag']})
+
+            self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(compressed.data), plain.data)
+            self.assertEqual(revalidated.status_code, 304)
+
 
 class RSVPPageTestCase(WeddingWebsiteTestCase):
     """Test cases for the RSVP page"""
@@ -170,6 +219,19 @@ class RegistryPageTestCase(WeddingWebsiteTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Registry items will appear here', response.data)
     
+    @patch('app.get_cosmos_container')
+    def test_registry_page_is_compressed(self, mock_get_container):
+        """Test that the registry page is gzipped for clients that accept it"""
+        mock_container = Mock()
+        mock_container.query_items.return_value = iter(self.mock_registry_data)
+        mock_get_container.return_value = mock_container
+
+        response = self.client.get('/registry', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'Beautiful Vase', gzip.decompress(response.data))
+
     @patch('app.get_cosmos_container')
     def test_registry_sorting_by_price(self, mock_get_container):
         """Test that registry items are sorted by price"""
@@ -200,18 +262,396 @@ class RegistryPageTestCase(WeddingWebsiteTestCase):
         self.assertIn(b'I Bought This', response.data)
 
 
+class RegistryPaginationTestCase(WeddingWebsiteTestCase):
+    """Test cases for server-side sorting, filtering and paging"""
+
+    def setUp(self):
+        super().setUp()
+        self.items = [{'id': f'item-{n:02d}', 'title': f'Gift {n:02d}', 'url': '',
+                       'image_url': '', 'price': float(n), 'bought': n % 2 == 0,
+                       'bought_by': ''} for n in range(30)]
+        container = Mock()
+        container.query_items.side_effect = lambda **kwargs: [dict(i) for i in self.items]
+        patchers = [
+            patch('app.get_cosmos_container', return_value=container),
+            patch('app.REGISTRY_PAGE_SIZE', 10),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_page_renders_first_page_only(self):
+        """Test that the registry page ships one page of cards and a next cursor"""
+        response = self.client.get('/registry')
+
+        content = response.data.decode('utf-8')
+        self.assertEqual(content.count('registry-item-container"'), 10)
+        self.assertIn('Gift 09', content)
+        self.assertNotIn('Gift 10', content)
+        self.assertRegex(content, r'data-next-cursor="[A-Za-z0-9_-]+"')
+
+    def test_load_more_walks_all_pages(self):
+        """Test that following next_cursor returns every remaining card once"""
+        self.client.get('/registry')
+        titles = []
+        cursor = ''
+        while True:
+            data = json.loads(self.client.get(f'/registry/items?sort=price-high&cursor={cursor}').data)
+            titles.extend(re.findall(r'data-name="(Gift \d\d)"', data['html']))
+            if not data['next_cursor']:
+                break
+            cursor = data['next_cursor']
+
+        self.assertEqual(len(set(titles)), 30)
+
+    def test_filters_apply_on_server(self):
+        """Test that availability and price filters are applied before paging"""
+        response = self.client.get('/registry/items?available=1&min_price=10&max_price=19')
+
+        data = json.loads(response.data)
+        self.assertEqual(data['count'], 5)
+        self.assertNotIn('Already Purchased', data['html'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_search_box_uses_index(self):
+        """Test that the page search box understands words and price phrases"""
+        data = json.loads(self.client.get('/registry/items?q=gift+under+$5+unbought').data)
+
+        self.assertEqual(re.findall(r'data-name="(Gift \d\d)"', data['html']),
+                         ['Gift 01', 'Gift 03', 'Gift 05'])
+
+    @patch('app.registry_search', new_callable=lambda: app_module.RegistrySearchIndex())
+    def test_search_api(self, mock_index):
+        """Test the search endpoint ranks matches and reports the parsed query"""
+        response = self.client.get('/api/registry/search?q=gift+1&limit=3')
+
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['query']['terms'], ['gift', '1'])
+        self.assertEqual([item['id'] for item in data['items']], ['item-10', 'item-11', 'item-12'])
+        self.assertEqual(self.client.get('/api/registry/search?limit=x').status_code, 400)
+
+    def test_invalid_query_is_rejected(self):
+        """Test that a malformed cursor or price gets a 400 from the items endpoint"""
+        self.assertEqual(self.client.get('/registry/items?cursor=junk').status_code, 400)
+        self.assertEqual(self.client.get('/registry/items?min_price=abc').status_code, 400)
+        self.assertEqual(self.client.get('/registry?cursor=junk').status_code, 200)
+
+
+class FakeCosmosError(Exception):
+    """Stands in for CosmosHttpResponseError, which carries an HTTP status code"""
+
+    def __init__(self, status_code):
+        super().__init__(f"Cosmos error {status_code}")
+        self.status_code = status_code
+
+
+class FakeCosmosContainer:
+    """In-memory container that enforces ETag preconditions and patch filter
+    predicates like Cosmos DB does. `predicates` maps each filter_predicate
+    string to a function deciding whether a document matches it.
+    """
+
+    def __init__(self, items, predicates=None):
+        self._items = {item['id']: dict(item, _etag=uuid.uuid4().hex) for item in items}
+        self._predicates = predicates or {
+            LIVE_PREDICATE: lambda doc: not doc.get('deleted'),
+            UNBOUGHT_PREDICATE: lambda doc: not doc.get('deleted') and not doc.get('bought'),
+        }
+        self._lock = threading.Lock()
+        self.write_count = 0
+        self.read_count = 0
+
+    def read_item(self, item, partition_key):
+        with self._lock:
+            self.read_count += 1
+            if item not in self._items:
+                raise FakeCosmosError(404)
+            return dict(self._items[item])
+
+    def replace_item(self, item, body, etag=None, match_condition=None):
+        with self._lock:
+            if etag is not None and self._items[item]['_etag'] != etag:
+                raise FakeCosmosError(412)
+            return self._write(item, dict(body))
+
+    def patch_item(self, item, partition_key, patch_operations, filter_predicate=None,
+                   etag=None, match_condition=None):
+        with self._lock:
+            if item not in self._items:
+                raise FakeCosmosError(404)
+            doc = dict(self._items[item])
+            if etag is not None and doc['_etag'] != etag:
+                raise FakeCosmosError(412)
+            if filter_predicate and not self._predicates[filter_predicate](doc):
+                raise FakeCosmosError(412)
+            for operation in patch_operations:
+                doc[operation['path'].lstrip('/')] = operation['value']
+            return self._write(item, doc)
+
+    def delete_item(self, item, partition_key):
+        with self._lock:
+            if self._items.pop(item, None) is None:
+                raise FakeCosmosError(404)
+
+    def _write(self, item_id, doc):
+        doc['_etag'] = uuid.uuid4().hex
+        self._items[item_id] = doc
+        self.write_count += 1
+        return dict(doc)
+
+
+class ChargedCosmosContainer(FakeCosmosContainer):
+    """FakeCosmosContainer that reports a request charge through response_hook
+    like Cosmos DB: 1 RU per point read, 10 RU per write, 3 RU per query page
+    """
+
+    def __init__(self, items, page_size=2):
+        super().__init__(items)
+        self.page_size = page_size
+
+    def read_item(self, item, partition_key, response_hook=None):
+        result = super().read_item(item, partition_key)
+        response_hook({'x-ms-request-charge': '1.0'}, result)
+        return result
+
+    def patch_item(self, item, partition_key, patch_operations, response_hook=None, **kwargs):
+        result = super().patch_item(item, partition_key, patch_operations, **kwargs)
+        response_hook({'x-ms-request-charge': '10.0'}, result)
+        return result
+
+    def query_items(self, query, response_hook=None, **kwargs):
+        items = [dict(item) for item in self._items.values()]
+        for start in range(0, len(items), self.page_size):
+            response_hook({'x-ms-request-charge': '3.0'}, None)
+            yield from items[start:start + self.page_size]
+
+
+class CosmosMetricsTestCase(WeddingWebsiteTestCase):
+    """Test cases for per-request and per-route Cosmos request charges"""
+
+    def setUp(self):
+        super().setUp()
+        self.metrics = app_module.CosmosMetrics()
+        self.fake = ChargedCosmosContainer(self.mock_registry_data)
+        container = app_module.InstrumentedContainer(self.fake, self.metrics, app_module.cosmos_scope)
+        patchers = [
+            patch('app.cosmos_metrics', self.metrics),
+            patch('app.get_cosmos_container', return_value=container),
+            patch('app.queue_purchase_notification'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_response_reports_its_request_charge(self):
+        """Test that the Server-Timing header totals the Cosmos calls of one request"""
+        response = self.client.get('/registry')
+
+        self.assertEqual(response.status_code, 200)
+        # Three items in pages of two: two query pages at 3 RU each
+        self.assertIn('desc="6.00 RU, 1 ops"', response.headers['Server-Timing'])
+
+        response = self.client.get('/')
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_metrics_endpoint_breaks_down_routes(self):
+        """Test that totals are kept per route and operation"""
+        self.client.get('/registry')
+        self.client.post('/purchase_item', json={
+            'item_id': 'item-1', 'name': 'Guest', 'purchase_date': '2025-01-01',
+            'item_title': 'Beautiful Vase'})
+        self.client.post('/purchase_item', json={
+            'item_id': 'item-1', 'name': 'Other Guest', 'purchase_date': '2025-01-01',
+            'item_title': 'Beautiful Vase'})
+
+        data = json.loads(self.client.get('/registry/admin/cosmos').data)
+
+        registry = data['routes']['registry']['operations']['query_items']
+        self.assertEqual((registry['calls'], registry['items'], registry['pages']), (1, 3, 2))
+        purchase = data['routes']['purchase_item']
+        self.assertEqual(purchase['operations']['patch_item']['calls'], 2)
+        self.assertEqual(purchase['operations']['patch_item']['errors'], 1)
+        self.assertEqual(purchase['operations']['read_item']['request_charge'], 1.0)
+        self.assertEqual(list(data['routes'])[0], 'purchase_item')
+
+
+class SqliteRegistryTestCase(WeddingWebsiteTestCase):
+    """Base test case running the registry on a temporary SQLite store"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.store = app_module.SqliteRegistryStore(os.path.join(directory, 'registry.db'))
+        for item in self.mock_registry_data:
+            self.store.create(dict(item))
+        patchers = [
+            patch('app.REGISTRY_BACKEND', 'sqlite'),
+            patch('app._sqlite_registry_store', self.store),
+            patch('app.queue_purchase_notification'),
+            patch('app.get_cosmos_container', side_effect=AssertionError('Cosmos used')),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class SqliteBackendTestCase(SqliteRegistryTestCase):
+    """Test cases for running the registry on the local SQLite engine"""
+
+    def test_registry_admin_and_purchase_without_cosmos(self):
+        """Test that the registry page, admin routes and purchases work on SQLite"""
+        response = self.client.get('/registry')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Beautiful Vase', response.data)
+
+        response = self.client.post('/registry/admin/add', json={
+            'title': 'Cast Iron Skillet', 'price': '55'})
+        self.assertEqual(response.status_code, 200)
+        added_id = json.loads(response.data)['item']['id']
+
+        response = self.client.post('/purchase_item', json={
+            'item_id': added_id, 'name': 'Jane Smith', 'purchase_date': '2025-01-01',
+            'item_title': 'Cast Iron Skillet'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/purchase_item', json={
+            'item_id': added_id, 'name': 'John Doe', 'purchase_date': '2025-01-01',
+            'item_title': 'Cast Iron Skillet'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.store.get(added_id)['bought_by'], 'Jane Smith')
+
+        response = self.client.post('/registry/admin/delete', json={'id': added_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(added_id, [item['id'] for item in self.store.list_all()])
+
+
+class RegistryChangeFeedTestCase(SqliteRegistryTestCase):
+    """Test cases for applying other workers' writes from the change feed"""
+
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        publisher = patch.object(app_module.registry_events, 'publish',
+                                 side_effect=lambda event_type, data: self.events.append((event_type, data)))
+        publisher.start()
+        self.addCleanup(publisher.stop)
+        self.feed = app_module.RegistryChangeFeed(app_module.get_registry_store,
+                                                  app_module.apply_registry_change,
+                                                  bootstrap=lambda: app_module.refresh_registry_model(force=True))
+        self.assertTrue(self.feed.open())
+
+    def test_other_workers_writes_reach_the_read_model(self):
+        """Test that a purchase made elsewhere updates this worker and its open pages"""
+        self.store.patch('item-1', {'bought': True, 'bought_by': 'Elsewhere'})
+        self.store.delete('item-3')
+
+        self.assertEqual(self.feed.poll_once(), 2)
+
+        self.assertTrue(app_module.registry_model.get('item-1').bought)
+        self.assertIsNone(app_module.registry_model.get('item-3'))
+        self.assertEqual([(event_type, data['id']) for event_type, data in self.events],
+                         [('bought', 'item-1'), ('removed', 'item-3')])
+        self.assertIn('Already Purchased', self.events[0][1]['html'])
+
+    def test_own_writes_are_not_applied_twice(self):
+        """Test that a write this worker made is skipped when it comes back on the feed"""
+        response = self.client.post('/purchase_item', json={
+            'item_id': 'item-1', 'name': 'Jane Smith', 'purchase_date': '2025-01-01',
+            'item_title': 'Beautiful Vase'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(app_module.registry_model.get('item-1').bought)
+        self.events.clear()
+
+        echoed, _cursor = self.store.changes(self.feed.cursor)
+        self.assertEqual([change.item_id for change in echoed], ['item-1'])
+        self.assertEqual(self.feed.poll_once(), 0)
+        self.assertEqual(self.events, [])
+
+    def make_app_feed(self, directory):
+        """A feed wired like the app's, checkpointing into `directory`"""
+        feed = app_module.RegistryChangeFeed(app_module.get_registry_store,
+                                             app_module.apply_registry_change,
+                                             bootstrap=app_module.load_registry_model,
+                                             resume=app_module.resume_registry_feed,
+                                             lease=app_module.FeedLease(directory, 'test'),
+                                             checkpoint_state=app_module.registry_feed_checkpoint_state)
+        self.addCleanup(feed.stop)
+        return feed
+
+    def restart_worker(self, feed):
+        """Switch to a freshly started worker: an empty read model and the given feed"""
+        model = RegistryReadModel()
+        for patcher in (patch('app.registry_model', model),
+                        patch.object(app_module.registry_query, 'model', model),
+                        patch('app._registry_snapshot_version', 0),
+                        patch('app._registry_snapshot_cursor', None),
+                        patch('app.registry_feed', feed)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return model
+
+    def run_first_worker(self, directory):
+        """Bootstrap a feed, apply one change after the snapshot, and stop"""
+        feed = self.make_app_feed(directory)
+        with patch('app.registry_feed', feed):
+            self.assertTrue(feed.open())
+            self.store.patch('item-1', {'title': 'Renamed Vase'})
+            self.assertEqual(feed.poll_once(), 1)
+        feed.stop()
+
+    def test_restart_resumes_from_the_restored_snapshot(self):
+        """Test that a restarted worker restores the snapshot and replays the
+        changes made since it was read, instead of re-reading storage
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.run_first_worker(directory)
+        self.store.patch('item-2', {'title': 'Changed while down'})
+
+        restarted = self.make_app_feed(directory)
+        model = self.restart_worker(restarted)
+        with patch.object(self.store, 'list_items', wraps=self.store.list_items) as list_items:
+            self.assertTrue(restarted.open())
+            restarted.poll_once()
+
+        self.assertEqual(list_items.call_count, 0)
+        self.assertEqual(model.get('item-1').title, 'Renamed Vase')
+        self.assertEqual(model.get('item-2').title, 'Changed while down')
+
+    def test_restart_with_another_snapshot_bootstraps(self):
+        """Test that the checkpoint is not trusted once the snapshot was replaced"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.run_first_worker(directory)
+        app_module.registry_snapshot.save(self.store.list_items())
+
+        restarted = self.make_app_feed(directory)
+        self.restart_worker(restarted)
+        with patch.object(self.store, 'list_items', wraps=self.store.list_items) as list_items:
+            self.assertTrue(restarted.open())
+
+        self.assertEqual(list_items.call_count, 1)
+
+    def test_healthy_feed_lets_the_page_skip_storage(self):
+        """Test that the registry page trusts the read model while the feed is healthy"""
+        with patch.object(app_module.registry_feed, 'healthy', return_value=True), \
+                patch.object(self.store, 'list_items', wraps=self.store.list_items) as list_items:
+            self.client.get('/registry')
+            self.client.get('/registry')
+        self.assertEqual(list_items.call_count, 0)
+
+
 class PurchaseItemTestCase(WeddingWebsiteTestCase):
     """Test cases for item purchase functionality"""
     
-    @patch('app.send_registry_notification_email')
+    @patch('app.queue_purchase_notification')
     @patch('app.get_cosmos_container')
-    def test_purchase_item_success(self, mock_get_container, mock_send_email):
+    def test_purchase_item_success(self, mock_get_container, mock_queue_email):
         """Test successful item purchase"""
         mock_container = Mock()
-        mock_container.read_item.return_value = dict(self.mock_registry_data[0])
-        mock_container.replace_item = Mock()
         mock_get_container.return_value = mock_container
-        mock_send_email.return_value = True
+        mock_queue_email.return_value = 'notification-1'
         
         purchase_data = {
             'name': 'Jane Smith',
@@ -231,12 +671,154 @@ class PurchaseItemTestCase(WeddingWebsiteTestCase):
         self.assertTrue(data['success'])
         self.assertIn('Thank you', data['message'])
         
-        # Verify Cosmos DB was updated
-        mock_container.read_item.assert_called_once_with(item='item-1', partition_key='item-1')
-        mock_container.replace_item.assert_called_once()
+        # Verify Cosmos DB was updated with one conditional patch and no read
+        mock_container.patch_item.assert_called_once()
+        patch_call = mock_container.patch_item.call_args.kwargs
+        self.assertEqual(patch_call['item'], 'item-1')
+        self.assertEqual(patch_call['filter_predicate'], UNBOUGHT_PREDICATE)
+        self.assertIn({'op': 'set', 'path': '/bought_by', 'value': 'Jane Smith'},
+                      patch_call['patch_operations'])
+        mock_container.read_item.assert_not_called()
+        
+        # Verify email was queued rather than sent inline
+        mock_queue_email.assert_called_once()
+        self.assertEqual(mock_queue_email.call_args.args[0]['name'], 'Jane Smith')
+    
+    def purchase_payload(self, name='Jane Smith', item_id='item-1'):
+        return json.dumps({
+            'name': name,
+            'purchase_date': '2025-08-30',
+            'item_title': 'Beautiful Vase',
+            'item_id': item_id,
+        })
+
+    @patch('app.queue_purchase_notification')
+    @patch('app.get_cosmos_container')
+    def test_purchase_item_already_bought(self, mock_get_container, mock_queue_email):
+        """Test that buying an item someone else bought returns 409"""
+        mock_get_container.return_value = FakeCosmosContainer(self.mock_registry_data)
+
+        response = self.client.post('/purchase_item',
+                                   data=self.purchase_payload(item_id='item-2'),
+                                   content_type='application/json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(json.loads(response.data)['already_purchased'])
+        mock_queue_email.assert_not_called()
+
+    @patch('app.queue_purchase_notification')
+    @patch('app.get_cosmos_container')
+    def test_purchase_item_retry_is_idempotent(self, mock_get_container, mock_queue_email):
+        """Test that a retried request with the same idempotency key succeeds without re-queueing"""
+        container = FakeCosmosContainer(self.mock_registry_data)
+        mock_get_container.return_value = container
+        headers = {'Idempotency-Key': 'key-123'}
+
+        first = self.client.post('/purchase_item', data=self.purchase_payload(),
+                                 content_type='application/json', headers=headers)
+        retry = self.client.post('/purchase_item', data=self.purchase_payload(),
+                                 content_type='application/json', headers=headers)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(container.write_count, 1)
+        mock_queue_email.assert_called_once()
+
+        other = self.client.post('/purchase_item', data=self.purchase_payload(name='John Doe'),
+                                 content_type='application/json',
+                                 headers={'Idempotency-Key': 'key-456'})
+        self.assertEqual(other.status_code, 409)
+
+    @patch('app.queue_purchase_notification')
+    @patch('app.get_cosmos_container')
+    def test_purchase_item_update_failure(self, mock_get_container, mock_queue_email):
+        """Test that a failed Cosmos update is reported instead of thanking the guest"""
+        mock_container = Mock()
+        mock_container.patch_item.side_effect = FakeCosmosError(503)
+        mock_get_container.return_value = mock_container
+
+        response = self.client.post('/purchase_item', data=self.purchase_payload(),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 500)
+        mock_queue_email.assert_not_called()
+
+    @patch('app.queue_purchase_notification')
+    @patch('app.get_cosmos_container')
+    def test_parallel_purchases_have_one_winner(self, mock_get_container, mock_queue_email):
+        """Test that hundreds of simultaneous purchases of one item record exactly one"""
+        container = FakeCosmosContainer(self.mock_registry_data)
+        mock_get_container.return_value = container
+        guests = [f'Guest {n}' for n in range(300)]
+        start = threading.Barrier(50)
+
+        def purchase(name):
+            client = self.app.test_client()
+            try:
+                start.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            response = client.post('/purchase_item', data=self.purchase_payload(name=name),
+                                   content_type='application/json',
+                                   headers={'Idempotency-Key': name})
+            return name, response.status_code
+
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            results = list(pool.map(purchase, guests))
+
+        winners = [name for name, status in results if status == 200]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(sorted(status for _, status in results if status != 200),
+                         [409] * (len(guests) - 1))
+        self.assertEqual(container.write_count, 1)
+        mock_queue_email.assert_called_once()
+        self.assertEqual(container.read_item('item-1', 'item-1')['bought_by'], winners[0])
+
+    @patch('app.outbox_sender')
+    @patch('app.email_outbox')
+    def test_queue_purchase_notification_uses_outbox(self, mock_outbox, mock_sender):
+        """Test that purchase notifications are recorded in the outbox, not sent inline"""
+        mock_outbox.enqueue.return_value = 'notification-1'
+        
+        notification_id = app_module.queue_purchase_notification({'name': 'Jane Smith'})
+        
+        self.assertEqual(notification_id, 'notification-1')
+        mock_outbox.enqueue.assert_called_once_with('registry_purchase', {'name': 'Jane Smith'})
+        mock_sender.wake.assert_called_once()
+    
+    @patch('app.outbox_sender')
+    @patch('app.email_outbox')
+    def test_admin_retry_requeues_dead_notifications(self, mock_outbox, mock_sender):
+        """Test that the admin retry route requeues dead-lettered notifications"""
+        mock_outbox.retry_dead.return_value = 2
+        
+        response = self.client.post('/registry/admin/outbox/retry')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {'success': True, 'retried': 2})
+        mock_sender.wake.assert_called_once()
+    
+    @patch('app.deliver_notification_email')
+    def test_digest_email_lists_each_purchase(self, mock_deliver):
+        """Test that a digest email covers every purchase in one message"""
+        mock_deliver.return_value = True
+        events = [
+            {'item_title': 'Beautiful Vase', 'name': 'Jane Smith', 'purchase_date': '2025-08-30',
+             'item_url': '', 'delivery_date': '2025-09-05', 'note': 'Congrats!'},
+            {'item_title': 'Coffee Maker', 'name': 'John Doe', 'purchase_date': '2025-08-30',
+             'item_url': '', 'delivery_date': '', 'note': ''},
+        ]
+        
+        self.assertTrue(app_module.send_registry_digest_email(events))
         
-        # Verify email was sent
-        mock_send_email.assert_called_once()
+        mock_deliver.assert_called_once()
+        _, rendered = mock_deliver.call_args.args
+        self.assertIn('2 Registry Items Purchased', rendered.subject)
+        for part in (rendered.text, rendered.html):
+            self.assertIn('Beautiful Vase', part)
+            self.assertIn('Coffee Maker', part)
+            self.assertIn('2025-09-05', part)
+            self.assertIn('Congrats!', part)
     
     def test_purchase_item_missing_data(self):
         """Test purchase item with missing required data"""
@@ -276,6 +858,511 @@ class PurchaseItemTestCase(WeddingWebsiteTestCase):
         self.assertIn('Unable to connect', data['error'])
 
 
+class RegistryEventsTestCase(WeddingWebsiteTestCase):
+    """Test cases for live registry updates"""
+
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        self.publish_patcher = patch.object(
+            app_module.registry_events, 'publish',
+            side_effect=lambda event_type, data: self.events.append((event_type, data)))
+        self.publish_patcher.start()
+
+    def tearDown(self):
+        self.publish_patcher.stop()
+
+    @patch('app.queue_purchase_notification')
+    @patch('app.get_cosmos_container')
+    def test_purchase_publishes_bought_card(self, mock_get_container, mock_queue_email):
+        """Test that a purchase pushes the re-rendered card to open pages"""
+        mock_get_container.return_value = FakeCosmosContainer(self.mock_registry_data)
+
+        response = self.client.post('/purchase_item',
+                                    data=json.dumps({'name': 'Jane Smith',
+                                                     'purchase_date': '2025-08-30',
+                                                     'item_title': 'Beautiful Vase',
+                                                     'item_id': 'item-1'}),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.events), 1)
+        event_type, data = self.events[0]
+        self.assertEqual(event_type, 'bought')
+        self.assertEqual(data['id'], 'item-1')
+        self.assertTrue(data['bought'])
+        self.assertIn('Already Purchased', data['html'])
+        self.assertIn('data-item-id="item-1"', data['html'])
+
+    @patch('app.queue_purchase_notification')
+    @patch('app.get_cosmos_container')
+    def test_conflict_publishes_nothing(self, mock_get_container, mock_queue_email):
+        """Test that a rejected purchase does not broadcast a change"""
+        mock_get_container.return_value = FakeCosmosContainer(self.mock_registry_data)
+
+        response = self.client.post('/purchase_item',
+                                    data=json.dumps({'name': 'Jane Smith',
+                                                     'purchase_date': '2025-08-30',
+                                                     'item_title': 'Coffee Maker',
+                                                     'item_id': 'item-2'}),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.events, [])
+
+    @patch('app.release_cached_image')
+    @patch('app.get_cosmos_container')
+    def test_delete_publishes_removed(self, mock_get_container, mock_release):
+        """Test that deleting an item tells open pages to drop its card"""
+        mock_get_container.return_value = FakeCosmosContainer(self.mock_registry_data)
+
+        self.client.post('/registry/admin/delete', data=json.dumps({'id': 'item-3'}),
+                         content_type='application/json')
+
+        self.assertEqual(len(self.events), 1)
+        event_type, data = self.events[0]
+        self.assertEqual(event_type, 'removed')
+        self.assertEqual(data['id'], 'item-3')
+        self.assertEqual(data['version'], app_module.registry_model.cursor())
+
+
+class RegistryApiTestCase(WeddingWebsiteTestCase):
+    """Test cases for the delta-sync JSON registry API"""
+
+    def setUp(self):
+        super().setUp()
+        self.container = FakeCosmosContainer(self.mock_registry_data)
+        self.container.query_items = Mock(side_effect=lambda **kwargs: [
+            dict(item) for item in self.container._items.values()])
+        patchers = [
+            patch('app.get_cosmos_container', return_value=self.container),
+            patch('app.queue_purchase_notification'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_full_snapshot(self):
+        """Test that a first request returns every item without private fields"""
+        response = self.client.get('/api/registry')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['items']), 3)
+        self.assertNotIn('bought_by', data['items'][0])
+        self.assertEqual(response.headers['ETag'], f'"{data["version"]}"')
+
+    def test_since_returns_only_changes(self):
+        """Test that a client with a cursor only receives what changed"""
+        version = json.loads(self.client.get('/api/registry').data)['version']
+        self.client.post('/purchase_item',
+                         data=json.dumps({'name': 'Jane Smith', 'purchase_date': '2025-08-30',
+                                          'item_title': 'Beautiful Vase', 'item_id': 'item-1'}),
+                         content_type='application/json')
+
+        response = self.client.get(f'/api/registry?since={version}&cards=1')
+
+        data = json.loads(response.data)
+        self.assertFalse(data['full'])
+        self.assertEqual([item['id'] for item in data['items']], ['item-1'])
+        self.assertTrue(data['items'][0]['bought'])
+        self.assertIn('Already Purchased', data['items'][0]['html'])
+        self.assertEqual(data['removed'], [])
+
+    def test_unchanged_returns_304(self):
+        """Test that an up-to-date client gets 304 and Cosmos is not re-queried"""
+        version = json.loads(self.client.get('/api/registry').data)['version']
+
+        response = self.client.get(f'/api/registry?since={version}')
+        revalidated = self.client.get('/api/registry', headers={'If-None-Match': f'"{version}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(self.container.query_items.call_count, 1)
+
+    def test_weak_etag_revalidates(self):
+        """Test that the weakened ETag of a compressed response still gets 304"""
+        version = json.loads(self.client.get('/api/registry').data)['version']
+
+        response = self.client.get('/api/registry', headers={'If-None-Match': f'W/"{version}"'})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_removed_items_are_reported(self):
+        """Test that deleting an item shows up in the next delta"""
+        version = json.loads(self.client.get('/api/registry').data)['version']
+        with patch('app.release_cached_image'):
+            self.client.post('/registry/admin/delete', data=json.dumps({'id': 'item-3'}),
+                             content_type='application/json')
+
+        data = json.loads(self.client.get(f'/api/registry?since={version}').data)
+
+        self.assertEqual(data['items'], [])
+        self.assertEqual(data['removed'], ['item-3'])
+
+    @patch('app.REGISTRY_SYNC_REFRESH_SECONDS', 0)
+    @patch('app.REGISTRY_STALE_WHILE_REVALIDATE_SECONDS', 0)
+    def test_refresh_picks_up_external_changes(self):
+        """Test that re-reading Cosmos turns outside edits into a delta"""
+        version = json.loads(self.client.get('/api/registry').data)['version']
+        self.container._items['item-3']['price'] = 99.0
+
+        data = json.loads(self.client.get(f'/api/registry?since={version}').data)
+
+        self.assertEqual([item['id'] for item in data['items']], ['item-3'])
+        self.assertEqual(data['items'][0]['price'], 99.0)
+
+    def test_unavailable_registry(self):
+        """Test that the API reports 503 when Cosmos cannot be reached"""
+        with patch('app.get_cosmos_container', return_value=None):
+            response = self.client.get('/api/registry')
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_full_snapshot_is_gzipped_and_serialized_once(self):
+        """Test that the full listing is encoded once per version and format, and
+        compressed by the response hook for gzip clients"""
+        for n in range(4, 40):
+            self.container._items[f'item-{n}'] = {
+                'id': f'item-{n}', 'url': f'https://example.com/item{n}', 'image_url': '',
+                'price': float(n), 'bought': False, 'title': f'Gift {n}', 'bought_by': ''}
+        cache = SerializedCache()
+
+        with patch('app.registry_json_cache', cache):
+            first = self.client.get('/api/registry', headers={'Accept-Encoding': 'gzip'})
+            second = self.client.get('/api/registry', headers={'Accept-Encoding': 'gzip'})
+            plain = self.client.get('/api/registry')
+
+        self.assertEqual(first.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', first.headers['Vary'])
+        data = json.loads(gzip.decompress(first.data))
+        self.assertEqual(len(data['items']), 39)
+        self.assertEqual(second.data, first.data)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(json.loads(plain.data), data)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_deltas_are_not_cached(self):
+        """Test that since= responses bypass the serialized body cache"""
+        cache = SerializedCache()
+        with patch('app.registry_json_cache', cache):
+            version = json.loads(self.client.get('/api/registry').data)['version']
+            self.client.post('/purchase_item', json={
+                'item_id': 'item-1', 'name': 'Jane Smith', 'purchase_date': '2025-08-30',
+                'item_title': 'Beautiful Vase'})
+            delta = json.loads(self.client.get(f'/api/registry?since={version}').data)
+
+        self.assertFalse(delta['full'])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+
+class RegistryStaleServingTestCase(WeddingWebsiteTestCase):
+    """Test cases for stale-while-revalidate and the last-known-good snapshot"""
+
+    def setUp(self):
+        super().setUp()
+        self.container = FakeCosmosContainer(self.mock_registry_data)
+        self.container.query_items = Mock(side_effect=lambda **kwargs: [
+            dict(item) for item in self.container._items.values()])
+        patchers = [
+            patch('app.get_cosmos_container', return_value=self.container),
+            patch('app.REGISTRY_SYNC_REFRESH_SECONDS', 60),
+            patch('app.REGISTRY_STALE_WHILE_REVALIDATE_SECONDS', 300),
+            patch('app.REGISTRY_STALE_IF_ERROR_SECONDS', 3600),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def drain_background(self):
+        app_module.registry_refresh_executor.submit(lambda: None).result(timeout=5)
+
+    def test_due_model_is_served_while_refreshing_in_background(self):
+        """Test that a model past its refresh age is served at once and re-read afterwards"""
+        self.registry_model.load([{'id': 'item-1', 'title': 'Old Title', 'price': 45.99}], read_at=time.time() - 120)
+        # Hold the background thread so the re-read can't finish before the response
+        release = threading.Event()
+        app_module.registry_refresh_executor.submit(release.wait, 5)
+
+        data = json.loads(self.client.get('/api/registry').data)
+        self.assertEqual([item['title'] for item in data['items']], ['Old Title'])
+        self.assertFalse(data['stale'])
+
+        release.set()
+        self.drain_background()
+        self.assertEqual(self.container.query_items.call_count, 1)
+        self.assertEqual(self.registry_model.get('item-1').title, 'Beautiful Vase')
+        self.assertLess(self.registry_model.age(), 60)
+
+    def test_storage_failure_serves_last_good_copy_marked_stale(self):
+        """Test that a failing re-read falls back to the old copy and says so"""
+        self.registry_model.load([dict(self.mock_registry_data[0])], read_at=time.time() - 1000)
+        self.container.query_items.side_effect = Exception('429 Too Many Requests')
+
+        response = self.client.get('/registry')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Beautiful Vase', response.data)
+        self.assertIn(b'trouble reaching the registry', response.data)
+        self.assertEqual(response.headers['X-Registry-Stale'], '1')
+        self.assertGreaterEqual(int(response.headers['X-Registry-Age']), 1000)
+
+        api = self.client.get('/api/registry')
+        self.assertEqual(api.status_code, 200)
+        self.assertTrue(json.loads(api.data)['stale'])
+
+    def test_copy_older_than_stale_if_error_is_not_served(self):
+        """Test that the max-stale limit turns an outage into an error again"""
+        self.registry_model.load([dict(self.mock_registry_data[0])], read_at=time.time() - 4000)
+        self.container.query_items.side_effect = Exception('Service unavailable')
+
+        self.assertEqual(self.client.get('/api/registry').status_code, 503)
+
+    def test_cold_start_serves_snapshot_from_disk(self):
+        """Test that a fresh worker serves the saved snapshot before storage answers"""
+        self.client.get('/api/registry')
+        self.drain_background()
+        self.assertTrue(os.path.exists(app_module.registry_snapshot.path))
+
+        cold_model = RegistryReadModel()
+        self.container._items['item-1']['title'] = 'Renamed Vase'
+        with patch('app.registry_model', cold_model), \
+                patch.object(app_module.registry_query, 'model', cold_model), \
+                patch('app._registry_snapshot_version', 0), \
+                patch('app.get_cosmos_container', return_value=None):
+            response = self.client.get('/registry')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Beautiful Vase', response.data)
+        self.assertNotIn(b'trouble reaching the registry', response.data)
+        self.assertEqual(self.container.query_items.call_count, 1)
+
+    def test_running_worker_ignores_newer_snapshot(self):
+        """Test that the snapshot is only read at cold start, not adopted by a
+        worker that already has a read model
+        """
+        self.client.get('/api/registry')
+        self.container._items['item-1']['title'] = 'Renamed Vase'
+        app_module.registry_snapshot.save(list(self.container._items.values()))
+
+        data = json.loads(self.client.get('/api/registry').data)
+
+        self.assertIn('Beautiful Vase', [item['title'] for item in data['items']])
+        self.assertEqual(self.registry_model.get('item-1').title, 'Beautiful Vase')
+
+
+class RegistryEventStreamTestCase(WeddingWebsiteTestCase):
+    """Test cases for the Server-Sent Events endpoint"""
+
+    @patch('app.REGISTRY_EVENTS_STREAM_SECONDS', 0.05)
+    def test_stream_replays_from_last_event_id(self):
+        """Test that a reconnecting browser receives the events it missed"""
+        event = app_module.registry_events.publish('removed', {'id': 'item-9'})
+
+        response = self.client.get('/registry/events',
+                                   headers={'Last-Event-ID': str(event['id'] - 1)})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        body = response.get_data(as_text=True)
+        self.assertIn(f"id: {event['id']}\nevent: removed\n", body)
+        self.assertEqual(app_module.registry_events.subscriber_count(), 0)
+
+    @patch('app.registry_events.subscribe', return_value=(None, []))
+    def test_stream_refused_at_capacity(self, mock_subscribe):
+        """Test that streams beyond the cap get a 503 with Retry-After"""
+        response = self.client.get('/registry/events')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+
+class RegistryAdminEditTestCase(WeddingWebsiteTestCase):
+    """Test cases for editing registry items"""
+
+    @patch('app.get_cosmos_container')
+    def test_edit_price_is_single_patch(self, mock_get_container):
+        """Test that editing plain fields patches them without reading the item"""
+        container = FakeCosmosContainer(self.mock_registry_data)
+        mock_get_container.return_value = container
+
+        response = self.client.post('/registry/admin/edit',
+                                    data=json.dumps({'id': 'item-1', 'price': '50'}),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['item']['price'], 50.0)
+        self.assertEqual(container.read_count, 0)
+        self.assertEqual(container.write_count, 1)
+        self.assertEqual(container.read_item('item-1', 'item-1')['title'], 'Beautiful Vase')
+
+    @patch('app.release_cached_image')
+    @patch('app.get_cosmos_container')
+    def test_edit_image_url_clears_cached_image(self, mock_get_container, mock_release):
+        """Test that a new image URL clears and releases the cached copy"""
+        items = [dict(self.mock_registry_data[0], cached_image='abc.jpg')]
+        container = FakeCosmosContainer(items)
+        mock_get_container.return_value = container
+
+        response = self.client.post('/registry/admin/edit',
+                                    data=json.dumps({'id': 'item-1',
+                                                     'image_url': 'https://example.com/new.jpg'}),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        item = container.read_item('item-1', 'item-1')
+        self.assertEqual(item['image_url'], 'https://example.com/new.jpg')
+        self.assertEqual(item['cached_image'], '')
+        mock_release.assert_called_once()
+        store, blob_name = mock_release.call_args.args
+        self.assertIs(store.container, container)
+        self.assertEqual(blob_name, 'abc.jpg')
+
+
+class ImageCacheTestCase(WeddingWebsiteTestCase):
+    """Test cases for read-through registry image caching"""
+    
+    def setUp(self):
+        super().setUp()
+        app_module._image_cache_inflight.clear()
+        app_module._image_cache_failures.clear()
+    
+    @patch('app.image_cache_executor')
+    @patch('app.BLOB_CONNECTION_STRING', 'UseDevelopmentStorage=true')
+    @patch('app.BLOB_AVAILABLE', True)
+    def test_schedule_image_cache_deduplicates(self, mock_executor):
+        """Test that concurrent views of one uncached item schedule a single fetch"""
+        item = dict(self.mock_registry_data[0])
+        
+        self.assertTrue(app_module.schedule_image_cache(item))
+        self.assertFalse(app_module.schedule_image_cache(item))
+        mock_executor.submit.assert_called_once()
+    
+    @patch('app.image_cache_executor')
+    @patch('app.BLOB_CONNECTION_STRING', 'UseDevelopmentStorage=true')
+    @patch('app.BLOB_AVAILABLE', True)
+    def test_schedule_image_cache_skips_cached_items(self, mock_executor):
+        """Test that items with a cached image or no image URL are not scheduled"""
+        cached_item = dict(self.mock_registry_data[0], cached_image='item-1.jpg')
+        
+        self.assertFalse(app_module.schedule_image_cache(cached_item))
+        self.assertFalse(app_module.schedule_image_cache(dict(self.mock_registry_data[2])))
+        mock_executor.submit.assert_not_called()
+    
+    @patch('app.get_cosmos_container')
+    @patch('app.cache_image_to_blob')
+    def test_read_through_records_cached_image(self, mock_cache, mock_get_container):
+        """Test that the background job records cached_image and publishes the item"""
+        mock_cache.return_value = 'item-1.jpg'
+        container = FakeCosmosContainer(self.mock_registry_data)
+        mock_get_container.return_value = container
+        app_module._image_cache_inflight.add('item-1')
+        
+        with patch.object(app_module.registry_events, 'publish') as mock_publish:
+            app_module._read_through_cache_image('item-1', 'https://example.com/vase.jpg')
+        
+        self.assertEqual(container.read_item('item-1', 'item-1')['cached_image'], 'item-1.jpg')
+        self.assertEqual(self.registry_model.get('item-1').cached_image, 'item-1.jpg')
+        self.assertEqual(mock_publish.call_args.args[0], 'updated')
+        self.assertIn('/registry/image/item-1.jpg', mock_publish.call_args.args[1]['html'])
+        self.assertNotIn('item-1', app_module._image_cache_inflight)
+
+    @patch('app.get_cosmos_container')
+    @patch('app.cache_image_to_blob')
+    def test_read_through_keeps_concurrent_purchase(self, mock_cache, mock_get_container):
+        """Test that a purchase landing between the read and the write is kept"""
+        mock_cache.return_value = 'item-1.jpg'
+        container = FakeCosmosContainer(self.mock_registry_data)
+        mock_get_container.return_value = container
+        read_item = container.read_item
+
+        def read_then_buy(item, partition_key):
+            doc = read_item(item, partition_key)
+            if container.read_count == 1:
+                container.patch_item(item, partition_key, [
+                    {'op': 'set', 'path': '/bought', 'value': True},
+                    {'op': 'set', 'path': '/bought_by', 'value': 'Jane Smith'}])
+            return doc
+
+        with patch.object(container, 'read_item', side_effect=read_then_buy):
+            app_module._read_through_cache_image('item-1', 'https://example.com/vase.jpg')
+
+        item = read_item('item-1', 'item-1')
+        self.assertEqual(item['cached_image'], 'item-1.jpg')
+        self.assertTrue(item['bought'])
+        self.assertEqual(item['bought_by'], 'Jane Smith')
+        self.assertEqual(container.read_count, 3)
+    
+    @patch('app.cache_image_to_blob')
+    def test_read_through_failure_is_not_retried_immediately(self, mock_cache):
+        """Test that a failed fetch backs off instead of retrying on every view"""
+        mock_cache.return_value = None
+        
+        app_module._read_through_cache_image('item-1', 'https://example.com/vase.jpg')
+        
+        self.assertIn('item-1', app_module._image_cache_failures)
+
+    
+    @patch('registry_images.requests.get')
+    @patch('app.get_blob_container_client')
+    def test_cache_image_is_content_addressed(self, mock_get_blob, mock_get):
+        """Test that images are stored by content hash and not re-uploaded"""
+        import hashlib
+        image_bytes = b'fake-image-bytes'
+        mock_response = Mock()
+        mock_response.headers = {'Content-Type': 'image/png'}
+        mock_response.iter_content.return_value = [image_bytes[:4], image_bytes[4:]]
+        mock_get.return_value = mock_response
+        mock_blob = Mock()
+        mock_get_blob.return_value.get_blob_client.return_value = mock_blob
+        
+        blob_name = app_module.cache_image_to_blob('https://example.com/a.png', 'item-1')
+        
+        self.assertEqual(blob_name, hashlib.sha256(image_bytes).hexdigest() + '.png')
+        mock_blob.upload_blob.assert_not_called()
+    
+    @patch('app.get_blob_container_client')
+    @patch('app.get_cosmos_container')
+    def test_delete_collects_orphaned_image(self, mock_get_container, mock_get_blob):
+        """Test that deleting the last item using an image deletes its blob"""
+        mock_container = Mock()
+        mock_container.read_item.return_value = dict(self.mock_registry_data[0],
+                                                     cached_image='abc.jpg')
+        mock_container.query_items.return_value = iter([0])
+        mock_get_container.return_value = mock_container
+        
+        response = self.client.post('/registry/admin/delete',
+                                   data=json.dumps({'id': 'item-1'}),
+                                   content_type='application/json')
+        
+        self.assertEqual(response.status_code, 200)
+        mock_container.delete_item.assert_not_called()
+        tombstone = mock_container.patch_item.call_args.kwargs
+        self.assertEqual((tombstone['item'], tombstone['filter_predicate']),
+                         ('item-1', LIVE_PREDICATE))
+        self.assertIn({'op': 'set', 'path': '/deleted', 'value': True}, tombstone['patch_operations'])
+        mock_get_blob.return_value.delete_blob.assert_called_once()
+        self.assertEqual(mock_get_blob.return_value.delete_blob.call_args.args, ('abc.jpg',))
+        self.assertIn('if_unmodified_since', mock_get_blob.return_value.delete_blob.call_args.kwargs)
+    
+    @patch('app.get_blob_container_client')
+    @patch('app.get_cosmos_container')
+    def test_delete_keeps_shared_image(self, mock_get_container, mock_get_blob):
+        """Test that an image still referenced by another item is kept"""
+        mock_container = Mock()
+        mock_container.read_item.return_value = dict(self.mock_registry_data[0],
+                                                     cached_image='abc.jpg')
+        mock_container.query_items.return_value = iter([1])
+        mock_get_container.return_value = mock_container
+        
+        self.client.post('/registry/admin/delete',
+                         data=json.dumps({'id': 'item-1'}),
+                         content_type='application/json')
+        
+        mock_get_blob.return_value.delete_blob.assert_not_called()
+
 class UtilityFunctionsTestCase(WeddingWebsiteTestCase):
     """Test cases for utility functions"""
     
@@ -370,16 +1457,14 @@ class SecurityTestCase(WeddingWebsiteTestCase):
 class IntegrationTestCase(WeddingWebsiteTestCase):
     """Integration test cases"""
     
-    @patch('app.send_registry_notification_email')
+    @patch('app.queue_purchase_notification')
     @patch('app.get_cosmos_container')
-    def test_full_purchase_workflow(self, mock_get_container, mock_send_email):
+    def test_full_purchase_workflow(self, mock_get_container, mock_queue_email):
         """Test the complete purchase workflow"""
         mock_container = Mock()
         mock_container.query_items.return_value = iter(self.mock_registry_data)
-        mock_container.read_item.return_value = dict(self.mock_registry_data[0])
-        mock_container.replace_item = Mock()
         mock_get_container.return_value = mock_container
-        mock_send_email.return_value = True
+        mock_queue_email.return_value = 'notification-1'
         
         # 1. Load registry page
         response = self.client.get('/registry')
@@ -404,8 +1489,8 @@ class IntegrationTestCase(WeddingWebsiteTestCase):
         self.assertTrue(data['success'])
         
         # 3. Verify side effects
-        mock_container.replace_item.assert_called()
-        mock_send_email.assert_called_once()
+        mock_container.patch_item.assert_called()
+        mock_queue_email.assert_called_once()
 
 
 if __name__ == '__main__':
@@ -416,7 +1501,17 @@ if __name__ == '__main__':
         VenuePageTestCase,
         TimelinePageTestCase,
         RegistryPageTestCase,
+        RegistryPaginationTestCase,
         PurchaseItemTestCase,
+        CosmosMetricsTestCase,
+        SqliteBackendTestCase,
+        RegistryChangeFeedTestCase,
+        RegistryEventsTestCase,
+        RegistryApiTestCase,
+        RegistryStaleServingTestCase,
+        RegistryEventStreamTestCase,
+        RegistryAdminEditTestCase,
+        ImageCacheTestCase,
         UtilityFunctionsTestCase,
         ErrorHandlingTestCase,
         SecurityTestCase,
@@ -1,92 +1,169 @@
 """
 Email Viewer for Development
-View emails sent to the local SMTP server during development
+View emails sent to the local SMTP server during development.
+Reads the indexed store at email_logs/emails.db, so every command costs
+O(page) no matter how many messages a load test has captured.
 """
 
+import argparse
 import os
-import json
+import time
 from datetime import datetime
-import glob
-
-def view_emails():
-    """View all emails sent to the local SMTP server"""
-    email_dir = "email_logs"
-    
-    if not os.path.exists(email_dir):
-        print(f"📧 No email logs found. Directory '{email_dir}' doesn't exist.")
+
+from email_log_store import EmailLogStore, DEFAULT_DB_PATH
+
+
+def open_store(db_path=DEFAULT_DB_PATH):
+    """Open the email log store, or explain how to create it"""
+    if not os.path.exists(db_path):
+        print(f"📧 No email logs found. '{db_path}' doesn't exist.")
         print("   Start the Flask app to begin logging emails.")
+        return None
+    return EmailLogStore(db_path)
+
+
+def print_summary(email_data):
+    timestamp = datetime.fromisoformat(email_data['timestamp'])
+    print(f"\n📨 #{email_data['seq']} - {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"   Id: {email_data['id']}")
+    print(f"   From: {email_data['from']}")
+    print(f"   To: {', '.join(email_data['to'])}")
+    print(f"   Subject: {email_data['subject']}")
+
+
+def print_full(email_data):
+    print_summary(email_data)
+    print(f"\n   Full Body:")
+    print("   " + "-" * 50)
+    for line in email_data['body'].splitlines():
+        print(f"   {line}")
+    print("   " + "-" * 50)
+
+
+def view_emails(limit=20, before=None, recipient=None, subject=None, since=None,
+                until=None, query=None, db_path=DEFAULT_DB_PATH):
+    """Print one page of emails, newest first"""
+    store = open_store(db_path)
+    if not store:
         return
-    
-    email_files = glob.glob(os.path.join(email_dir, "email_*.json"))
-    
-    if not email_files:
-        print(f"📧 No emails found in '{email_dir}' directory.")
+
+    page = store.list(limit=limit, before=before, recipient=recipient, subject=subject,
+                      since=since, until=until, query=query)
+    if not page:
+        print(f"📧 No matching emails in '{db_path}'.")
         print("   Try purchasing a registry item to send a test email.")
         return
-    
-    # Sort by filename (which includes timestamp)
-    email_files.sort(reverse=True)
-    
-    print(f"📧 Found {len(email_files)} emails in '{email_dir}':")
+
+    print(f"📧 Showing {len(page)} emails from '{db_path}':")
     print("=" * 80)
-    
-    for i, email_file in enumerate(email_files, 1):
-        try:
-            with open(email_file, 'r', encoding='utf-8') as f:
-                email_data = json.load(f)
-            
-            timestamp = datetime.fromisoformat(email_data['timestamp'])
-            
-            print(f"\n📨 Email #{i} - {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"   File: {os.path.basename(email_file)}")
-            print(f"   From: {email_data['from']}")
-            print(f"   To: {', '.join(email_data['to'])}")
-            print(f"   Subject: {email_data['subject']}")
-            print(f"   Body Preview: {email_data['body'][:100]}...")
-            
-            if i <= 3:  # Show full body for first 3 emails
-                print(f"\n   Full Body:")
-                print("   " + "-" * 50)
-                for line in email_data['body'].split('\n'):
-                    print(f"   {line}")
-                print("   " + "-" * 50)
-            
-        except Exception as e:
-            print(f"❌ Error reading {email_file}: {e}")
-    
-    print(f"\n💡 Tip: Delete files in '{email_dir}' to clear email history")
-
-def clear_emails():
-    """Clear all email logs"""
-    email_dir = "email_logs"
-    
-    if not os.path.exists(email_dir):
-        print(f"📧 No email logs to clear. Directory '{email_dir}' doesn't exist.")
+    for email_data in page:
+        print_summary(email_data)
+
+    if len(page) == limit:
+        print(f"\n💡 Next page: python view_emails.py list --before {page[-1]['seq']}")
+
+
+def show_email(message_id, db_path=DEFAULT_DB_PATH):
+    """Print one email in full"""
+    store = open_store(db_path)
+    if not store:
         return
-    
-    email_files = glob.glob(os.path.join(email_dir, "email_*.json"))
-    
-    if not email_files:
-        print(f"📧 No emails to clear in '{email_dir}' directory.")
+    email_data = store.get(message_id)
+    if not email_data:
+        print(f"❌ No email with id {message_id}")
         return
-    
-    confirm = input(f"🗑️  Delete {len(email_files)} email logs? (y/N): ")
+    print_full(email_data)
+
+
+def tail_emails(count=10, follow=False, interval=0.5, db_path=DEFAULT_DB_PATH):
+    """Print the latest emails, then optionally keep printing new ones"""
+    store = open_store(db_path)
+    if not store:
+        return
+
+    for email_data in reversed(store.list(limit=count)):
+        print_summary(email_data)
+
+    if not follow:
+        return
+
+    last_seq = store.latest_seq()
+    print(f"\n👀 Following new emails (Ctrl+C to stop)...")
+    try:
+        while True:
+            for email_data in store.list(limit=500, after=last_seq):
+                print_summary(email_data)
+                last_seq = email_data['seq']
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def clear_emails(db_path=DEFAULT_DB_PATH):
+    """Clear all email logs"""
+    store = open_store(db_path)
+    if not store:
+        return
+
+    confirm = input(f"🗑️  Delete all email logs in '{db_path}'? (y/N): ")
     if confirm.lower() in ['y', 'yes']:
-        for email_file in email_files:
-            os.remove(email_file)
-        print(f"✅ Cleared {len(email_files)} email logs")
+        count = store.clear()
+        print(f"✅ Cleared {count} email logs")
     else:
         print("❌ Email clear cancelled")
 
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="View emails captured by the dev SMTP server")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the email log store")
+    commands = parser.add_subparsers(dest='command')
+
+    list_cmd = commands.add_parser('list', help="List emails, newest first")
+    list_cmd.add_argument('-n', '--limit', type=int, default=20)
+    list_cmd.add_argument('--before', type=int, help="Show emails older than this #sequence")
+    list_cmd.add_argument('--to', dest='recipient', help="Only emails sent to this address")
+    list_cmd.add_argument('--subject', help="Only emails whose subject contains these words")
+    list_cmd.add_argument('--since', help="ISO timestamp, e.g. 2025-08-30T12:00")
+    list_cmd.add_argument('--until', help="ISO timestamp, e.g. 2025-08-31")
+
+    search_cmd = commands.add_parser('search', help="Full-text search over subject and body")
+    search_cmd.add_argument('query')
+    search_cmd.add_argument('-n', '--limit', type=int, default=20)
+    search_cmd.add_argument('--before', type=int)
+
+    show_cmd = commands.add_parser('show', help="Show one email in full")
+    show_cmd.add_argument('id', help="Email id or #sequence")
+
+    tail_cmd = commands.add_parser('tail', help="Show the latest emails")
+    tail_cmd.add_argument('-n', '--count', type=int, default=10)
+    tail_cmd.add_argument('-f', '--follow', action='store_true', help="Keep printing new emails")
+
+    commands.add_parser('clear', help="Delete all captured emails")
+    return parser
+
+
 if __name__ == '__main__':
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
-        clear_emails()
+    args = build_parser().parse_args()
+
+    if args.command == 'clear':
+        clear_emails(args.db)
+    elif args.command == 'search':
+        view_emails(limit=args.limit, before=args.before, query=args.query, db_path=args.db)
+    elif args.command == 'show':
+        show_email(args.id, args.db)
+    elif args.command == 'tail':
+        tail_emails(args.count, args.follow, db_path=args.db)
+    elif args.command == 'list':
+        view_emails(limit=args.limit, before=args.before, recipient=args.recipient,
+                    subject=args.subject, since=args.since, until=args.until, db_path=args.db)
     else:
-        view_emails()
-        
+        view_emails(db_path=args.db)
+
         print("\n" + "=" * 80)
         print("📧 Email Viewer Commands:")
-        print("   python view_emails.py       - View all emails")
-        print("   python view_emails.py clear - Clear all email logs")
+        print("   python view_emails.py                  - Latest emails")
+        print("   python view_emails.py list --to ADDR   - Filter by recipient/subject/time")
+        print("   python view_emails.py search WORDS     - Full-text search")
+        print("   python view_emails.py show ID          - Show one email in full")
+        print("   python view_emails.py tail -f          - Follow new emails")
+        print("   python view_emails.py clear            - Clear all email logs")